@@ -1,29 +1,49 @@
-from flask import Flask
+from flask import Flask, request
 from flask_cors import CORS
-import concurrent.futures
 
-from config import CORS_CONFIG
+from config import CORS_CONFIG, UPLOAD_MAX_BYTES, WARMUP_ON_START
 from routes.upload_routes import upload_blueprint
 from routes.chat_routes import chat_blueprint
 from routes.health_routes import health_blueprint
+from routes.job_routes import job_blueprint
+from routes.document_routes import document_blueprint
+from utils.metrics import gauge, counter
+from utils.upload_utils import UploadRequest
+from utils.warmup import start_warmup
 
 # Create Flask app
 app = Flask(__name__)
 
+# Las subidas se leen por bloques a un archivo temporal, calculando el hash al vuelo
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = UPLOAD_MAX_BYTES
+
 # Configure CORS
 CORS(app, **CORS_CONFIG)
 
-# Create thread pool executor for background processing
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
-
 # Register blueprints
 app.register_blueprint(upload_blueprint)
 app.register_blueprint(chat_blueprint)
 app.register_blueprint(health_blueprint)
+app.register_blueprint(job_blueprint)
+app.register_blueprint(document_blueprint)
 @app.route('/')
 def home():
     return 'Hello, World!'
 
+# Peticiones en curso y totales por endpoint
+requests_in_flight = gauge("pdfai_http_requests_in_flight", "Peticiones HTTP en curso")
+requests_total = counter("pdfai_http_requests_total", "Peticiones HTTP atendidas")
+
+@app.before_request
+def track_request_start():
+    requests_in_flight.inc()
+
+@app.teardown_request
+def track_request_end(error=None):
+    requests_in_flight.dec()
+    requests_total.inc(endpoint=request.endpoint or "unknown")
+
 # Add CORS headers to all responses
 @app.after_request
 def after_request(response):
@@ -32,6 +52,10 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
+# Cargar los módulos pesados en segundo plano para que no los pague la primera petición
+if WARMUP_ON_START:
+    start_warmup()
+
 if __name__ == "__main__":
     app.run()
 
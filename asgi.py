@@ -0,0 +1,200 @@
+import asyncio
+import json
+import traceback
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app
+from config import ASGI_MAX_STREAMS, SCHEDULER_RETRY_AFTER, SSE_HEARTBEAT_SECONDS
+from services.chat_service import prepare_chat_prompt, prepare_summary_request, ChatRequestError
+from services.document_service import get_document_pages, DocumentNotFound
+from services.summary_service import build_summary_prompt, get_page_summary_async, summary_prefetcher
+from utils.gemini_utils import generate_text_internal_async, GenerationError
+from utils.metrics import gauge, counter
+from utils.sse import format_event, format_comment, coalesce_async
+
+# Servidor ASGI: /chat y /summarize se atienden en el bucle de eventos con la API
+# asíncrona de Gemini, de modo que muchos streams comparten un solo hilo y una
+# desconexión del cliente cancela la generación. El resto de rutas sigue en Flask.
+#
+#   uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+flask_application = WsgiToAsgi(app)
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization"),
+    (b"access-control-allow-methods", b"GET,PUT,POST,DELETE,OPTIONS"),
+]
+
+streams_active = gauge("pdfai_asgi_streams_active", "Respuestas de /chat y /summarize en curso en el servidor ASGI")
+disconnects_total = counter("pdfai_asgi_disconnects_total", "Generaciones canceladas porque el cliente se desconectó")
+requests_total = counter("pdfai_http_requests_total", "Peticiones HTTP atendidas")
+
+_active_streams = 0
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                   + CORS_HEADERS + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def run_until_disconnect(receive, coro):
+    """Ejecutar coro y cancelarla si el cliente se desconecta antes de que termine"""
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for pending in (task, watcher):
+            pending.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+    if task.cancelled():
+        disconnects_total.inc()
+        return None
+    return task.result()
+
+
+async def chat(send, data):
+    try:
+        prompt = await asyncio.to_thread(prepare_chat_prompt, data)
+    except ChatRequestError as e:
+        await send_json(send, {"error": str(e)}, e.status)
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")] + CORS_HEADERS,
+    })
+
+    async def send_text(text):
+        await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+
+    # Aquí no hay búfer de reanudación: la desconexión cancela la generación
+    stream = None
+    try:
+        stream = await generate_text_internal_async(prompt, stream=True)
+        async for text in coalesce_async(stream, idle_timeout=SSE_HEARTBEAT_SECONDS):
+            await send_text(format_event(text) if text is not None else format_comment())
+        await send_text(format_event("", event="done"))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Error en el stream asíncrono del chat: {str(e)}")
+        traceback.print_exc()
+        await send_text(format_event(f"Error en el streaming: {str(e)}", event="error"))
+    finally:
+        # Al cancelar (desconexión) se cierra el stream y se deja de consumir cuota
+        if stream is not None:
+            await stream.aclose()
+    await send({"type": "http.response.body", "body": b""})
+
+async def summarize(send, data):
+    try:
+        file_hash, page_num, text, text_hash = await asyncio.to_thread(prepare_summary_request, data)
+    except ChatRequestError as e:
+        await send_json(send, {"error": str(e)}, e.status)
+        return
+
+    try:
+        if file_hash != "unknown" and page_num:
+            # Reutilizar el resumen ya generado (o en curso) para esta página
+            response = await get_page_summary_async(file_hash, page_num, text, text_hash)
+            # El lector está en esta página: resumir por adelantado las siguientes
+            await asyncio.to_thread(_prefetch, file_hash, page_num)
+        else:
+            response = await generate_text_internal_async(build_summary_prompt(text))
+    except GenerationError as e:
+        await send_json(send, {"error": str(e)}, 502)
+        return
+    await send_json(send, {"summary": response})
+
+def _prefetch(file_hash, page_num):
+    try:
+        summary_prefetcher.on_reader_page(file_hash, page_num, get_document_pages(file_hash))
+    except DocumentNotFound:
+        pass
+
+ROUTES = {"/chat": chat, "/summarize": summarize}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    handler = ROUTES.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+    if handler is None:
+        # Preflight OPTIONS, subidas, salud, etc.: la aplicación Flask de siempre
+        await flask_application(scope, receive, send)
+        return
+
+    global _active_streams
+    if _active_streams >= ASGI_MAX_STREAMS:
+        await send_json(send, {"error": f"Servidor saturado, reintenta en {SCHEDULER_RETRY_AFTER} segundos"}, 503,
+                        [(b"retry-after", str(SCHEDULER_RETRY_AFTER).encode())])
+        return
+
+    body = await read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        await send_json(send, {"error": "JSON inválido"}, 400)
+        return
+
+    # Estado de la respuesta: tras http.response.start ya no se puede enviar un error JSON
+    response = {"started": False, "finished": False}
+
+    async def tracked_send(message):
+        if message["type"] == "http.response.start":
+            response["started"] = True
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            response["finished"] = True
+        await send(message)
+
+    _active_streams += 1
+    streams_active.inc()
+    requests_total.inc(endpoint=f"asgi.{handler.__name__}")
+    try:
+        await run_until_disconnect(receive, handler(tracked_send, data))
+    except Exception as e:
+        print(f"Error en el servidor ASGI ({scope['path']}): {str(e)}")
+        traceback.print_exc()
+        if not response["started"]:
+            await send_json(send, {"error": f"Error procesando la solicitud: {str(e)}"}, 500)
+        elif not response["finished"]:
+            # El stream ya empezó: solo se cierra el cuerpo
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        _active_streams -= 1
+        streams_active.dec()
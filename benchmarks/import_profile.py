@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Perfil del arranque en frío: cada ejecución importa la app en un proceso nuevo con
+# `python -X importtime`, mide el tiempo hasta poder atender /health y anota qué
+# módulos pesados se han cargado. Sirve para detectar regresiones del cold start
+# en funciones serverless (vercel.json).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deberían cargarse hasta que una petición los necesite
+HEAVY_MODULES = ("google.generativeai", "grpc", "numpy", "PyPDF2", "pdf2image", "pytesseract", "PIL")
+
+PROBE = """
+import json, sys, time
+heavy_modules = sys.argv[1].split(",")
+warmup = sys.argv[2] == "1"
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/health")
+first_request = time.perf_counter()
+result = {
+    "import_ms": (imported - start) * 1000,
+    "first_health_ms": (first_request - imported) * 1000,
+    "health_status": response.status_code,
+    "heavy_loaded": [m for m in heavy_modules if m in sys.modules],
+}
+if warmup:
+    # Lo que se importe a partir de aquí no cuenta como coste del arranque
+    print("@@WARMUP@@", file=sys.stderr, flush=True)
+    from utils.warmup import warm_up
+    warm_start = time.perf_counter()
+    result["warmup_imports_ms"] = {name: seconds * 1000 for name, seconds in warm_up().items()}
+    result["warmup_ms"] = (time.perf_counter() - warm_start) * 1000
+print("@@PROFILE@@" + json.dumps(result))
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de importación y arranque en frío de PDF-AI")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos nuevos que se lanzan (se usa la mediana)")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más caros que se muestran")
+    parser.add_argument("--warmup", action="store_true", help="Medir también utils.warmup.warm_up() tras arrancar")
+    parser.add_argument("--output", default="import_profile.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.20,
+                        help="Empeoramiento relativo permitido antes de considerarlo regresión")
+    parser.add_argument("--min-module-ms", type=float, default=5.0,
+                        help="Los módulos más baratos que esto no se comparan (ruido)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Salir con código 1 si hay regresiones")
+    return parser.parse_args(argv)
+
+
+def probe_environment():
+    env = dict(os.environ)
+    env.setdefault("DEFAULT_MODEL", "gemini-bench")
+    env["GEMINI_BACKEND"] = "fake"
+    env["CACHE_BACKEND"] = "memory"
+    env["PDF_STORE_BACKEND"] = "memory"
+    env["WARMUP_ON_START"] = "0"
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def parse_importtime(stderr):
+    """Líneas de -X importtime -> {módulo: (propio_us, acumulado_us, nivel)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if line.startswith("@@WARMUP@@"):
+            break
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        level = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), level)
+    return modules
+
+
+def run_once(warmup):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE, ",".join(HEAVY_MODULES),
+                                "1" if warmup else "0"], cwd=ROOT,
+                               env=probe_environment(), capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    marker = [line for line in completed.stdout.splitlines() if line.startswith("@@PROFILE@@")]
+    if completed.returncode != 0 or not marker:
+        raise RuntimeError(f"El proceso de prueba falló:\n{completed.stderr[-2000:]}")
+    result = json.loads(marker[0][len("@@PROFILE@@"):])
+    result["process_wall_ms"] = wall_ms
+    result["modules"] = parse_importtime(completed.stderr)
+    return result
+
+
+def summarize_runs(runs, top):
+    def median(values):
+        return round(statistics.median(values), 2) if values else None
+
+    # Coste por módulo importado desde la app (acumulado) y por paquete de primer nivel (propio)
+    cumulative = {}
+    packages = {}
+    for run in runs:
+        per_package = {}
+        for name, (self_us, cumulative_us, _) in run["modules"].items():
+            cumulative.setdefault(name, []).append(cumulative_us / 1000)
+            package = name.split(".")[0]
+            per_package[package] = per_package.get(package, 0) + self_us / 1000
+        for package, ms in per_package.items():
+            packages.setdefault(package, []).append(ms)
+
+    modules = {name: median(values) for name, values in cumulative.items()}
+    top_modules = dict(sorted(modules.items(), key=lambda item: -item[1])[:top])
+    top_packages = dict(sorted(((name, median(values)) for name, values in packages.items()),
+                               key=lambda item: -item[1])[:top])
+
+    result = {
+        "runs": len(runs),
+        "startup_ms": {
+            "import_app": median([run["import_ms"] for run in runs]),
+            "first_health": median([run["first_health_ms"] for run in runs]),
+            "process_wall": median([run["process_wall_ms"] for run in runs]),
+        },
+        "heavy_loaded_at_startup": sorted({m for run in runs for m in run["heavy_loaded"]}),
+        "top_modules_ms": top_modules,
+        "top_packages_ms": top_packages,
+    }
+    if "warmup_ms" in runs[0]:
+        result["startup_ms"]["warmup"] = median([run["warmup_ms"] for run in runs])
+        names = runs[0]["warmup_imports_ms"]
+        result["warmup_imports_ms"] = {name: median([run["warmup_imports_ms"].get(name, 0) for run in runs])
+                                       for name in names}
+    return result
+
+
+def compare(result, baseline, tolerance, min_module_ms):
+    """Comparar con una ejecución anterior; devuelve la lista de regresiones"""
+    regressions = []
+    previous = baseline.get("profile", {})
+    for metric, now in result["startup_ms"].items():
+        before = previous.get("startup_ms", {}).get(metric)
+        if not now or not before:
+            continue
+        change = (now - before) / before
+        result.setdefault("vs_baseline", {})[metric] = round(change, 4)
+        if change > tolerance:
+            regressions.append(f"startup {metric}: {before} -> {now} ms ({change:+.1%})")
+
+    for name in sorted(set(result["heavy_loaded_at_startup"]) - set(previous.get("heavy_loaded_at_startup", []))):
+        regressions.append(f"{name} se carga ahora al arrancar")
+
+    for name, now in result["top_modules_ms"].items():
+        before = previous.get("top_modules_ms", {}).get(name)
+        if before is None:
+            if now >= min_module_ms and previous.get("top_modules_ms"):
+                regressions.append(f"{name}: nuevo entre los módulos más caros ({now} ms)")
+            continue
+        if max(now, before) < min_module_ms:
+            continue
+        change = (now - before) / before if before else 0
+        if change > tolerance:
+            regressions.append(f"{name}: {before} -> {now} ms ({change:+.1%})")
+    return regressions
+
+
+def print_summary(result):
+    startup = result["startup_ms"]
+    print(f"Arranque en frío (mediana de {result['runs']} procesos)")
+    for metric, value in startup.items():
+        print(f"    {metric:<20}{value:>10} ms")
+    heavy = result["heavy_loaded_at_startup"]
+    print(f"Módulos pesados cargados al arrancar: {', '.join(heavy) if heavy else 'ninguno'}")
+    print("\nMódulos más caros (acumulado)")
+    for name, ms in result["top_modules_ms"].items():
+        print(f"    {name:<40}{ms:>10} ms")
+    print("\nPaquetes más caros (tiempo propio)")
+    for name, ms in result["top_packages_ms"].items():
+        print(f"    {name:<40}{ms:>10} ms")
+    if "warmup_imports_ms" in result:
+        print("\nCalentamiento")
+        for name, ms in result["warmup_imports_ms"].items():
+            print(f"    {name:<40}{ms:>10} ms")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runs = [run_once(args.warmup) for _ in range(max(1, args.runs))]
+    result = summarize_runs(runs, args.top)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance, args.min_module_ms)
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "profile": result,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+
+    print_summary(result)
+    print(f"\nResultados guardados en {args.output}")
+    if regressions:
+        print("\nRegresiones respecto a la línea base:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import re
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Permitir `python benchmarks/run_benchmarks.py` además de `python -m benchmarks.run_benchmarks`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_pdf import text_pdf, image_pdf
+
+# Benchmark reproducible de /upload, /chat y /summarize sin red: PDFs sintéticos,
+# backend falso de Gemini con latencia configurable y la app Flask en proceso.
+
+SCENARIOS = ("upload", "upload_cached", "upload_ocr", "chat", "summarize", "summarize_batch")
+
+QUESTIONS = (
+    "¿Cuál es el objetivo del documento?",
+    "¿Qué dice sobre el presupuesto?",
+    "Resume las obligaciones de las partes",
+    "¿Cuáles son los riesgos mencionados?",
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de PDF-AI con un backend falso de Gemini")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Escenarios separados por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--docs", type=int, default=8, help="PDFs de texto distintos")
+    parser.add_argument("--pages", type=int, default=30, help="Páginas por PDF de texto")
+    parser.add_argument("--image-docs", type=int, default=2, help="PDFs solo con imágenes (OCR)")
+    parser.add_argument("--image-pages", type=int, default=3, help="Páginas por PDF de imágenes")
+    parser.add_argument("--requests", type=int, default=40, help="Peticiones por escenario de chat/resumen")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes concurrentes")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del corpus")
+    parser.add_argument("--latency", type=float, default=0.2, help="Latencia de Gemini sin streaming (s)")
+    parser.add_argument("--first-chunk-delay", type=float, default=0.15, help="Tiempo hasta el primer chunk (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Tiempo entre chunks (s)")
+    parser.add_argument("--chunk-size", type=int, default=40, help="Caracteres por chunk")
+    parser.add_argument("--gemini-concurrency", type=int, default=8, help="Llamadas simultáneas a Gemini")
+    parser.add_argument("--gemini-rate", type=float, default=50, help="Llamadas por segundo a Gemini")
+    parser.add_argument("--output", default="bench_output.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Empeoramiento relativo que se considera regresión (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Salir con código 1 si hay regresiones")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar los logs de la aplicación")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    """La configuración se lee al importar config, así que se fija antes de importar la app"""
+    os.environ.setdefault("DEFAULT_MODEL", "gemini-bench")
+    os.environ.setdefault("DEFAULT_MAX_TOKENS", "200")
+    os.environ["GEMINI_BACKEND"] = "fake"
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["PDF_STORE_BACKEND"] = "memory"
+    os.environ["METRICS_ENABLED"] = "1"
+
+
+def batch_aware_responder(prompt):
+    """Respuesta simulada que respeta los separadores por página de los resúmenes en lote"""
+    pages = re.findall(r"=== PÁGINA (\d+) ===", prompt)
+    digest = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8]
+    body = (f"**Respuesta simulada {digest}**\n\n"
+            f"- Este contenido lo genera el backend falso de Gemini.\n"
+            f"- El texto tiene {len(prompt.split())} palabras.\n")
+    if not pages:
+        return body
+    return "\n".join(f"=== PÁGINA {page} ===\n{body}" for page in dict.fromkeys(pages))
+
+def install_fake_gemini(args):
+    from utils.fake_gemini import FakeGeminiBackend
+    from utils.gemini_client import GeminiClient, AdaptiveTokenBucket, set_client
+
+    backend = FakeGeminiBackend(latency=args.latency, first_chunk_delay=args.first_chunk_delay,
+                                chunk_delay=args.chunk_delay, chunk_size=args.chunk_size,
+                                responder=batch_aware_responder)
+    limiter = AdaptiveTokenBucket(rate=args.gemini_rate, min_rate=1, max_rate=args.gemini_rate)
+    set_client(GeminiClient(backend, max_concurrency=args.gemini_concurrency, rate_limiter=limiter))
+    return backend
+
+
+def percentile(values, fraction):
+    """Percentil por rango más cercano"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso y de sus hijos (procesos de extracción)"""
+    unit = 1 if sys.platform == "darwin" else 1024  # ru_maxrss está en bytes en macOS y en KiB en Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return round(own / 2 ** 20, 1), round(children / 2 ** 20, 1)
+
+
+class Scenario:
+    """Ejecuta peticiones con N clientes concurrentes y mide latencias y etapas"""
+
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.latencies = []
+        self.first_byte = []
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, status, latency, first_byte=None):
+        with self._lock:
+            self.latencies.append(latency)
+            if first_byte is not None:
+                self.first_byte.append(first_byte)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def run(self, tasks):
+        from utils.metrics import stage_totals
+
+        stages_before = stage_totals()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for future in [pool.submit(task) for task in tasks]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        return self.report(elapsed, stages_before, stage_totals())
+
+    def report(self, elapsed, stages_before, stages_after):
+        stages = {}
+        for stage, (seconds, count) in stages_after.items():
+            previous_seconds, previous_count = stages_before.get(stage, (0.0, 0))
+            if count > previous_count:
+                calls = count - previous_count
+                total = seconds - previous_seconds
+                stages[stage] = {"calls": calls, "total_s": round(total, 4), "mean_ms": round(total / calls * 1000, 3)}
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        rss, children_rss = peak_rss_mb()
+        return {
+            "requests": len(self.latencies),
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(self.latencies) / elapsed, 2) if elapsed else None,
+            "statuses": self.statuses,
+            "latency_ms": {
+                "p50": ms(percentile(self.latencies, 0.50)),
+                "p95": ms(percentile(self.latencies, 0.95)),
+                "p99": ms(percentile(self.latencies, 0.99)),
+                "max": ms(max(self.latencies)) if self.latencies else None,
+            },
+            "first_byte_ms": {
+                "p50": ms(percentile(self.first_byte, 0.50)),
+                "p95": ms(percentile(self.first_byte, 0.95)),
+            } if self.first_byte else None,
+            "stages": stages,
+            "peak_rss_mb": rss,
+            "peak_children_rss_mb": children_rss,
+        }
+
+
+def _timed_request(scenario, send, stream=False):
+    """Enviar una petición con el cliente de pruebas y registrar su latencia"""
+    def task():
+        started = time.perf_counter()
+        first_byte = None
+        response = send()
+        try:
+            if stream:
+                for chunk in response.response:
+                    if first_byte is None and chunk:
+                        first_byte = time.perf_counter() - started
+            else:
+                response.get_data()
+        finally:
+            response.close()
+        scenario.record(response.status_code, time.perf_counter() - started, first_byte)
+    return task
+
+
+class BenchmarkRunner:
+    def __init__(self, args, client):
+        self.args = args
+        self.client = client
+        self.text_docs = [text_pdf(args.pages, seed=args.seed * 1000 + i) for i in range(args.docs)]
+        self.image_docs = [image_pdf(args.image_pages, seed=args.seed * 1000 + i) for i in range(args.image_docs)]
+        self.hashes = []
+
+    def _upload(self, data, name):
+        return lambda: self.client.post("/upload", data={"file": (io.BytesIO(data), name)},
+                                        content_type="multipart/form-data")
+
+    def _ensure_uploaded(self):
+        # chat y summarize necesitan los documentos ya procesados
+        if not self.hashes:
+            self.run_upload(Scenario("warmup", self.args.concurrency))
+
+    def run_upload(self, scenario):
+        tasks = [_timed_request(scenario, self._upload(data, f"bench-{i}.pdf")) for i, data in enumerate(self.text_docs)]
+        self.hashes = [hashlib.md5(data).hexdigest() for data in self.text_docs]
+        return scenario.run(tasks)
+
+    def run_upload_cached(self, scenario):
+        self._ensure_uploaded()
+        tasks = [_timed_request(scenario, self._upload(data, f"bench-{i}.pdf")) for i, data in enumerate(self.text_docs)]
+        return scenario.run(tasks)
+
+    def run_upload_ocr(self, scenario):
+        tasks = [_timed_request(scenario, self._upload(data, f"scan-{i}.pdf")) for i, data in enumerate(self.image_docs)]
+        return scenario.run(tasks)
+
+    def run_chat(self, scenario):
+        self._ensure_uploaded()
+        tasks = []
+        for i in range(self.args.requests):
+            payload = {"file_hash": self.hashes[i % len(self.hashes)],
+                       "question": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"}
+            tasks.append(_timed_request(
+                scenario, lambda payload=payload: self.client.post("/chat", json=payload, buffered=False), stream=True))
+        return scenario.run(tasks)
+
+    def run_summarize(self, scenario):
+        self._ensure_uploaded()
+        tasks = []
+        for i in range(self.args.requests):
+            # Recorre las páginas de cada documento como un lector (activa el prefetch)
+            payload = {"file_hash": self.hashes[i % len(self.hashes)],
+                       "page": 1 + (i // len(self.hashes)) % self.args.pages}
+            tasks.append(_timed_request(scenario, lambda payload=payload: self.client.post("/summarize", json=payload)))
+        return scenario.run(tasks)
+
+    def run_summarize_batch(self, scenario):
+        self._ensure_uploaded()
+        tasks = []
+        for file_hash in self.hashes:
+            payload = {"file_hash": file_hash}
+            tasks.append(_timed_request(
+                scenario, lambda payload=payload: self.client.post("/summarize/batch", json=payload, buffered=False),
+                stream=True))
+        return scenario.run(tasks)
+
+    def run(self, names):
+        results = {}
+        for name in names:
+            results[name] = getattr(self, f"run_{name}")(Scenario(name, self.args.concurrency))
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Comparar con una ejecución anterior; devuelve la lista de regresiones"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        checks = [("throughput_rps", current.get("throughput_rps"), previous.get("throughput_rps"), False)]
+        for key in ("p50", "p95", "p99"):
+            checks.append((f"latency_ms.{key}", current["latency_ms"].get(key), previous["latency_ms"].get(key), True))
+        for metric, now, before, lower_is_better in checks:
+            if not now or not before:
+                continue
+            change = (now - before) / before
+            worse = change > tolerance if lower_is_better else change < -tolerance
+            current.setdefault("vs_baseline", {})[metric] = round(change, 4)
+            if worse:
+                regressions.append(f"{name} {metric}: {before} -> {now} ({change:+.1%})")
+    return regressions
+
+
+def print_summary(results):
+    print(f"{'escenario':<18}{'req':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        print(f"{name:<18}{result['requests']:>6}{result['throughput_rps'] or 0:>9}"
+              f"{latency['p50'] or 0:>10}{latency['p95'] or 0:>10}{latency['p99'] or 0:>10}{result['peak_rss_mb']:>9}")
+        for stage, data in sorted(result["stages"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"    {stage:<20}{data['calls']:>6} llamadas {data['mean_ms']:>10} ms/llamada")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Escenarios desconocidos: {', '.join(unknown)}")
+        return 2
+
+    configure_environment(args)
+    logs = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with logs:
+        from app import app
+        backend = install_fake_gemini(args)
+        runner = BenchmarkRunner(args, app.test_client())
+        results = runner.run(names)
+
+    output = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "gemini_calls": len(backend.calls),
+        },
+        "scenarios": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+
+    print_summary(results)
+    print(f"\nResultados guardados en {args.output}")
+    if regressions:
+        print("\nRegresiones respecto a la línea base:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
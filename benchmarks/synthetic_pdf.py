@@ -0,0 +1,128 @@
+import random
+import zlib
+
+# Generador de PDFs sintéticos para los benchmarks: escribe la sintaxis PDF a
+# mano para no depender de bibliotecas externas. Con la misma semilla siempre
+# se obtiene el mismo archivo (y por tanto el mismo hash).
+
+WORDS = (
+    "análisis contrato cláusula documento informe capítulo sección resultado datos "
+    "empresa proyecto objetivo propuesta servicio cliente usuario sistema proceso "
+    "calidad riesgo costo presupuesto plazo entrega revisión anexo tabla figura "
+    "conclusión recomendación metodología evaluación indicador gestión control "
+    "seguridad responsabilidad obligación acuerdo partes vigencia pago factura"
+).split()
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _sentence(rng, words=12):
+    sentence = " ".join(rng.choice(WORDS) for _ in range(words))
+    return sentence[0].upper() + sentence[1:] + "."
+
+def _page_lines(rng, page_num, lines):
+    result = [f"{page_num}. Sección {rng.choice(WORDS).capitalize()}"]
+    if page_num == 1:
+        result += ["Fecha: 12/03/2024", "Importe total: $ 12.500,00", "Contacto: info@ejemplo.com"]
+    while len(result) < lines:
+        result.append(_sentence(rng, rng.randint(8, 14)))
+    return result
+
+
+def _build_pdf(pages):
+    """
+    Ensamblar un PDF a partir de una lista de páginas; cada página es
+    (content_stream_bytes, resources_dict_str, extra_objects [(obj_num, bytes)]).
+    Los objetos 1 y 2 son el catálogo y el árbol de páginas; el 3 es la fuente.
+    """
+    objects = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"}
+    page_refs = []
+    next_num = 4
+    for content, resources, extra in pages:
+        page_num, content_num = next_num, next_num + 1
+        next_num += 2
+        for offset, data in extra:
+            objects[next_num + offset] = data
+        resources = resources.format(base=next_num)
+        next_num += len(extra)
+        objects[page_num] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                             f"/Resources {resources} /Contents {content_num} 0 R >>").encode("latin-1")
+        objects[content_num] = _stream(content)
+        page_refs.append(f"{page_num} 0 R")
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for num in sorted(objects):
+        offsets[num] = len(out)
+        out += f"{num} 0 obj\n".encode("latin-1") + objects[num] + b"\nendobj\n"
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode("latin-1")
+    for num in range(1, size):
+        out += f"{offsets[num]:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+def _stream(data, dictionary=""):
+    return (f"<< /Length {len(data)} {dictionary}>>\nstream\n".encode("latin-1") + data + b"\nendstream")
+
+
+def text_pdf(pages=10, lines_per_page=40, seed=0):
+    """PDF con texto extraíble (Helvetica) en cada página"""
+    rng = random.Random(seed)
+    built = []
+    for page_num in range(1, pages + 1):
+        commands = ["BT", "/F1 10 Tf", "13 TL", f"50 {PAGE_HEIGHT - 50} Td"]
+        for line in _page_lines(rng, page_num, lines_per_page):
+            commands.append(f"({_escape(line)}) Tj T*")
+        commands.append("ET")
+        content = "\n".join(commands).encode("cp1252", errors="replace")
+        built.append((content, "<< /Font << /F1 3 0 R >> >>", []))
+    return _build_pdf(built)
+
+
+def image_pdf(pages=4, seed=0, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+    """
+    PDF escaneado simulado: cada página es solo una imagen en escala de grises
+    (renglones de bloques oscuros), sin texto extraíble, para forzar el OCR.
+    """
+    rng = random.Random(seed)
+    built = []
+    for _ in range(pages):
+        pixels = bytearray(b"\xff" * (width * height))
+        for top in range(60, height - 60, 18):
+            left = 50
+            while left < width - 80:
+                word = rng.randint(12, 60)
+                for y in range(top, top + 9):
+                    row = y * width
+                    pixels[row + left:row + min(left + word, width - 50)] = b"\x20" * (min(left + word, width - 50) - left)
+                left += word + rng.randint(6, 12)
+        image = _stream(zlib.compress(bytes(pixels)),
+                        f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                        f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode ")
+        content = f"q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im0 Do Q".encode("latin-1")
+        built.append((content, "<< /XObject << /Im0 {base} 0 R >> >>", [(0, image)]))
+    return _build_pdf(built)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generar un PDF sintético")
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--image", action="store_true", help="Solo imágenes (sin texto extraíble)")
+    args = parser.parse_args()
+    data = image_pdf(args.pages, args.seed) if args.image else text_pdf(args.pages, seed=args.seed)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"{args.output}: {args.pages} páginas, {len(data)} bytes")
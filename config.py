@@ -7,7 +7,7 @@ load_dotenv()
 # Configuración de Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Tu API Key de Gemini
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL")  # Modelo por defecto
-DEFAULT_MAX_TOKENS = int(os.getenv("DEFAULT_MAX_TOKENS"))  # Tokens máximos para la generación de texto
+DEFAULT_MAX_TOKENS = int(os.getenv("DEFAULT_MAX_TOKENS", 1000))  # Tokens máximos para la generación de texto
 
 # Configuración de CORS
 CORS_CONFIG = {
@@ -20,4 +20,115 @@ CORS_CONFIG = {
 }
 
 # Configuración de caché
-MAX_CACHE_SIZE = int(os.getenv("MAX_CACHE_SIZE", 100))  # Número máximo de elementos en cada caché
\ No newline at end of file
+MAX_CACHE_SIZE = int(os.getenv("MAX_CACHE_SIZE", 100))  # Número máximo de elementos en cada caché
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Presupuesto de bytes del caché de resultados de PDF
+PROMPT_CACHE_MAX_BYTES = int(os.getenv("PROMPT_CACHE_MAX_BYTES", 8 * 1024 * 1024))  # Presupuesto de bytes del caché de respuestas
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 16 * 1024 * 1024))  # Presupuesto de bytes del caché de resúmenes de página
+FILE_CACHE_MAX_ENTRIES = int(os.getenv("FILE_CACHE_MAX_ENTRIES", 20))  # Número máximo de PDFs guardados en memoria
+FILE_CACHE_MAX_BYTES = int(os.getenv("FILE_CACHE_MAX_BYTES", 128 * 1024 * 1024))  # Presupuesto de bytes de los PDFs en memoria
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 0)) or None  # Tiempo de vida de las entradas (0 = sin expiración)
+
+# Configuración del almacenamiento de PDFs
+PDF_STORE_BACKEND = os.getenv("PDF_STORE_BACKEND", "disk")  # "disk" o "memory"
+PDF_STORE_DIR = os.getenv("PDF_STORE_DIR", os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                                       "pdf-ai", "store"))  # Carpeta del almacenamiento en disco (privada, 0700)
+PDF_STORE_MAX_BYTES = int(os.getenv("PDF_STORE_MAX_BYTES", 512 * 1024 * 1024))  # Espacio máximo en disco para PDFs
+PDF_CACHE_MAX_AGE = int(os.getenv("PDF_CACHE_MAX_AGE", 3600))  # Segundos que el navegador puede reutilizar un PDF
+
+# Configuración de la extracción de texto
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", 0)) or (os.cpu_count() or 1)  # Procesos para extraer texto (0 = número de CPUs)
+EXTRACTION_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACTION_PARALLEL_MIN_PAGES", 24))  # Por debajo de este número de páginas se extrae en serie
+EXTRACTION_SHARD_SIZE = int(os.getenv("EXTRACTION_SHARD_SIZE", 8))  # Páginas por tarea enviada a cada proceso
+EXTRACTION_MP_CONTEXT = os.getenv("EXTRACTION_MP_CONTEXT", "spawn")  # Método de arranque de los procesos ("spawn", "forkserver" o "fork")
+EXTRACTION_WORKER_CACHE_BYTES = int(os.getenv("EXTRACTION_WORKER_CACHE_BYTES", 32 * 1024 * 1024))  # PDFs abiertos que conserva cada proceso entre bloques (0 = ninguno)
+
+# Configuración del OCR
+OCR_LANG = os.getenv("OCR_LANG", "spa")  # Idioma de Tesseract
+OCR_DPI = int(os.getenv("OCR_DPI", 300))  # Resolución de renderizado de cada página
+OCR_FAST_DPI = int(os.getenv("OCR_FAST_DPI", 200))  # Resolución de la primera pasada rápida (0 = desactivada)
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", 40))  # Si la pasada rápida obtiene menos caracteres, se repite a OCR_DPI
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0)) or (os.cpu_count() or 1)  # Páginas reconocidas en paralelo (0 = número de CPUs)
+OCR_WINDOW = int(os.getenv("OCR_WINDOW", 4))  # Páginas renderizadas de una vez
+OCR_MAX_IN_FLIGHT = int(os.getenv("OCR_MAX_IN_FLIGHT", 0)) or 2 * OCR_WORKERS  # Imágenes renderizadas en memoria como máximo
+OCR_PAGE_MIN_CHARS = int(os.getenv("OCR_PAGE_MIN_CHARS", 25))  # Páginas con imágenes y menos caracteres que esto se reconocen con OCR
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", 16 * 1024 * 1024))  # Presupuesto de bytes del caché de texto OCR por imagen de página
+
+# Configuración de los trabajos de subida asíncronos
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", 3600))  # Tiempo que se conserva el estado de un trabajo
+
+# Configuración de la búsqueda de contexto
+INDEX_CHUNK_SIZE = int(os.getenv("INDEX_CHUNK_SIZE", 800))  # Caracteres por fragmento indexado
+INDEX_TOP_K = int(os.getenv("INDEX_TOP_K", 8))  # Fragmentos que se devuelven como máximo
+CHAT_CONTEXT_MAX_CHARS = int(os.getenv("CHAT_CONTEXT_MAX_CHARS", 4000))  # Presupuesto de contexto enviado a Gemini
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", 64 * 1024 * 1024))  # Presupuesto de bytes de los índices
+
+# Configuración de la API de páginas (/documents/<hash>/pages)
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # Presupuesto de bytes del texto de páginas extraídas bajo demanda
+DOCUMENT_PAGES_MAX_RANGE = int(os.getenv("DOCUMENT_PAGES_MAX_RANGE", 50))  # Páginas devueltas como máximo por petición
+DOCUMENT_PAGES_GZIP_MIN_BYTES = int(os.getenv("DOCUMENT_PAGES_GZIP_MIN_BYTES", 1024))  # Tamaño a partir del que se comprime la respuesta
+OUTLINE_MAX_ENTRIES = int(os.getenv("OUTLINE_MAX_ENTRIES", 60))  # Entradas del índice del documento devuelto por /upload
+
+# Configuración del análisis estructural del documento (outline)
+OUTLINE_MAX_KEY_SENTENCES = int(os.getenv("OUTLINE_MAX_KEY_SENTENCES", 40))  # Frases clave que se conservan por documento
+OUTLINE_CACHE_MAX_BYTES = int(os.getenv("OUTLINE_CACHE_MAX_BYTES", 16 * 1024 * 1024))  # Presupuesto de bytes de los outlines
+EXPLANATION_DIGEST_TOKENS = int(os.getenv("EXPLANATION_DIGEST_TOKENS", 600))  # Tokens del resumen estructural enviado para la explicación
+CHAT_OUTLINE_TOKENS = int(os.getenv("CHAT_OUTLINE_TOKENS", 120))  # Tokens del mapa del documento que acompaña al contexto del chat
+
+# Configuración del cliente de Gemini
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "genai")  # "genai" (API real) o "fake" (respuestas simuladas locales)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))  # Llamadas simultáneas a Gemini como máximo
+GEMINI_RATE_PER_SECOND = float(os.getenv("GEMINI_RATE_PER_SECOND", 2))  # Ritmo inicial de llamadas por segundo
+GEMINI_MIN_RATE = float(os.getenv("GEMINI_MIN_RATE", 0.2))  # Ritmo mínimo tras recibir 429/503
+GEMINI_MAX_RATE = float(os.getenv("GEMINI_MAX_RATE", 10))  # Ritmo máximo al que se puede recuperar
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 3))  # Reintentos ante errores transitorios
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", 0.5))  # Segundos base del backoff exponencial
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", 60))  # Plazo total de cada llamada (incluye reintentos)
+
+# Configuración de los resúmenes por lotes
+SUMMARY_BATCH_TOKEN_BUDGET = int(os.getenv("SUMMARY_BATCH_TOKEN_BUDGET", 3000))  # Tokens de texto (estimados) por prompt de lote
+SUMMARY_BATCH_MAX_PAGES = int(os.getenv("SUMMARY_BATCH_MAX_PAGES", 6))  # Páginas por lote como máximo
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", 3))  # Lotes resumidos a la vez
+SUMMARY_PREFETCH_LOOKAHEAD = int(os.getenv("SUMMARY_PREFETCH_LOOKAHEAD", 2))  # Páginas que se resumen por adelantado
+
+# Configuración de la caché persistente (compartida entre procesos y reinicios)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory" o "sqlite"
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                                         "pdf-ai", "cache.sqlite3"))  # Archivo de la base SQLite (su directorio debe ser privado, 0700)
+PERSISTENT_CACHE_MAX_BYTES = int(os.getenv("PERSISTENT_CACHE_MAX_BYTES", 256 * 1024 * 1024))  # Tamaño máximo antes de compactar
+PERSISTENT_CACHE_TTL_SECONDS = int(os.getenv("PERSISTENT_CACHE_TTL_SECONDS", 7 * 24 * 3600)) or None  # Tiempo de vida de las entradas (0 = sin expiración)
+
+# Configuración del planificador de tareas
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))  # Hilos compartidos por todas las rutas
+SCHEDULER_QUEUE_LIMITS = {
+    0: int(os.getenv("SCHEDULER_QUEUE_INTERACTIVE", 32)),  # Chat y resúmenes interactivos en cola como máximo
+    1: int(os.getenv("SCHEDULER_QUEUE_EXPLANATION", 16)),  # Subidas y explicaciones en cola como máximo
+    2: int(os.getenv("SCHEDULER_QUEUE_BACKGROUND", 64)),   # Resúmenes especulativos en cola como máximo
+}
+SCHEDULER_BACKGROUND_MAX_RUNNING = int(os.getenv("SCHEDULER_BACKGROUND_MAX_RUNNING", 2))  # Hilos que puede ocupar el trabajo en segundo plano
+SCHEDULER_INTERACTIVE_RESERVED = int(os.getenv("SCHEDULER_INTERACTIVE_RESERVED", 1))  # Hilos que solo atienden tareas interactivas
+SCHEDULER_RETRY_AFTER = int(os.getenv("SCHEDULER_RETRY_AFTER", 5))  # Segundos sugeridos en Retry-After cuando hay saturación
+
+# Configuración de métricas
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")  # Medir tiempos por etapa y exponer /metrics
+
+# Configuración del servidor ASGI (asgi.py)
+ASGI_MAX_STREAMS = int(os.getenv("ASGI_MAX_STREAMS", 256))  # Respuestas de /chat y /summarize atendidas a la vez en el bucle de eventos
+
+# Configuración de la ingesta de subidas
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 50 * 1024 * 1024))  # Tamaño máximo de un PDF subido (413 si se supera)
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", 1024 * 1024))  # Bytes de la subida que se guardan en memoria antes de pasar a un archivo temporal
+UPLOAD_COPY_CHUNK_SIZE = int(os.getenv("UPLOAD_COPY_CHUNK_SIZE", 256 * 1024))  # Tamaño de los bloques al leer o copiar subidas
+
+# Configuración del arranque
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "0").lower() not in ("0", "false", "no")  # Cargar en segundo plano los módulos pesados al arrancar
+WARMUP_MODULES = [m.strip() for m in os.getenv("WARMUP_MODULES", "PyPDF2,numpy").split(",") if m.strip()]  # Módulos que se importan en el calentamiento (además del cliente de Gemini)
+
+# Configuración del streaming SSE del chat
+SSE_COALESCE_MIN_CHARS = int(os.getenv("SSE_COALESCE_MIN_CHARS", 48))  # Caracteres mínimos por evento (los chunks pequeños se agrupan)
+SSE_COALESCE_MAX_DELAY = float(os.getenv("SSE_COALESCE_MAX_DELAY", 0.05))  # Segundos que el texto puede esperar a ser agrupado
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))  # Intervalo de los comentarios keep-alive sin datos
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 2000))  # Espera sugerida al cliente antes de reconectar
+SSE_REPLAY_TTL_SECONDS = int(os.getenv("SSE_REPLAY_TTL_SECONDS", 120))  # Tiempo durante el que un stream se puede reanudar (en el mismo proceso)
+SSE_REPLAY_MAX_STREAMS = int(os.getenv("SSE_REPLAY_MAX_STREAMS", 512))  # Streams guardados para reanudar como máximo
+SSE_REPLAY_MAX_BYTES = int(os.getenv("SSE_REPLAY_MAX_BYTES", 16 * 1024 * 1024))  # Presupuesto de bytes del búfer de reanudación
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", 30))  # Sin cliente conectado durante este tiempo, se detiene la generación
@@ -1,17 +1,20 @@
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 import traceback
-
-from utils.text_utils import extract_relevant_context, extract_summary_text
-from utils.gemini_utils import generate_text, generate_text_internal
-from services.pdf_service import generate_summary_background
-import concurrent.futures
+import json
+
+from services.chat_service import prepare_chat_prompt, prepare_summary_request, ChatRequestError
+from utils.gemini_utils import generate_text_internal, GenerationError
+from services.document_service import get_document_pages, parse_page_range, DocumentNotFound
+from services.summary_service import build_summary_prompt, summarize_pages_stream, get_page_summary, summary_prefetcher
+from utils.scheduler import scheduler, INTERACTIVE, SchedulerSaturated
+from routes.errors import saturated_response
+from services.stream_service import start_chat_stream, resume_chat_stream, get_chat_stream, parse_event_id
+from utils.sse import format_event, format_comment
+from config import SSE_RETRY_MS
 
 # Create a blueprint for chat routes
 chat_blueprint = Blueprint('chat', __name__)
 
-# Thread pool for background processing
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
-
 @chat_blueprint.route("/summarize", methods=["POST", "OPTIONS"])
 def summarize_page():
     # Manejar la solicitud preflight OPTIONS
@@ -19,106 +22,187 @@ def summarize_page():
         return "", 200
 
     try:
-        data = request.json
-        if not data or "text" not in data:
-            return jsonify({"error": "Falta el texto para resumir"}), 400
-
-        text = data["text"]
-        page = data.get("page", 0)
-        file_hash = data.get("file_hash", "unknown")
-        
-        # Extraer una versión más corta del texto
-        short_text = extract_summary_text(text)
-
-        # Crear el prompt para el resumen
-        prompt = f"""
-        Eres un experto en síntesis de información. Tu tarea es generar un resumen del siguiente texto siguiendo estas pautas:
-
-        1. Identifica el propósito principal del texto.
-        2. Extrae los puntos clave y los organiza de manera lógica.
-        3. Incluye ejemplos o datos relevantes si están disponibles.
-        4. Limita el resumen a 150-200 palabras.
-        5. Usa un lenguaje claro y profesional.
-        6. Responde únicamente en español.
-        7. IMPORTANTE: Formatea tu respuesta usando Markdown para mejorar la legibilidad.
-           - No uses titulos ni encabezados, ve directo al contenido
-           - Usa **texto** para negritas en conceptos importantes
-           - Usa *texto* para cursivas en definiciones o términos clave
-           - Usa listas con - o 1. para enumerar puntos importantes
-           - Usa > para citas o ejemplos destacados
-
-        Texto:
-        {text}
-        """
-
-        # Generar la respuesta completa (sin streaming)
-        response = generate_text_internal(prompt, stream=False)
+        try:
+            file_hash, page_num, text, text_hash = prepare_summary_request(request.json)
+        except ChatRequestError as e:
+            return jsonify({"error": str(e)}), e.status
+
+        if file_hash != "unknown" and page_num:
+            # Reutilizar el resumen ya generado (o en curso) para esta página
+            response = scheduler.run(INTERACTIVE, get_page_summary, file_hash, page_num, text, text_hash)
+
+            # El lector está en esta página: resumir por adelantado las siguientes
+            try:
+                summary_prefetcher.on_reader_page(file_hash, page_num, get_document_pages(file_hash))
+            except DocumentNotFound:
+                pass
+        else:
+            # Crear el prompt para el resumen
+            prompt = build_summary_prompt(text)
+
+            # Generar la respuesta completa (sin streaming)
+            response = scheduler.run(INTERACTIVE, generate_text_internal, prompt, stream=False)
         print(f"Respuesta completa generada: {response}")
         
         # Devolver la respuesta completa como JSON
         return jsonify({"summary": response})
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except GenerationError as e:
+        return jsonify({"error": str(e)}), 502
     except Exception as e:
         print(f"Error en el endpoint de resumen: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": f"Error procesando la solicitud: {str(e)}"}), 500
 
-@chat_blueprint.route("/chat", methods=["POST", "OPTIONS"])
-def chat():
+@chat_blueprint.route("/summarize/prefetch", methods=["POST", "OPTIONS"])
+def prefetch_summaries():
     # Manejar la solicitud preflight OPTIONS
     if request.method == "OPTIONS":
         return "", 200
 
+    data = request.json
+    if not data or "file_hash" not in data or not str(data.get("page", "")).isdigit():
+        return jsonify({"error": "Faltan el documento o la página actual"}), 400
+
     try:
-        data = request.json
-        if not data or "question" not in data:
-            return jsonify({"error": "Falta la pregunta"}), 400
+        pages = get_document_pages(data["file_hash"])
+    except DocumentNotFound as e:
+        return jsonify({"error": str(e)}), 404
 
-        question = data["question"]
-        context = data.get("context", "")
+    # Programar los resúmenes de las próximas páginas y cancelar los que ya no hacen falta
+    scheduled = summary_prefetcher.on_reader_page(data["file_hash"], int(data["page"]), pages)
+    return jsonify({"scheduled": scheduled}), 202
 
-        # Si no hay contexto, devolver un error
-        if not context:
-            return jsonify({"error": "Falta el contexto"}), 400
+@chat_blueprint.route("/summarize/batch", methods=["POST", "OPTIONS"])
+def summarize_batch_pages():
+    # Manejar la solicitud preflight OPTIONS
+    if request.method == "OPTIONS":
+        return "", 200
 
-        # Crear el prompt para el chat
-        prompt = f"""
-        Eres un asistente inteligente que responde preguntas basadas en un contexto proporcionado. Sigue estas instrucciones:
+    try:
+        data = request.json
+        if not data or ("file_hash" not in data and "pages" not in data):
+            return jsonify({"error": "Falta el documento o las páginas para resumir"}), 400
+
+        # Páginas en línea: [{"page": 1, "text": "..."}]; o páginas del documento cacheado
+        requested = data.get("pages")
+        stored_text = True
+        if isinstance(requested, list) and requested and isinstance(requested[0], dict):
+            pages = [(int(p["page"]), p.get("text", "")) for p in requested]
+            stored_text = False
+        else:
+            try:
+                document_pages = get_document_pages(data.get("file_hash"))
+            except DocumentNotFound as e:
+                return jsonify({"error": str(e)}), 404
+            if isinstance(requested, list):
+                selected = sorted({int(p) for p in requested})
+            else:
+                page_range = parse_page_range(data)
+                selected = sorted(document_pages) if page_range is None else range(page_range[0], page_range[1] + 1)
+            pages = [(n, document_pages[n]) for n in selected if n in document_pages]
+
+        if not pages:
+            return jsonify({"error": "No hay páginas con texto para resumir"}), 400
+
+        # Los primeros lotes se encolan ya, para poder responder 503 si no hay sitio
+        results = summarize_pages_stream(pages, data.get("file_hash"), stored_text)
+
+        # NDJSON por defecto; SSE si se pide
+        use_sse = request.args.get("format") == "sse" or "text/event-stream" in request.headers.get("Accept", "")
+        return Response(stream_with_context(generate_batch_stream(results, use_sse)),
+                        mimetype="text/event-stream" if use_sse else "application/x-ndjson",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except (ValueError, KeyError, TypeError):
+        return jsonify({"error": "Lista de páginas inválida"}), 400
+    except Exception as e:
+        print(f"Error en el endpoint de resumen por lotes: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": f"Error procesando la solicitud: {str(e)}"}), 500
 
-        1. Lee cuidadosamente la pregunta y el contexto.
-        2. Proporciona una respuesta clara, precisa y bien estructurada.
-        3. Si la pregunta no puede responderse con el contexto, respondelo con tus conocimientos sobre el tema.
-        4. Limita la respuesta a un máximo de 200 palabras.
-        5. Responde únicamente en español.
+def generate_batch_stream(results, use_sse=False):
+    """Enviar cada resumen en cuanto está listo (una línea JSON o un evento SSE por página)"""
+    for item in results:
+        payload = json.dumps(item, ensure_ascii=False)
+        yield f"event: summary\ndata: {payload}\n\n" if use_sse else payload + "\n"
+    if use_sse:
+        yield "event: done\ndata: {}\n\n"
 
-        Pregunta:
-        {question}
+@chat_blueprint.route("/chat", methods=["POST", "OPTIONS"])
+def chat():
+    # Manejar la solicitud preflight OPTIONS
+    if request.method == "OPTIONS":
+        return "", 200
 
-        Contexto:
-        {context}
-        """
+    try:
+        # Reanudar una respuesta cortada: se reenvía desde el búfer sin volver a llamar a Gemini
+        last_event_id = request.headers.get("Last-Event-ID")
+        if last_event_id:
+            stream, after = resume_chat_stream(last_event_id)
+            if stream is not None:
+                return chat_stream_response(stream, after)
+
+        try:
+            prompt = prepare_chat_prompt(request.get_json(silent=True))
+        except ChatRequestError as e:
+            return jsonify({"error": str(e)}), e.status
 
         # Generar la respuesta en streaming
-        response_stream = generate_text_internal(prompt, stream=True)
-
-        # Devolver la respuesta en streaming
-        return Response(stream_with_context(generate_streaming_response(response_stream)), mimetype="text/event-stream")
+        response_stream = scheduler.run(INTERACTIVE, generate_text_internal, prompt, stream=True)
+
+        # Un hilo consume la respuesta aunque el cliente se desconecte, para poder reanudarla
+        stream = start_chat_stream(response_stream)
+        # Si el Last-Event-ID ya no existe, el cliente debe descartar el texto parcial
+        return chat_stream_response(stream, 0, restart=bool(last_event_id))
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except GenerationError as e:
+        return jsonify({"error": str(e)}), 502
     except Exception as e:
         print(f"Error en el endpoint de chat: {str(e)}")
         traceback.print_exc()
         return jsonify({"error": f"Error procesando la solicitud: {str(e)}"}), 500
 
-def generate_streaming_response(response_stream):
-    """Generar una respuesta en streaming para el cliente."""
+@chat_blueprint.route("/chat/streams/<stream_id>", methods=["GET"])
+def resume_chat(stream_id):
+    """Reanudar con EventSource: Last-Event-ID (o ?after=) indica el último evento recibido"""
+    stream = get_chat_stream(stream_id)
+    if stream is None:
+        return jsonify({"error": "El stream ya no está disponible"}), 404
+
+    _, index = parse_event_id(request.headers.get("Last-Event-ID"))
+    if index is None:
+        index = request.args.get("after", type=int, default=-1)
+    return chat_stream_response(stream, index + 1)
+
+def chat_stream_response(stream, after=0, restart=False):
+    return Response(stream_with_context(generate_streaming_response(stream, after, restart)),
+                    mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Stream-Id": stream.id})
+
+def generate_streaming_response(stream, after=0, restart=False):
+    """
+    Enviar los eventos del ChatStream a partir del índice `after`: texto agrupado en
+    eventos con id, comentarios keep-alive mientras no hay datos y `done` al terminar.
+    """
+    stream.attach()
     try:
-        for chunk in response_stream:
-            # Procesar cada chunk para asegurar que los saltos de línea se manejen correctamente
-            chunk_text = chunk.text
-            # Reemplazar saltos de línea con espacios para evitar problemas con SSE
-            chunk_text = chunk_text.replace('\n', ' ')
-            # Enviar cada chunk como un evento SSE
-            yield f"data: {chunk_text}\n\n"
-    except Exception as e:
-        print(f"Error en generate_streaming_response: {str(e)}")
-        traceback.print_exc()
-        yield f"data: Error en el streaming: {str(e)}\n\n"
-
+        yield format_event("" if restart else None, event="restart" if restart else None, retry=SSE_RETRY_MS)
+        while True:
+            events = stream.wait_events(after)
+            if not events:
+                if stream.finished:
+                    break
+                # Comentario SSE para que los proxies no cierren la conexión
+                yield format_comment()
+                continue
+            for index, event, data in events:
+                yield format_event(data, event_id=stream.event_id(index), event=event)
+                after = index + 1
+            if stream.finished and after >= len(stream.events):
+                break
+    finally:
+        stream.detach()
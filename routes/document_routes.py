@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify, Response
+import gzip
+import hashlib
+import json
+import traceback
+
+from config import DOCUMENT_PAGES_MAX_RANGE, DOCUMENT_PAGES_GZIP_MIN_BYTES, PDF_CACHE_MAX_AGE
+from services.document_service import get_page_range, DocumentNotFound
+from services.storage_service import is_valid_hash
+from utils.scheduler import scheduler, INTERACTIVE, SchedulerSaturated
+from routes.errors import saturated_response
+
+# Create a blueprint for document routes
+document_blueprint = Blueprint('documents', __name__)
+
+# Versión del formato de la respuesta: forma parte del ETag, hay que subirla si cambia
+PAGES_SCHEMA_VERSION = 2
+
+@document_blueprint.route("/documents/<file_hash>/pages", methods=["GET"])
+def document_pages(file_hash):
+    if not is_valid_hash(file_hash):
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    try:
+        first = int(request.args.get("from", 1))
+        last = int(request.args.get("to", first + DOCUMENT_PAGES_MAX_RANGE - 1))
+    except ValueError:
+        return jsonify({"error": "Rango de páginas inválido"}), 400
+    if first < 1 or last < first:
+        return jsonify({"error": "Rango de páginas inválido"}), 400
+    last = min(last, first + DOCUMENT_PAGES_MAX_RANGE - 1)
+
+    try:
+        # Las páginas que no están en caché se extraen (o pasan por OCR) aquí: por el planificador
+        total_pages, pages, methods = scheduler.run(INTERACTIVE, get_page_range, file_hash, first, last)
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except DocumentNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        print(f"Error obteniendo las páginas de {file_hash}: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": f"Error obteniendo las páginas: {str(e)}"}), 500
+
+    body = json.dumps({
+        "file_hash": file_hash,
+        "total_pages": total_pages,
+        "from": first,
+        "to": min(last, total_pages),
+        "pages": pages,
+        "methods": methods,
+    }, ensure_ascii=False).encode("utf-8")
+
+    # El ETag sale del contenido (texto y método de cada página), no solo del rango:
+    # si las páginas cambian (p. ej. se vuelven a extraer con OCR) el cliente recibe las nuevas
+    etag = f"v{PAGES_SCHEMA_VERSION}-{hashlib.md5(body).hexdigest()}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype="application/json")
+        if len(body) >= DOCUMENT_PAGES_GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+            body = gzip.compress(body, compresslevel=6)
+            response.headers["Content-Encoding"] = "gzip"
+        response.set_data(body)
+    response.vary.add("Accept-Encoding")
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = PDF_CACHE_MAX_AGE
+    return response
@@ -0,0 +1,8 @@
+from flask import jsonify
+
+
+def saturated_response(error):
+    """Respuesta 503 con Retry-After cuando el planificador está saturado"""
+    response = jsonify({"error": str(error)})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
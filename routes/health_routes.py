@@ -1,6 +1,13 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, Response
 
 from config import DEFAULT_MODEL
+from utils.cache_utils import get_cache_stats
+from utils.singleflight import get_singleflight_stats
+from services.summary_service import summary_prefetcher
+from utils.scheduler import scheduler
+from utils.gemini_client import get_client_stats
+from utils.metrics import render_prometheus, register_collector
+from utils.warmup import warm_up
 
 # Create a blueprint for health routes
 health_blueprint = Blueprint('health', __name__)
@@ -11,7 +18,63 @@ def health_check():
         return jsonify({
             "status": "ok",
             "model": DEFAULT_MODEL,
+            "caches": get_cache_stats(),
+            "singleflight": get_singleflight_stats(),
+            "prefetch": summary_prefetcher.stats(),
+            "scheduler": scheduler.stats(),
         })
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+
+@health_blueprint.route("/warmup", methods=["GET", "POST"])
+def warmup():
+    """Cargar los módulos pesados (p. ej. desde un cron que mantiene la función caliente)"""
+    timings = warm_up()
+    return jsonify({"status": "ok", "imports": {name: round(seconds, 4) for name, seconds in timings.items()}})
+
+@health_blueprint.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@register_collector
+def collect_runtime_metrics():
+    """Métricas calculadas al exportar: cachés, planificador, deduplicación y Gemini"""
+    caches = get_cache_stats()
+    memory_caches = {name: stats for name, stats in caches.items() if name != "persistent"}
+    families = [
+        ("pdfai_cache_hits_total", "counter", "Aciertos por caché",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("pdfai_cache_misses_total", "counter", "Fallos por caché",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("pdfai_cache_evictions_total", "counter", "Entradas expulsadas por caché",
+         [({"cache": name}, stats["evictions"]) for name, stats in memory_caches.items()]),
+        ("pdfai_cache_bytes", "gauge", "Bytes ocupados por caché",
+         [({"cache": name}, stats["bytes"]) for name, stats in caches.items()]),
+        ("pdfai_cache_entries", "gauge", "Entradas por caché",
+         [({"cache": name}, stats["entries"]) for name, stats in caches.items()]),
+    ]
+
+    classes = scheduler.stats()["classes"]
+    families += [
+        ("pdfai_scheduler_queue_depth", "gauge", "Tareas en cola por prioridad",
+         [({"priority": name}, stats["queued"]) for name, stats in classes.items()]),
+        ("pdfai_scheduler_running", "gauge", "Tareas en ejecución por prioridad",
+         [({"priority": name}, stats["running"]) for name, stats in classes.items()]),
+        ("pdfai_scheduler_rejected_total", "counter", "Tareas rechazadas por saturación",
+         [({"priority": name}, stats["rejected"]) for name, stats in classes.items()]),
+    ]
+
+    flights = get_singleflight_stats()
+    families.append(("pdfai_singleflight_deduplicated_total", "counter", "Llamadas duplicadas evitadas",
+                     [({"group": name}, stats["deduplicated"]) for name, stats in flights.items()]))
+
+    gemini = get_client_stats()
+    if gemini is not None:
+        families += [
+            ("pdfai_gemini_in_flight", "gauge", "Llamadas a Gemini en curso", [({}, gemini["in_flight"])]),
+            ("pdfai_gemini_rate_per_second", "gauge", "Ritmo actual del limitador de Gemini", [({}, gemini["rate_per_second"])]),
+            ("pdfai_gemini_retries_total", "counter", "Reintentos de llamadas a Gemini", [({}, gemini["retries"])]),
+            ("pdfai_gemini_throttled_total", "counter", "Respuestas 429/503 de Gemini", [({}, gemini["throttled"])]),
+        ]
+    return families
@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+import json
+
+from services.job_service import get_job
+
+# Create a blueprint for job routes
+job_blueprint = Blueprint('jobs', __name__)
+
+@job_blueprint.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(job.to_dict())
+
+@job_blueprint.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+
+    # Permitir reanudar el stream desde el último evento recibido
+    try:
+        after = int(request.headers.get("Last-Event-ID", -1)) + 1
+    except ValueError:
+        after = 0
+
+    return Response(stream_with_context(generate_job_events(job, after)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def generate_job_events(job, after=0):
+    """Enviar el avance del trabajo como eventos SSE hasta que termine"""
+    while True:
+        events = job.wait_events(after)
+        if not events:
+            if job.finished:
+                break
+            # Comentario SSE para mantener viva la conexión
+            yield ": keep-alive\n\n"
+            continue
+        for index, event in events:
+            yield f"id: {index}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+            after = index + 1
+        if job.finished and after >= len(job.events):
+            break
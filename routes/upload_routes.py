@@ -1,26 +1,21 @@
-from flask import Blueprint, request, jsonify, send_file, make_response
-import io
-import hashlib
+from flask import Blueprint, request, jsonify, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
-from PyPDF2 import PdfReader
 import traceback
-import concurrent.futures
 
-from utils.cache_utils import pdf_cache, add_to_cache
-from utils.text_utils import extract_key_info
-from utils.gemini_utils import generate_text
-from services.pdf_service import generate_summary_background, extract_text_from_pdf_images
+from config import PDF_CACHE_MAX_AGE, UPLOAD_MAX_BYTES
+from utils.cache_utils import pdf_cache, get_from_cache
+from services.upload_service import process_pdf_once
+from services.job_service import submit_upload_job
+from utils.scheduler import scheduler, EXPLANATION, SchedulerSaturated
+from routes.errors import saturated_response
+from utils.upload_utils import upload_hash
+from services.storage_service import pdf_store, is_valid_hash
+from services.document_service import document_metadata
 
 # Create a blueprint for upload routes
 upload_blueprint = Blueprint('upload', __name__)
 
-# Configuración para almacenar archivos PDF
-file_cache = {}
-
-
-# Thread pool for background processing
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
-
 @upload_blueprint.route("/upload", methods=["POST", "OPTIONS"])
 def upload_pdf():
     # Handle preflight OPTIONS request
@@ -35,86 +30,45 @@ def upload_pdf():
         if file.filename == "":
             return jsonify({"error": "No file selected"}), 400
 
-        # Read file content for hashing
-        file_content = file.read()
+        # El cuerpo ya se leyó por bloques a un archivo temporal calculando el MD5
+        file_hash = upload_hash(file)
         
-        # Create a hash of the file content
-        file_hash = hashlib.md5(file_content).hexdigest()
-        
-        # Check if we've already processed this file
-        if file_hash in pdf_cache:
+        # Check if we've already processed this file (sin parsear el PDF)
+        include_pages = request.values.get("include_pages") in ("1", "true")
+        cached_result = get_from_cache(pdf_cache, file_hash)
+        # Sin explicación (Gemini falló la otra vez) se pasa por process_pdf_once para reintentarla
+        if cached_result is not None and cached_result.get("explanation") is not None:
                 print(f"Using cached result for file: {file.filename}")
-                return jsonify(pdf_cache[file_hash])
+                return jsonify(document_metadata(file_hash, cached_result, include_pages))
 
-        # Guarda el PDF en memoria en lugar de disco
-        file_cache[file_hash] = file_content  # <-- Almacena bytes en memoria
+        # Guarda el PDF en el almacenamiento configurado (disco o memoria) si aún no está
+        if not pdf_store.exists(file_hash):
+            pdf_store.put_file(file_hash, file.stream)
 
-        # Genera una URL virtual (no es un archivo real)
-        #file_url = f"http://localhost:5000/api/temp-pdf/{file_hash}"
-        file_url = f"https://pdf-ai-teal.vercel.app/api/temp-pdf/{file_hash}"
+        # Modo trabajo: responder enseguida y procesar en segundo plano
+        if request.values.get("mode") == "job" or request.values.get("async") in ("1", "true"):
+            job = submit_upload_job(file_hash, file.filename)
+            return jsonify({
+                "job_id": job.id,
+                "file_hash": file_hash,
+                "status_url": f"/jobs/{job.id}",
+                "events_url": f"/jobs/{job.id}/events",
+            }), 202
 
-        # Create a file-like object from the content
-        file_io = io.BytesIO(file_content)
-        
-        # Extract text from PDF
+        # Extract text from PDF (PyPDF2 lee el archivo temporal, sin copiarlo)
         try:
-            reader = PdfReader(file_io)
-            total_pages = len(reader.pages)
-            
-            # Extract text from each page separately
-            pages = {}
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
-                if page_text:  # Check if page_text is not None or empty
-                    pages[i + 1] = page_text
-                else:
-                    print(f"Warning: Could not extract text from page {i+1} in {file.filename}")
-            
-            if not pages:  # Si no se extrajo texto normal
-                ocr_text = extract_text_from_pdf_images(file_content)
-                if ocr_text:
-                    pages = {1: ocr_text}  # Usar el texto de OCR
-            
-            # Get text from first page for explanation
-            first_page_text = pages.get(1, "")
-            
-            # Extract key information to reduce context size
-            key_info = extract_key_info(first_page_text)
-            
-            # Generate a simple explanation using Ollama - use a more efficient prompt
-            prompt = f"""
-                Eres un experto en análisis de documentos. Tu tarea es proporcionar una explicación clara y concisa del siguiente texto. Sigue estas instrucciones:
-
-                1. Identifica el tema principal del texto.
-                2. Extrae los puntos clave o ideas más importantes.
-                3. Proporciona un resumen breve (máximo 200 palabras y mayor a 150) que capture la esencia del texto.
-                4. Si el texto contiene datos numéricos, fechas o nombres propios, menciónalos de manera relevante.
-                5. Responde únicamente en español y utiliza un tono profesional.
-
-                Texto:
-                {key_info}
-                """
-            explanation = generate_text(prompt, max_tokens=100)
-            
-            # Create result with page-by-page text
-            result = {
-                "total_pages": total_pages,
-                "pages": pages,
-                "explanation": explanation,
-                "file_url": file_url  # Incluir la URL del archivo en la respuesta
-            }
-            
-            add_to_cache(pdf_cache, file_hash, result)  # Cache the result
-            
-            # Start generating summary for the second page in the background
-            if 2 in pages:
-                executor.submit(generate_summary_background, pages[2], 2, file_hash)
-            
-            return jsonify(result)
+            result = scheduler.run(EXPLANATION, process_pdf_once, file.stream, file_hash, file.filename)
+            return jsonify(document_metadata(file_hash, result, include_pages))
+        except SchedulerSaturated:
+            raise
         except Exception as e:
             print(f"Error processing PDF: {str(e)}")
             traceback.print_exc()
             return jsonify({"error": f"Error processing PDF: {str(e)}"}), 500
+    except SchedulerSaturated as e:
+        return saturated_response(e)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"El archivo supera el tamaño máximo de {UPLOAD_MAX_BYTES} bytes"}), 413
     except Exception as e:
         print(f"Unexpected error in upload_pdf: {str(e)}")
         traceback.print_exc()
@@ -122,12 +76,23 @@ def upload_pdf():
 
 @upload_blueprint.route('/api/temp-pdf/<file_hash>', methods=['GET'])
 def serve_temp_pdf(file_hash):
-    if file_hash not in file_cache:
+    if not is_valid_hash(file_hash) or not pdf_store.exists(file_hash):
         return jsonify({"error": "Archivo no encontrado"}), 404
-    
-    # Crea una respuesta con los bytes del PDF
-    pdf_bytes = file_cache[file_hash]
-    response = make_response(pdf_bytes)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'inline; filename={file_hash}.pdf'
-    return response
\ No newline at end of file
+
+    # Servir desde disco cuando es posible (sendfile); si no, desde memoria.
+    # send_file con conditional=True responde a Range (206) e If-None-Match (304).
+    source = pdf_store.path(file_hash) or pdf_store.open(file_hash)
+    if source is None:
+        return jsonify({"error": "Archivo no encontrado"}), 404
+
+    # El contenido está direccionado por hash, así que el hash es un ETag fuerte
+    response = send_file(
+        source,
+        mimetype='application/pdf',
+        download_name=f'{file_hash}.pdf',
+        conditional=True,
+        etag=file_hash,
+        max_age=PDF_CACHE_MAX_AGE,
+    )
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
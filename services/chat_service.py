@@ -1,6 +1,113 @@
-# This file would contain more complex chat-related business logic
-# Currently, most of the chat logic is in the routes, but as the application grows,
-# you might want to move more complex processing here
+from config import CHAT_CONTEXT_MAX_CHARS
+from utils.text_utils import extract_relevant_context
+from utils.cache_utils import generate_text_hash
+from services.document_service import build_context, get_page_text, parse_page_range, DocumentNotFound
+
+# Validación de peticiones y construcción de prompts de /chat y /summarize,
+# compartidas por las rutas de Flask y el servidor ASGI.
+
+
+class ChatRequestError(Exception):
+    """Petición inválida; status es el código HTTP a devolver"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def build_chat_prompt(question, context):
+    return f"""
+        Eres un asistente inteligente que responde preguntas basadas en un contexto proporcionado. Sigue estas instrucciones:
+
+        1. Lee cuidadosamente la pregunta y el contexto.
+        2. Proporciona una respuesta clara, precisa y bien estructurada.
+        3. Si la pregunta no puede responderse con el contexto, respondelo con tus conocimientos sobre el tema.
+        4. Limita la respuesta a un máximo de 200 palabras.
+        5. Responde únicamente en español.
+
+        Pregunta:
+        {question}
+
+        Contexto:
+        {context}
+        """
+
+def prepare_chat_prompt(data):
+    """Validar una petición de /chat y devolver el prompt; lanza ChatRequestError"""
+    if not data or "question" not in data:
+        raise ChatRequestError("Falta la pregunta")
+
+    question = data["question"]
+    context = data.get("context", "")
+    file_hash = data.get("file_hash")
+
+    # Si el documento ya está procesado, construir el contexto en el servidor
+    server_context = None
+    if file_hash:
+        try:
+            server_context = build_context(file_hash, question, parse_page_range(data))
+        except DocumentNotFound as e:
+            if not context:
+                raise ChatRequestError(str(e), 404)
+        except ValueError:
+            raise ChatRequestError("Rango de páginas inválido")
+
+    # El contexto del servidor ya respeta el presupuesto; solo se recorta el que envía el cliente
+    if server_context:
+        context = server_context
+    elif len(context) > CHAT_CONTEXT_MAX_CHARS:
+        context = extract_relevant_context(question, context, max_length=CHAT_CONTEXT_MAX_CHARS)
+
+    # Si no hay contexto, devolver un error
+    if not context:
+        raise ChatRequestError("Falta el contexto")
+
+    return build_chat_prompt(question, context)
+
+def prepare_summary_request(data):
+    """
+    Validar una petición de /summarize y devolver (file_hash, page_num, text, text_hash).
+    page_num es 0 cuando el resumen no corresponde a una página concreta; text_hash es
+    None si text es el de la página guardada en el servidor y, si no (texto en la
+    petición o un rango), un hash del texto para la clave del resumen en la caché.
+    """
+    if not data or ("text" not in data and "file_hash" not in data):
+        raise ChatRequestError("Falta el texto para resumir")
+
+    page = data.get("page", 0)
+    file_hash = data.get("file_hash", "unknown")
+    page_num = int(page) if str(page).isdigit() else 0
+
+    # El texto puede venir en la petición o resolverse en el servidor a partir del file_hash
+    page_text = None
+    if "text" in data:
+        text = data["text"]
+        if file_hash != "unknown" and page_num:
+            try:
+                page_text = get_page_text(file_hash, page_num)
+            except DocumentNotFound:
+                pass
+    else:
+        try:
+            page_range = parse_page_range(data)
+            if page_range is None:
+                raise ChatRequestError("Falta la página para resumir")
+            first, last = page_range
+            if first == last:
+                text = get_page_text(file_hash, first)
+                if first == page_num:
+                    page_text = text
+            else:
+                text = build_context(file_hash, page_range=page_range)
+        except DocumentNotFound as e:
+            raise ChatRequestError(str(e), 404)
+        except ValueError:
+            raise ChatRequestError("Rango de páginas inválido")
+        if not text:
+            raise ChatRequestError("La página no tiene texto", 404)
+
+    text_hash = None if text == page_text else generate_text_hash(str(text))
+    return file_hash, page_num, text, text_hash
 
 def process_complex_query(question, context, additional_context=None):
     """
@@ -9,4 +116,3 @@ def process_complex_query(question, context, additional_context=None):
     """
     # This would contain more complex processing logic
     pass
-
@@ -0,0 +1,177 @@
+from config import CHAT_CONTEXT_MAX_CHARS, CHAT_OUTLINE_TOKENS
+from utils.cache_utils import pdf_cache, page_cache, get_from_cache, add_to_cache, generate_page_cache_key
+from utils.search_utils import retrieve_document_context
+from utils.outline_utils import build_outline, get_document_outline
+from services.extraction_service import open_reader, extract_page_text, find_sparse_pages, read_pdf_bytes
+from services.pdf_service import extract_text_from_pdf_images
+from services.storage_service import pdf_store
+
+
+# Por debajo de esto no merece la pena incluir el trozo de una página que no cabe entera
+MIN_PARTIAL_PAGE_CHARS = 200
+
+
+class DocumentNotFound(Exception):
+    """El documento no está (o ya no está) en la caché del servidor"""
+
+
+def get_document_pages(file_hash):
+    """Devolver el texto por página de un documento ya procesado"""
+    document = get_from_cache(pdf_cache, file_hash) if file_hash else None
+    if not document:
+        raise DocumentNotFound(f"Documento no encontrado: {file_hash}")
+    return document.get("pages") or {}
+
+def document_metadata(file_hash, document, include_pages=False):
+    """Respuesta de /upload: los datos del documento sin el texto de cada página"""
+    outline = document.get("outline")
+    if outline is None:
+        # Resultados guardados antes de que existiera el índice
+        outline = build_outline(document.get("pages") or {})
+    metadata = {
+        "file_hash": file_hash,
+        "total_pages": document.get("total_pages"),
+        "explanation": document.get("explanation"),
+        "file_url": document.get("file_url"),
+        "outline": outline,
+        "pages_url": f"/documents/{file_hash}/pages",
+        # Páginas que no salieron del texto del PDF (el resto se extrajo con PyPDF2)
+        "extraction": summarize_methods(document.get("extraction_methods")),
+    }
+    if include_pages:
+        metadata["pages"] = document.get("pages") or {}
+    return metadata
+
+def summarize_methods(methods):
+    """{page: method} -> {"ocr_pages": [...], "empty_pages": [...]} (None si no se conoce)"""
+    if methods is None:
+        return None
+    return {
+        "ocr_pages": [page_num for page_num, method in methods.items() if method == "ocr"],
+        "empty_pages": [page_num for page_num, method in methods.items() if method == "empty"],
+    }
+
+def get_page_range(file_hash, first, last):
+    """
+    Texto de las páginas [first, last]: ({page: text}, {page: method}), junto con el
+    número total de páginas. methods indica "text", "ocr" o "empty" (vacío si no se conoce).
+    Si el documento ya no está en pdf_cache, las páginas se extraen bajo demanda del
+    PDF guardado (con OCR para las escaneadas) y se cachean una a una en page_cache.
+    """
+    document = get_from_cache(pdf_cache, file_hash) if file_hash else None
+    if document:
+        total_pages = document.get("total_pages") or 0
+        pages = document.get("pages") or {}
+        methods = document.get("extraction_methods") or {}
+        numbers = range(first, min(last, total_pages) + 1)
+        return (total_pages, {n: pages.get(n, "") for n in numbers},
+                {n: methods[n] for n in numbers if n in methods})
+
+    result = {}
+    methods = {}
+    total_pages = get_from_cache(page_cache, generate_page_cache_key(file_hash, 0))
+    if total_pages is not None:
+        for page_num in range(first, min(last, total_pages) + 1):
+            entry = get_from_cache(page_cache, generate_page_cache_key(file_hash, page_num))
+            if entry is None:
+                break
+            result[page_num], methods[page_num] = entry
+        else:
+            return total_pages, result, methods
+
+    pdf_file = pdf_store.open(file_hash)
+    if pdf_file is None:
+        raise DocumentNotFound(f"Documento no encontrado: {file_hash}")
+    with pdf_file:
+        reader = open_reader(pdf_file)
+        total_pages = len(reader.pages)
+        add_to_cache(page_cache, generate_page_cache_key(file_hash, 0), total_pages)
+        extracted = {}
+        for page_num in range(first, min(last, total_pages) + 1):
+            if page_num not in result:
+                extracted[page_num] = extract_page_text(reader, page_num)
+                methods[page_num] = "text" if extracted[page_num].strip() else "empty"
+
+        # Las páginas escaneadas del rango pasan por OCR (el caché por imagen evita repetirlo)
+        sparse_pages = find_sparse_pages(reader, extracted, sorted(extracted))
+        if sparse_pages:
+            ocr_pages = extract_text_from_pdf_images(read_pdf_bytes(pdf_file), page_numbers=sparse_pages) or {}
+            for page_num, text in ocr_pages.items():
+                if len(text.strip()) > len(extracted[page_num].strip()):
+                    extracted[page_num], methods[page_num] = text, "ocr"
+
+        for page_num, text in extracted.items():
+            result[page_num] = text
+            add_to_cache(page_cache, generate_page_cache_key(file_hash, page_num), (text, methods[page_num]))
+    return total_pages, dict(sorted(result.items())), dict(sorted(methods.items()))
+
+def get_page_text(file_hash, page):
+    """Texto de una página concreta (cadena vacía si la página no tiene texto)"""
+    return get_document_pages(file_hash).get(int(page), "")
+
+def parse_page_range(data):
+    """
+    Leer el rango de páginas de la petición: "page", "page_from"/"page_to"
+    o "pages" como "3-5". Devuelve (first, last) o None si no se indicó.
+    """
+    if data.get("pages"):
+        first, _, last = str(data["pages"]).partition("-")
+        return int(first), int(last or first)
+    if data.get("page_from") or data.get("page_to"):
+        first = int(data.get("page_from") or data.get("page_to"))
+        last = int(data.get("page_to") or first)
+        return min(first, last), max(first, last)
+    if data.get("page"):
+        return int(data["page"]), int(data["page"])
+    return None
+
+def pages_context(pages, max_length):
+    """
+    Páginas en orden, con su número, mientras quepan en max_length caracteres
+    (la primera que no cabe entera se recorta). Devuelve (texto, si cupieron todas).
+    """
+    parts = []
+    used = 0
+    for page_num in sorted(pages):
+        if not pages[page_num].strip():
+            continue
+        part = f"[Página {page_num}]\n{pages[page_num]}"
+        if used + len(part) > max_length:
+            if max_length - used > MIN_PARTIAL_PAGE_CHARS:
+                parts.append(part[:max_length - used])
+            return '\n\n'.join(parts), False
+        parts.append(part)
+        used += len(part) + 2
+    return '\n\n'.join(parts), True
+
+def build_context(file_hash, question="", page_range=None, max_length=CHAT_CONTEXT_MAX_CHARS):
+    """
+    Construir el contexto para una pregunta a partir del texto cacheado.
+    Con un rango de páginas se van añadiendo páginas hasta llenar el presupuesto;
+    si el rango no cabe, o no hay rango, se usan los fragmentos más relevantes
+    precedidos de un mapa del documento (outline) para no perder la visión de conjunto.
+    Si la búsqueda no encuentra nada, se usan el mapa y las primeras páginas.
+    """
+    pages = get_document_pages(file_hash)
+
+    if page_range is None:
+        outline = get_document_outline(file_hash, pages)
+        # El mapa va primero y nunca ocupa más de la mitad del presupuesto
+        document_map = outline.digest(min(CHAT_OUTLINE_TOKENS, max_length // 8))[:max_length // 2]
+        # Lo que queda (menos el separador) es para los fragmentos con sus etiquetas
+        budget = max(max_length - len(document_map) - 2, 0)
+        context = retrieve_document_context(question, file_hash, pages, max_length=budget, outline=outline)
+        if not context:
+            context, _ = pages_context(pages, budget)
+        # Si algo se pasara del presupuesto se recorta el final, no el mapa
+        return '\n\n'.join(part for part in (document_map, context) if part)[:max_length]
+
+    first, last = page_range
+    selected = {n: text for n, text in pages.items() if first <= n <= last}
+    context, complete = pages_context(selected, max_length)
+    if complete:
+        return context
+
+    # El rango no cabe entero: buscar dentro de esas páginas
+    range_key = f"{file_hash}:{first}-{last}"
+    return retrieve_document_context(question, range_key, selected, max_length=max_length) or context
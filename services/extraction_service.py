@@ -0,0 +1,227 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    EXTRACTION_WORKERS,
+    EXTRACTION_PARALLEL_MIN_PAGES,
+    EXTRACTION_SHARD_SIZE,
+    EXTRACTION_MP_CONTEXT,
+    EXTRACTION_WORKER_CACHE_BYTES,
+    OCR_PAGE_MIN_CHARS,
+)
+from utils.metrics import timed
+
+# Lectores de PDF de cada proceso trabajador por extracción: los bloques del mismo
+# documento que llegan al mismo proceso no vuelven a analizar el archivo.
+# PdfReader carga el archivo entero, así que se limitan por bytes, no por número
+_worker_readers = OrderedDict()  # token -> (reader, bytes)
+_worker_readers_bytes = 0
+
+def _worker_reader(pdf_path, token, max_bytes=EXTRACTION_WORKER_CACHE_BYTES):
+    global _worker_readers_bytes
+    cached = _worker_readers.get(token)
+    if cached is not None:
+        _worker_readers.move_to_end(token)
+        return cached[0]
+
+    from PyPDF2 import PdfReader
+    reader = PdfReader(pdf_path)
+    size = os.path.getsize(pdf_path)
+    if size > max_bytes:
+        # No cabe en el presupuesto: se usa solo para este bloque
+        return reader
+    _worker_readers[token] = (reader, size)
+    _worker_readers_bytes += size
+    while _worker_readers_bytes > max_bytes:
+        _, (_, evicted) = _worker_readers.popitem(last=False)
+        _worker_readers_bytes -= evicted
+    return reader
+
+# Un solo pool de procesos para toda la aplicación: los intérpretes se arrancan
+# una vez, no en cada subida
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context(EXTRACTION_MP_CONTEXT))
+        return _pool
+
+def _discard_pool(pool):
+    """Descartar un pool roto (p. ej. un proceso murió) para que se cree otro"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def open_reader(pdf):
+    """PdfReader sobre un archivo abierto (sin copiarlo) o sobre bytes"""
+    # PyPDF2 se importa al abrir el primer PDF, no al arrancar la aplicación
+    from PyPDF2 import PdfReader
+    if hasattr(pdf, "read"):
+        pdf.seek(0)
+        return PdfReader(pdf)
+    return PdfReader(io.BytesIO(pdf))
+
+def read_pdf_bytes(pdf):
+    """Contenido completo del PDF (solo para quien necesita los bytes, como el OCR)"""
+    if not hasattr(pdf, "read"):
+        return pdf
+    pdf.seek(0)
+    data = pdf.read()
+    pdf.seek(0)
+    return data
+
+def _extract_range(reader, first_page, last_page, on_page=None):
+    """Extraer el texto de las páginas [first_page, last_page] (numeradas desde 1)"""
+    results = []
+    for page_num in range(first_page, last_page + 1):
+        results.append((page_num, extract_page_text(reader, page_num)))
+        if on_page:
+            on_page(1)
+    return results
+
+def extract_page_text(reader, page_num):
+    """Texto de una sola página (cadena vacía si no se pudo extraer)"""
+    try:
+        return reader.pages[page_num - 1].extract_text() or ""
+    except Exception as e:
+        print(f"Error extrayendo el texto de la página {page_num}: {str(e)}")
+        return ""
+
+def page_has_images(page, depth=2):
+    """True si la página dibuja alguna imagen (directamente o dentro de un Form XObject)"""
+    try:
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else {}
+        xobjects = resources.get("/XObject")
+        if xobjects is None:
+            return False
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                return True
+            if subtype == "/Form" and depth > 0 and page_has_images(xobject, depth - 1):
+                return True
+        return False
+    except Exception as e:
+        # Ante la duda, mejor intentar el OCR que perder la página
+        print(f"Error buscando imágenes en la página: {str(e)}")
+        return True
+
+def find_sparse_pages(reader, pages, page_numbers=None, min_chars=OCR_PAGE_MIN_CHARS):
+    """
+    Páginas sin texto útil (menos de min_chars caracteres) que contienen imágenes:
+    las candidatas a OCR. Por defecto se revisan todas las páginas del documento.
+    """
+    if page_numbers is None:
+        page_numbers = range(1, len(reader.pages) + 1)
+    return [
+        page_num for page_num in page_numbers
+        if len(pages.get(page_num, "").strip()) < min_chars and page_has_images(reader.pages[page_num - 1])
+    ]
+
+def _extract_shard(pdf_path, token, first_page, last_page):
+    return _extract_range(_worker_reader(pdf_path, token), first_page, last_page)
+
+def split_shards(total_pages, shard_size=EXTRACTION_SHARD_SIZE):
+    """Dividir el rango de páginas en bloques (first_page, last_page)"""
+    shard_size = max(1, shard_size)
+    return [
+        (first, min(first + shard_size - 1, total_pages))
+        for first in range(1, total_pages + 1, shard_size)
+    ]
+
+def _extract_parallel(pdf_path, total_pages, workers, shard_size, on_page=None):
+    """Extraer los bloques en el pool compartido; los procesos abren pdf_path directamente"""
+    pool = _get_pool(workers)
+    results = []
+    # Cada extracción tiene su token: la misma ruta (p. ej. un temporal reutilizado) puede ser otro PDF
+    token = uuid.uuid4().hex
+    futures = [pool.submit(_extract_shard, pdf_path, token, first, last)
+               for first, last in split_shards(total_pages, shard_size)]
+    try:
+        for future in as_completed(futures):
+            shard_results = future.result()
+            results.extend(shard_results)
+            if on_page:
+                on_page(len(shard_results))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    return results
+
+def _extract_parallel_from_bytes(pdf_bytes, total_pages, workers, shard_size, on_page=None):
+    # Sin ruta en disco: un archivo temporal evita enviar una copia del PDF con cada bloque
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(pdf_bytes)
+    try:
+        return _extract_parallel(f.name, total_pages, workers, shard_size, on_page)
+    finally:
+        os.unlink(f.name)
+
+@timed("pdf_extract")
+def extract_pages_text(pdf, reader=None, workers=EXTRACTION_WORKERS,
+                       min_pages=EXTRACTION_PARALLEL_MIN_PAGES, shard_size=EXTRACTION_SHARD_SIZE,
+                       on_progress=None, source_path=None):
+    """
+    Extraer el texto de cada página del PDF (bytes o un archivo abierto).
+
+    Los documentos pequeños se procesan en serie; los grandes se dividen en bloques
+    que se extraen en paralelo en un ProcessPoolExecutor compartido por toda la aplicación.
+    Devuelve (total_pages, pages) donde pages solo incluye las páginas con texto,
+    ordenadas por número de página.
+    on_progress(done_pages, total_pages) se llama a medida que se completan páginas.
+    source_path es la ruta del PDF en disco, si la hay: los procesos trabajadores
+    la abren directamente (si no, se escribe el PDF en un archivo temporal).
+    """
+    if reader is None:
+        reader = open_reader(pdf)
+    total_pages = len(reader.pages)
+
+    done = [0]
+    def on_page(count):
+        done[0] += count
+        if on_progress:
+            on_progress(done[0], total_pages)
+
+    results = None
+    if workers > 1 and total_pages >= min_pages:
+        try:
+            if source_path:
+                results = _extract_parallel(source_path, total_pages, workers, shard_size, on_page)
+            else:
+                results = _extract_parallel_from_bytes(read_pdf_bytes(pdf), total_pages, workers, shard_size, on_page)
+        except Exception as e:
+            # Por ejemplo en entornos sin soporte de multiprocessing
+            print(f"Error en la extracción paralela, se usará la extracción en serie: {str(e)}")
+            traceback.print_exc()
+            results = None
+            done[0] = 0
+
+    if results is None:
+        results = _extract_range(reader, 1, total_pages, on_page)
+
+    pages = {}
+    for page_num, text in sorted(results):
+        if text:
+            pages[page_num] = text
+        else:
+            print(f"Warning: Could not extract text from page {page_num}")
+    return total_pages, pages
@@ -0,0 +1,132 @@
+import threading
+import time
+import traceback
+import uuid
+
+from config import JOB_TTL_SECONDS
+from utils.cache_utils import LRUCache
+from utils.singleflight import upload_flight
+from utils.scheduler import scheduler, EXPLANATION
+from services.upload_service import process_pdf_once
+from services.document_service import document_metadata
+
+
+class UploadJob:
+    """Estado de un trabajo de procesamiento de PDF en segundo plano"""
+
+    def __init__(self, file_hash, filename):
+        self.id = uuid.uuid4().hex
+        self.file_hash = file_hash
+        self.filename = filename
+        self.status = "queued"  # queued, running, done, error
+        self.stage = "queued"
+        self.pages_total = None
+        self.pages_done = 0
+        self.explanation = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.events = []
+        self._cond = threading.Condition()
+        self._record_event()
+
+    def _record_event(self):
+        self.events.append(self.to_dict(include_result=False))
+
+    def update(self, stage=None, **fields):
+        """Actualizar el estado y notificar a quien esté esperando eventos"""
+        with self._cond:
+            if stage:
+                self.stage = stage
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            self._record_event()
+            self._cond.notify_all()
+
+    def progress(self, stage, **data):
+        """Callback de avance para process_pdf"""
+        self.update(stage,
+                    pages_done=data.get("pages_done", self.pages_done),
+                    pages_total=data.get("pages_total", self.pages_total),
+                    explanation=data.get("explanation", self.explanation))
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def wait_events(self, after, timeout=15):
+        """Devolver los eventos posteriores al índice `after`, esperando hasta `timeout` segundos"""
+        with self._cond:
+            if len(self.events) <= after and not self.finished:
+                self._cond.wait(timeout)
+            return list(enumerate(self.events))[after:]
+
+    def to_dict(self, include_result=True):
+        data = {
+            "job_id": self.id,
+            "file_hash": self.file_hash,
+            "status": self.status,
+            "stage": self.stage,
+            "pages_total": self.pages_total,
+            "pages_extracted": self.pages_done,
+            "explanation_ready": self.explanation is not None,
+            "explanation": self.explanation,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+# Trabajos recientes (se olvidan pasado JOB_TTL_SECONDS)
+jobs = LRUCache("jobs", max_entries=1000, ttl=JOB_TTL_SECONDS)
+
+# Trabajo activo por archivo: las subidas repetidas del mismo PDF reutilizan el trabajo
+_active_jobs = {}
+_active_lock = threading.Lock()
+
+def _run_job(job):
+    try:
+        job.update("extracting", status="running")
+        # El PDF ya está en el almacenamiento de documentos: se lee de ahí
+        result = process_pdf_once(None, job.file_hash, job.filename, progress=job.progress)
+        job.update("done", status="done", result=document_metadata(job.file_hash, result),
+                   explanation=result.get("explanation"))
+    except Exception as e:
+        print(f"Error en el trabajo {job.id}: {str(e)}")
+        traceback.print_exc()
+        job.update("error", status="error", error=f"Error processing PDF: {str(e)}")
+    finally:
+        with _active_lock:
+            if _active_jobs.get(job.file_hash) is job:
+                del _active_jobs[job.file_hash]
+
+def submit_upload_job(file_hash, filename=""):
+    """
+    Encolar el procesamiento de un PDF ya guardado en pdf_store y devolver el trabajo creado.
+    Lanza SchedulerSaturated si la cola de subidas está llena.
+    """
+    with _active_lock:
+        active_job = _active_jobs.get(file_hash)
+        if active_job is not None:
+            upload_flight.record_duplicate()
+            return active_job
+        job = _active_jobs[file_hash] = UploadJob(file_hash, filename)
+
+    try:
+        # El planificador aplica el límite de cola (backpressure)
+        scheduler.submit(EXPLANATION, _run_job, job)
+    except Exception:
+        with _active_lock:
+            del _active_jobs[file_hash]
+        raise
+
+    jobs.set(job.id, job)
+    return job
+
+def get_job(job_id):
+    return jobs.get(job_id)
@@ -1,50 +1,159 @@
-from utils.text_utils import extract_summary_text
-from utils.gemini_utils import generate_text_internal
-import traceback
-from pdf2image import convert_from_bytes
-import pytesseract
-import numpy as np
-
-def generate_summary_background(page_text, page_num, file_hash):
-    """Generate a summary in the background SIN CACHÉ"""
+from services.extraction_service import extract_pages_text, find_sparse_pages, open_reader, read_pdf_bytes
+import hashlib
+import threading
+import concurrent.futures
+
+from config import OCR_LANG, OCR_DPI, OCR_FAST_DPI, OCR_MIN_CHARS, OCR_WORKERS, OCR_WINDOW, OCR_MAX_IN_FLIGHT
+from utils.cache_utils import ocr_cache, get_from_cache, add_to_cache, generate_ocr_cache_key
+from utils.metrics import timed, timer
+
+# Pool de hilos para el OCR: pytesseract lanza un proceso de Tesseract por
+# página, así que los hilos permiten usar varios núcleos.
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
+
+def _get_ocr_executor():
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = concurrent.futures.ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        return _ocr_executor
+
+@timed("ocr_render")
+def _render_pages(pdf_bytes, first_page, last_page, dpi):
+    """Renderizar solo las páginas [first_page, last_page] a imágenes"""
+    from pdf2image import convert_from_bytes
+    return convert_from_bytes(pdf_bytes, dpi=dpi, first_page=first_page, last_page=last_page)
+
+def _image_hash(image):
+    """Hash del contenido de una imagen renderizada (modo, tamaño y píxeles)"""
+    with timer("ocr_hash"):
+        digest = hashlib.md5(f"{image.mode}:{image.size}".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+def _ocr_page(pdf_bytes, page_num, image, dpi, lang):
+    """
+    Reconocer una página; si la pasada rápida da poco texto, repetir a mayor resolución.
+    El resultado se cachea por el hash de la imagen: un escaneo repetido (o una portada
+    compartida por varios documentos) no se vuelve a reconocer.
+    """
+    import pytesseract
     try:
-        # Extract a shorter version of the text
-        short_text = extract_summary_text(page_text)
-        
-        # Create a more efficient prompt for summarization
-        prompt = f"""
-            Eres un experto en síntesis de información. Tu tarea es generar un resumen del siguiente texto siguiendo estas pautas:
-
-            1. Identifica el propósito principal del texto.
-            2. Extrae los puntos clave y los organiza de manera lógica.
-            3. Incluye ejemplos o datos relevantes si están disponibles.
-            4. Limita el resumen a 150-200 palabras.
-            5. Usa un lenguaje claro y profesional.
-            6. Responde únicamente en español.
-
-            Texto:
-            {short_text}
-            """
-        # Generate new response without cache
-        return generate_text_internal(prompt, max_tokens=150)
-    except Exception as e:
-        print(f"Error generating summary for page {page_num}: {str(e)}")
-        traceback.print_exc()
-        return f"Error generando el resumen: {str(e)}"
+        cache_key = generate_ocr_cache_key(_image_hash(image), lang)
+        text = get_from_cache(ocr_cache, cache_key)
+        if text is not None:
+            return page_num, text
+        with timer("ocr_recognize"):
+            text = pytesseract.image_to_string(image, lang=lang)
+    finally:
+        image.close()
+
+    if dpi < OCR_DPI and len(text.strip()) < OCR_MIN_CHARS:
+        images = _render_pages(pdf_bytes, page_num, page_num, OCR_DPI)
+        for retry_image in images:
+            try:
+                with timer("ocr_recognize"):
+                    text = pytesseract.image_to_string(retry_image, lang=lang)
+            finally:
+                retry_image.close()
+    add_to_cache(ocr_cache, cache_key, text)
+    return page_num, text
 
-def extract_text_from_pdf_images(pdf_bytes):
+def _page_windows(page_numbers, window):
+    """Agrupar las páginas en ventanas contiguas de como máximo `window` páginas"""
+    windows = []
+    for page_num in sorted(page_numbers):
+        if windows and page_num == windows[-1][1] + 1 and page_num - windows[-1][0] < window:
+            windows[-1][1] = page_num
+        else:
+            windows.append([page_num, page_num])
+    return windows
+
+def extract_text_from_pdf_images(pdf_bytes, page_numbers=None, lang=OCR_LANG):
+    """
+    OCR en streaming: renderiza las páginas en ventanas acotadas y las reconoce en
+    paralelo, limitando el número de imágenes en memoria.
+    Devuelve un diccionario {número de página: texto} o None si no se obtuvo texto.
+    """
     try:
-        # 1. Convertir PDF a imágenes
-        images = convert_from_bytes(pdf_bytes, dpi=300)
-        
-        # 2. Procesar cada imagen con OCR
-        full_text = ""
-        for i, image in enumerate(images):
-            text = pytesseract.image_to_string(image, lang='spa')
+        if page_numbers is None:
+            from pdf2image import pdfinfo_from_bytes
+            total_pages = pdfinfo_from_bytes(pdf_bytes)["Pages"]
+            page_numbers = range(1, total_pages + 1)
+
+        dpi = OCR_FAST_DPI if 0 < OCR_FAST_DPI < OCR_DPI else OCR_DPI
+        window = max(1, min(OCR_WINDOW, OCR_MAX_IN_FLIGHT))
+        in_flight = threading.BoundedSemaphore(max(window, OCR_MAX_IN_FLIGHT))
+        executor = _get_ocr_executor()
+        futures = []
+
+        for first_page, last_page in _page_windows(page_numbers, window):
+            # Esperar a que haya hueco antes de renderizar la siguiente ventana
+            for _ in range(last_page - first_page + 1):
+                in_flight.acquire()
+            try:
+                images = _render_pages(pdf_bytes, first_page, last_page, dpi)
+            except Exception:
+                for _ in range(last_page - first_page + 1):
+                    in_flight.release()
+                raise
+
+            # Liberar los huecos de las páginas que no se pudieron renderizar
+            for _ in range(last_page - first_page + 1 - len(images)):
+                in_flight.release()
+
+            for offset, image in enumerate(images):
+                future = executor.submit(_ocr_page, pdf_bytes, first_page + offset, image, dpi, lang)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+            del images
+
+        pages = {}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                page_num, text = future.result()
+            except Exception as e:
+                print(f"Error en OCR de una página: {str(e)}")
+                continue
             if text.strip():
-                full_text += f"\n--- Página {i+1} ---\n{text}\n"
-        
-        return full_text if full_text else None
+                pages[page_num] = text
+
+        return dict(sorted(pages.items())) if pages else None
     except Exception as e:
         print(f"Error en OCR: {str(e)}")
         return None
+
+@timed("hybrid_extract")
+def extract_text_hybrid(pdf_file, source_path=None, on_progress=None, on_ocr=None, lang=OCR_LANG):
+    """
+    Extraer el texto con PyPDF2 y pasar por OCR solo las páginas escaneadas: las que
+    tienen imágenes pero (casi) nada de texto. Sirve para documentos mixtos.
+    Devuelve (total_pages, pages, methods): pages solo incluye las páginas con texto y
+    methods indica para cada página "text", "ocr" o "empty".
+    on_ocr(page_numbers, total_pages) se llama antes de empezar el OCR.
+    """
+    reader = open_reader(pdf_file)
+    total_pages, pages = extract_pages_text(pdf_file, reader=reader, on_progress=on_progress,
+                                            source_path=source_path)
+    methods = {page_num: "text" for page_num in pages}
+
+    sparse_pages = find_sparse_pages(reader, pages)
+    if not sparse_pages and not pages:
+        # Sin texto y sin imágenes detectables (p. ej. imágenes en línea): OCR de todo
+        sparse_pages = list(range(1, total_pages + 1))
+
+    if sparse_pages:
+        if on_ocr:
+            on_ocr(sparse_pages, total_pages)
+        ocr_pages = extract_text_from_pdf_images(read_pdf_bytes(pdf_file), page_numbers=sparse_pages, lang=lang) or {}
+        for page_num in sparse_pages:
+            text = ocr_pages.get(page_num, "")
+            # Quedarse con el OCR solo si mejora lo que extrajo PyPDF2
+            if len(text.strip()) > len(pages.get(page_num, "").strip()):
+                pages[page_num] = text
+                methods[page_num] = "ocr"
+
+    for page_num in range(1, total_pages + 1):
+        methods.setdefault(page_num, "empty")
+    return total_pages, dict(sorted(pages.items())), dict(sorted(methods.items()))
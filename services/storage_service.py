@@ -0,0 +1,235 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+
+from config import PDF_STORE_BACKEND, PDF_STORE_DIR, PDF_STORE_MAX_BYTES, UPLOAD_COPY_CHUNK_SIZE
+from utils.cache_utils import file_cache, get_from_cache, add_to_cache
+from utils.persistent_cache import ensure_private_directory
+
+# Los PDFs se identifican por el hash MD5 de su contenido
+_HASH_RE = re.compile(r'^[0-9a-f]{32}$')
+
+def is_valid_hash(file_hash):
+    """Comprobar que el identificador es un hash MD5 (evita rutas arbitrarias)"""
+    return bool(file_hash) and bool(_HASH_RE.match(file_hash))
+
+
+class MemoryPDFStore:
+    """Almacena los PDFs en memoria, dentro de la caché acotada file_cache"""
+
+    def __init__(self, cache=file_cache):
+        self.cache = cache
+
+    def exists(self, file_hash):
+        return file_hash in self.cache
+
+    def put(self, file_hash, data):
+        add_to_cache(self.cache, file_hash, bytes(data))
+
+    def put_file(self, file_hash, f):
+        """Guardar el contenido de un archivo abierto (deja el cursor al principio)"""
+        if file_hash in self.cache:
+            return
+        f.seek(0)
+        self.put(file_hash, f.read())
+        f.seek(0)
+
+    def get_bytes(self, file_hash):
+        return get_from_cache(self.cache, file_hash)
+
+    def open(self, file_hash):
+        """Devolver un objeto de archivo binario con el PDF, o None"""
+        data = self.get_bytes(file_hash)
+        if data is None:
+            return None
+        return io.BytesIO(data)
+
+    def path(self, file_hash):
+        # En memoria no hay ruta en disco
+        return None
+
+    def size(self, file_hash):
+        data = self.get_bytes(file_hash)
+        return len(data) if data is not None else None
+
+
+class DiskPDFStore:
+    """
+    Almacena los PDFs en disco direccionados por contenido (<dir>/<ab>/<hash>.pdf).
+    Los archivos se sirven directamente desde disco (sendfile) sin copiarlos en memoria.
+    El directorio es privado (0700) y un archivo solo se usa si su contenido coincide
+    con su hash: lo escrito se comprueba al escribirlo y lo que ya estaba en disco
+    (p. ej. de un arranque anterior), la primera vez que se pide.
+    """
+
+    def __init__(self, root=PDF_STORE_DIR, max_bytes=PDF_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        ensure_private_directory(self.root)
+        # hash -> tamaño de los archivos comprobados, del más antiguo al más reciente
+        self._verified = OrderedDict()
+        # Los que ya estaban en disco al arrancar y aún no se han comprobado
+        self._unverified = {}
+        self._total = 0
+        self._load_existing()
+
+    def _load_existing(self):
+        """Tamaño total y orden de antigüedad de lo que ya hay en disco (solo al arrancar)"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".pdf") and is_valid_hash(name[:-4]):
+                    stat = os.stat(os.path.join(dirpath, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        self._unverified = {file_hash: size for _, file_hash, size in sorted(entries)}
+        self._total = sum(self._unverified.values())
+
+    def _path(self, file_hash):
+        if not is_valid_hash(file_hash):
+            return None
+        return os.path.join(self.root, file_hash[:2], f"{file_hash}.pdf")
+
+    def _check(self, file_hash):
+        """Comprobar (una sola vez) que el archivo en disco corresponde a su hash"""
+        with self._lock:
+            if file_hash in self._verified:
+                return True
+        path = self._path(file_hash)
+        if path is None or not os.path.exists(path):
+            return False
+        valid = _file_md5(path) == file_hash
+        with self._lock:
+            size = self._unverified.pop(file_hash, None)
+            if size is None:
+                size = os.path.getsize(path)
+                self._total += size
+            if valid:
+                self._verified[file_hash] = size
+                return True
+            self._total -= size
+        print(f"El PDF guardado {file_hash} no coincide con su hash, se descarta")
+        _remove(path)
+        return False
+
+    def path(self, file_hash):
+        return self._path(file_hash) if self._check(file_hash) else None
+
+    def exists(self, file_hash):
+        return self._check(file_hash)
+
+    def put(self, file_hash, data):
+        self._write(file_hash, io.BytesIO(data))
+
+    def put_file(self, file_hash, f):
+        """Copiar por bloques el contenido de un archivo abierto (deja el cursor al principio)"""
+        self._write(file_hash, f)
+
+    def _write(self, file_hash, f):
+        path = self._path(file_hash)
+        if path is None:
+            raise ValueError(f"Hash de archivo inválido: {file_hash}")
+        if self._check(file_hash):
+            return
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # Escritura atómica: primero a un temporal y luego se renombra (reemplazando
+        # cualquier archivo que hubiera); el MD5 se calcula mientras se copia
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        md5 = hashlib.md5()
+        size = 0
+        try:
+            f.seek(0)
+            with open(tmp_path, "wb") as out:
+                for chunk in iter(lambda: f.read(UPLOAD_COPY_CHUNK_SIZE), b""):
+                    md5.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            f.seek(0)
+            if md5.hexdigest() != file_hash:
+                raise ValueError(f"El contenido no corresponde al hash {file_hash}")
+            os.replace(tmp_path, path)
+        except BaseException:
+            _remove(tmp_path)
+            raise
+        with self._lock:
+            previous = self._verified.pop(file_hash, None)
+            if previous is None:
+                previous = self._unverified.pop(file_hash, 0)
+            self._verified[file_hash] = size
+            self._total += size - previous
+        self._prune()
+
+    def get_bytes(self, file_hash):
+        f = self.open(file_hash)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    def open(self, file_hash):
+        """Devolver un objeto de archivo binario con el PDF, o None"""
+        path = self.path(file_hash)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            return None
+
+    def size(self, file_hash):
+        path = self.path(file_hash)
+        try:
+            return os.path.getsize(path) if path else None
+        except OSError:
+            return None
+
+    def _prune(self):
+        """Borrar los PDFs más antiguos si se supera el espacio máximo (con el total llevado en memoria)"""
+        if not self.max_bytes:
+            return
+        doomed = []
+        with self._lock:
+            # Primero los que ya había en disco y nadie ha pedido, luego los más antiguos
+            for entries in (self._unverified, self._verified):
+                while entries and self._total > self.max_bytes:
+                    file_hash = next(iter(entries))
+                    self._total -= entries.pop(file_hash)
+                    doomed.append(file_hash)
+        for file_hash in doomed:
+            _remove(self._path(file_hash))
+
+
+def _file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_COPY_CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error borrando {path} del almacenamiento de PDFs: {str(e)}")
+        traceback.print_exc()
+
+
+def create_pdf_store(backend=PDF_STORE_BACKEND):
+    """Crear el almacenamiento de PDFs configurado"""
+    if backend == "memory":
+        return MemoryPDFStore()
+    try:
+        return DiskPDFStore()
+    except OSError as e:
+        # Por ejemplo en sistemas de archivos de solo lectura
+        print(f"No se pudo usar el almacenamiento en disco ({str(e)}), usando memoria")
+        return MemoryPDFStore()
+
+pdf_store = create_pdf_store()
@@ -0,0 +1,180 @@
+import threading
+import time
+import traceback
+import uuid
+
+from config import (
+    SSE_COALESCE_MIN_CHARS,
+    SSE_COALESCE_MAX_DELAY,
+    SSE_HEARTBEAT_SECONDS,
+    SSE_REPLAY_TTL_SECONDS,
+    SSE_REPLAY_MAX_STREAMS,
+    SSE_REPLAY_MAX_BYTES,
+    SSE_RESUME_GRACE_SECONDS,
+)
+from utils.cache_utils import LRUCache
+from utils.metrics import counter, gauge
+
+streams_active = gauge("pdfai_chat_streams_active", "Respuestas del chat generándose en segundo plano")
+stream_resumes = counter("pdfai_chat_stream_resumes_total", "Streams del chat reanudados con Last-Event-ID")
+streams_abandoned = counter("pdfai_chat_streams_abandoned_total",
+                            "Generaciones detenidas porque nadie reanudó el stream a tiempo")
+
+
+class ChatStream:
+    """
+    Respuesta del chat en curso: un hilo consume el stream de Gemini y agrupa los
+    chunks en eventos numerados que se guardan durante un tiempo, de modo que un
+    cliente que pierde la conexión puede reanudar con Last-Event-ID sin repetir la llamada.
+    """
+
+    def __init__(self, min_chars=SSE_COALESCE_MIN_CHARS, max_delay=SSE_COALESCE_MAX_DELAY):
+        self.id = uuid.uuid4().hex
+        self.events = []  # [(event, data)]; el índice es el número del evento
+        self.finished = False
+        self.abandoned = False
+        self.min_chars = min_chars
+        self.max_delay = max_delay
+        self._pending = []
+        self._pending_chars = 0
+        self._pending_since = None
+        self._readers = 0
+        # Sin lectores desde su creación: si nadie llega a leerlo, también se abandona
+        self._detached_since = time.monotonic()
+        self._cond = threading.Condition()
+
+    def event_id(self, index):
+        return f"{self.id}-{index}"
+
+    def _seal(self):
+        # Convertir el texto pendiente en un evento
+        if self._pending:
+            self.events.append(("message", "".join(self._pending)))
+            self._pending, self._pending_chars, self._pending_since = [], 0, None
+            self._cond.notify_all()
+
+    def _seal_if_due(self):
+        if self._pending and (self._pending_chars >= self.min_chars or
+                              time.monotonic() - self._pending_since >= self.max_delay):
+            self._seal()
+
+    def feed(self, text):
+        """Añadir texto generado; se envía cuando hay suficiente o vence max_delay"""
+        if not text:
+            return
+        with self._cond:
+            self._pending.append(text)
+            self._pending_chars += len(text)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            self._seal_if_due()
+
+    def finish(self, error=None):
+        with self._cond:
+            self._seal()
+            if error:
+                self.events.append(("error", error))
+            self.events.append(("done", ""))
+            self.finished = True
+            self._cond.notify_all()
+
+    def attach(self):
+        with self._cond:
+            self._readers += 1
+            self._detached_since = None
+
+    def detach(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._detached_since = time.monotonic()
+
+    def unattended_for(self, seconds):
+        """True si nadie está leyendo el stream desde hace más de `seconds` segundos"""
+        with self._cond:
+            return self._detached_since is not None and time.monotonic() - self._detached_since > seconds
+
+    def wait_events(self, after, timeout=SSE_HEARTBEAT_SECONDS):
+        """
+        Devolver [(índice, event, data)] posteriores al índice `after`, esperando hasta
+        `timeout` segundos. El texto pendiente se envía en cuanto vence max_delay.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._seal_if_due()
+                if len(self.events) > after or self.finished:
+                    break
+                now = time.monotonic()
+                wait = deadline - now
+                if self._pending:
+                    wait = min(wait, self._pending_since + self.max_delay - now)
+                if wait <= 0 and not self._pending:
+                    break
+                self._cond.wait(max(wait, 0.001))
+            return [(index, event, data) for index, (event, data) in enumerate(self.events[after:], after)]
+
+    def memory_size(self):
+        return sum(len(data) + 64 for _, data in self.events) + self._pending_chars + 256
+
+
+# Streams recientes para poder reanudarlos (se olvidan pasado SSE_REPLAY_TTL_SECONDS).
+# El búfer es de cada proceso: con varios workers, la reanudación solo funciona si el
+# balanceador envía la reconexión al mismo proceso (afinidad por el prefijo de
+# Last-Event-ID, que es el X-Stream-Id). Si llega a otro, no encuentra el stream y
+# /chat genera la respuesta de nuevo con un evento `restart`.
+chat_streams = LRUCache("chat_streams", max_entries=SSE_REPLAY_MAX_STREAMS, max_bytes=SSE_REPLAY_MAX_BYTES,
+                        ttl=SSE_REPLAY_TTL_SECONDS)
+
+def _pump(stream, response_stream):
+    """Consumir el stream de Gemini en segundo plano y volcarlo en el ChatStream"""
+    error = None
+    try:
+        for chunk in response_stream:
+            stream.feed(chunk.text)
+            # Si el cliente se fue y no ha vuelto, dejar de consumir cuota
+            if stream.unattended_for(SSE_RESUME_GRACE_SECONDS):
+                stream.abandoned = True
+                streams_abandoned.inc()
+                error = "El stream se abandonó"
+                break
+    except Exception as e:
+        print(f"Error en el stream del chat {stream.id}: {str(e)}")
+        traceback.print_exc()
+        error = f"Error en el streaming: {str(e)}"
+    finally:
+        close = getattr(response_stream, "close", None)
+        if close is not None:
+            close()
+        stream.finish(error)
+        streams_active.dec()
+        # Guardar de nuevo: tamaño real y el TTL cuenta desde el final de la generación
+        chat_streams.set(stream.id, stream)
+
+def start_chat_stream(response_stream):
+    """Empezar a consumir response_stream en un hilo propio y devolver el ChatStream"""
+    stream = ChatStream()
+    chat_streams.set(stream.id, stream)
+    streams_active.inc()
+    threading.Thread(target=_pump, args=(stream, response_stream), name=f"chat-stream-{stream.id[:8]}",
+                     daemon=True).start()
+    return stream
+
+def parse_event_id(last_event_id):
+    """'<stream_id>-<índice>' -> (stream_id, índice) o (None, None) si no es válido"""
+    stream_id, _, index = (last_event_id or "").strip().rpartition("-")
+    if not stream_id or not index.isdigit():
+        return None, None
+    return stream_id, int(index)
+
+def resume_chat_stream(last_event_id):
+    """Devolver (stream, siguiente índice) para un Last-Event-ID, o (None, 0) si ya no existe"""
+    stream_id, index = parse_event_id(last_event_id)
+    stream = chat_streams.get(stream_id) if stream_id else None
+    if stream is None:
+        return None, 0
+    stream_resumes.inc()
+    return stream, index + 1
+
+def get_chat_stream(stream_id):
+    return chat_streams.get(stream_id)
@@ -0,0 +1,300 @@
+import concurrent.futures
+import re
+import threading
+from collections import deque
+
+from config import (
+    SUMMARY_BATCH_TOKEN_BUDGET,
+    SUMMARY_BATCH_MAX_PAGES,
+    SUMMARY_BATCH_CONCURRENCY,
+    SUMMARY_PREFETCH_LOOKAHEAD,
+)
+from utils.cache_utils import summary_cache, generate_summary_cache_key, generate_text_hash, get_from_cache, add_to_cache
+from utils.gemini_utils import generate_text, generate_text_internal, generate_text_internal_async, GenerationError
+from utils.singleflight import SingleFlight, register_group
+from utils.scheduler import scheduler, EXPLANATION, BACKGROUND, SchedulerSaturated
+from utils.text_utils import estimate_tokens
+
+SUMMARY_GUIDELINES = """
+        1. Identifica el propósito principal del texto.
+        2. Extrae los puntos clave y los organiza de manera lógica.
+        3. Incluye ejemplos o datos relevantes si están disponibles.
+        4. Limita el resumen a 150-200 palabras.
+        5. Usa un lenguaje claro y profesional.
+        6. Responde únicamente en español.
+        7. IMPORTANTE: Formatea tu respuesta usando Markdown para mejorar la legibilidad.
+           - No uses titulos ni encabezados, ve directo al contenido
+           - Usa **texto** para negritas en conceptos importantes
+           - Usa *texto* para cursivas en definiciones o términos clave
+           - Usa listas con - o 1. para enumerar puntos importantes
+           - Usa > para citas o ejemplos destacados
+"""
+
+# Separador que se pide a Gemini entre los resúmenes de un lote
+_PAGE_MARKER_RE = re.compile(r'^\s*=+\s*P[ÁA]GINA\s+(\d+)\s*=+\s*$', re.IGNORECASE | re.MULTILINE)
+
+def build_summary_prompt(text):
+    """Prompt para resumir una sola página"""
+    return f"""
+        Eres un experto en síntesis de información. Tu tarea es generar un resumen del siguiente texto siguiendo estas pautas:
+{SUMMARY_GUIDELINES}
+        Texto:
+        {text}
+        """
+
+def build_batch_prompt(batch):
+    """Prompt para resumir varias páginas [(page, text)] en una sola llamada"""
+    sections = "\n\n".join(f"=== PÁGINA {page_num} ===\n{text}" for page_num, text in batch)
+    return f"""
+        Eres un experto en síntesis de información. Vas a recibir varias páginas de un documento.
+        Genera un resumen independiente para CADA página siguiendo estas pautas:
+{SUMMARY_GUIDELINES}
+        8. Empieza el resumen de cada página con una línea que contenga solo "=== PÁGINA N ===",
+           donde N es el número de la página, y no añadas nada fuera de esos bloques.
+
+        Páginas:
+        {sections}
+        """
+
+def summarize_text(text):
+    """Resumir una sola página (sin streaming; lanza GenerationError si falla)"""
+    return generate_text_internal(build_summary_prompt(text), stream=False)
+
+# Resúmenes de página en curso (background, prefetch o /summarize) por clave de caché
+summary_flight = register_group(SingleFlight("summary"))
+
+def get_cached_summary(file_hash, page_num):
+    return get_from_cache(summary_cache, generate_summary_cache_key(file_hash, page_num))
+
+def get_page_summary(file_hash, page_num, text, text_hash=None):
+    """
+    Resumen de una página: desde la caché, esperando al resumen que ya esté en
+    curso para esa página, o generándolo y guardándolo en la caché.
+    text_hash distingue un texto que no es el de la página guardada (ver prepare_summary_request).
+    """
+    key = generate_summary_cache_key(file_hash, page_num, text_hash)
+    cached_summary = get_from_cache(summary_cache, key)
+    if cached_summary:
+        return cached_summary
+    return summary_flight.do(key, _summarize_and_cache, key, text)
+
+def _summarize_and_cache(key, text):
+    cached_summary = get_from_cache(summary_cache, key)
+    if cached_summary:
+        return cached_summary
+    return _store_summary(key, summarize_text(text))
+
+def _store_summary(key, summary):
+    # Los errores llegan como GenerationError y nunca pasan por aquí
+    if summary:
+        add_to_cache(summary_cache, key, summary)
+    return summary
+
+async def get_page_summary_async(file_hash, page_num, text, text_hash=None):
+    """Versión asíncrona de get_page_summary (comparte caché y llamadas en curso)"""
+    key = generate_summary_cache_key(file_hash, page_num, text_hash)
+    cached_summary = get_from_cache(summary_cache, key)
+    if cached_summary:
+        return cached_summary
+    return await summary_flight.do_async(key, _summarize_and_cache_async, key, text)
+
+async def _summarize_and_cache_async(key, text):
+    cached_summary = get_from_cache(summary_cache, key)
+    if cached_summary:
+        return cached_summary
+    return _store_summary(key, await generate_text_internal_async(build_summary_prompt(text)))
+
+def pack_pages(pages, token_budget=SUMMARY_BATCH_TOKEN_BUDGET, max_pages=SUMMARY_BATCH_MAX_PAGES):
+    """Agrupar páginas [(page, text)] en lotes que caben en el presupuesto de tokens"""
+    batches = []
+    current = []
+    used = 0
+    for page_num, text in pages:
+        tokens = estimate_tokens(text)
+        if current and (used + tokens > token_budget or len(current) >= max_pages):
+            batches.append(current)
+            current = []
+            used = 0
+        current.append((page_num, text))
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def split_batch_response(response, page_numbers):
+    """Separar la respuesta de un lote en resúmenes por página: {page: summary}"""
+    summaries = {}
+    matches = list(_PAGE_MARKER_RE.finditer(response or ""))
+    for i, match in enumerate(matches):
+        page_num = int(match.group(1))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        summary = response[match.end():end].strip()
+        if page_num in page_numbers and summary:
+            summaries[page_num] = summary
+    return summaries
+
+def summarize_batch(batch, keys=None):
+    """
+    Resumir un lote: devuelve ({page: summary}, {page: error}). Si falla la llamada
+    del lote se lanza GenerationError; las páginas que falten en una respuesta válida
+    se resumen por separado y, si eso también falla, se informan como error.
+    Con keys ({page: clave de summary_cache}) cada resumen se guarda en la caché.
+    """
+    keys = keys or {}
+    if len(batch) == 1:
+        page_num, text = batch[0]
+        summary = summarize_text(text)
+        if page_num in keys:
+            _store_summary(keys[page_num], summary)
+        return {page_num: summary}, {}
+
+    page_numbers = {page_num for page_num, _ in batch}
+    summaries = split_batch_response(generate_text(build_batch_prompt(batch)), page_numbers)
+    errors = {}
+    for page_num, text in batch:
+        if page_num not in summaries:
+            try:
+                summaries[page_num] = summarize_text(text)
+            except GenerationError as e:
+                errors[page_num] = str(e)
+                continue
+        if page_num in keys:
+            _store_summary(keys[page_num], summaries[page_num])
+    return summaries, errors
+
+def summarize_pages_stream(pages, file_hash=None, stored_text=True, concurrency=SUMMARY_BATCH_CONCURRENCY):
+    """
+    Resumir páginas [(page, text)] en lotes concurrentes y devolver un iterador de
+    {"page", "summary"} (o {"page", "error"}) a medida que termina cada página.
+    Con file_hash las páginas ya resumidas salen de summary_cache y las nuevas se
+    guardan allí; stored_text=False indica que el texto no es el de la página
+    guardada (viene en la petición) y la clave incluye su hash.
+    Los primeros lotes se encolan al llamar (puede lanzar SchedulerSaturated).
+    """
+    cached = []
+    keys = {}
+    pending = []
+    for page_num, text in pages:
+        if not text or not text.strip():
+            continue
+        if file_hash:
+            text_hash = None if stored_text else generate_text_hash(text)
+            key = generate_summary_cache_key(file_hash, page_num, text_hash)
+            summary = get_from_cache(summary_cache, key)
+            if summary:
+                cached.append({"page": page_num, "summary": summary})
+                continue
+            keys[page_num] = key
+        pending.append((page_num, text))
+
+    batches = deque(pack_pages(pending))
+    running = {}
+    # Como mucho `concurrency` lotes en el planificador a la vez
+    while batches and len(running) < max(1, concurrency):
+        batch = batches.popleft()
+        running[scheduler.submit(EXPLANATION, summarize_batch, batch, keys)] = batch
+    return _collect_batches(cached, running, batches, keys)
+
+def _collect_batches(cached, running, batches, keys):
+    try:
+        yield from cached
+        while running:
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                batch = running.pop(future)
+                if batches:
+                    try:
+                        next_batch = batches.popleft()
+                        running[scheduler.submit(EXPLANATION, summarize_batch, next_batch, keys)] = next_batch
+                    except SchedulerSaturated as e:
+                        batches.appendleft(next_batch)
+                        if not running:
+                            # No queda nada en curso que libere sitio: informar del resto
+                            for pending_batch in batches:
+                                for page_num, _ in pending_batch:
+                                    yield {"page": page_num, "error": str(e)}
+                            batches.clear()
+                try:
+                    summaries, errors = future.result()
+                except Exception as e:
+                    print(f"Error resumiendo el lote de páginas {[p for p, _ in batch]}: {str(e)}")
+                    message = str(e) if isinstance(e, GenerationError) else f"Error generando el resumen: {str(e)}"
+                    for page_num, _ in batch:
+                        yield {"page": page_num, "error": message}
+                    continue
+                for page_num, _ in batch:
+                    if page_num in errors:
+                        yield {"page": page_num, "error": errors[page_num]}
+                    else:
+                        yield {"page": page_num, "summary": summaries.get(page_num)}
+    finally:
+        # Si el cliente se desconecta, no seguir con los lotes pendientes
+        for future in running:
+            future.cancel()
+
+
+class SummaryPrefetcher:
+    """
+    Resume por adelantado las próximas páginas a la que está leyendo el usuario.
+    Si el lector salta a otra zona, se cancelan los resúmenes pendientes fuera de la ventana.
+    """
+
+    def __init__(self, lookahead=SUMMARY_PREFETCH_LOOKAHEAD):
+        self.lookahead = lookahead
+        self._pending = {}  # file_hash -> {page: future}
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.cancelled = 0
+
+    def on_reader_page(self, file_hash, page_num, pages):
+        """El lector está en page_num: programar las siguientes `lookahead` páginas"""
+        window = set(range(page_num + 1, page_num + 1 + self.lookahead))
+        scheduled = []
+        stale = []
+        with self._lock:
+            pending = self._pending.setdefault(file_hash, {})
+            for other_page in [p for p in pending if p not in window]:
+                stale.append(pending.pop(other_page))
+            for next_page in sorted(window):
+                text = pages.get(next_page)
+                if not text or next_page in pending or get_cached_summary(file_hash, next_page):
+                    continue
+                try:
+                    future = scheduler.submit(BACKGROUND, get_page_summary, file_hash, next_page, text)
+                except SchedulerSaturated:
+                    # El prefetch es opcional: si no hay sitio, se omite
+                    break
+                pending[next_page] = future
+                scheduled.append((next_page, future))
+                self.scheduled += 1
+            if not pending:
+                del self._pending[file_hash]
+
+        # Fuera del lock: cancel() y add_done_callback() pueden ejecutar _forget en este mismo hilo
+        for future in stale:
+            if future.cancel():
+                with self._lock:
+                    self.cancelled += 1
+        for next_page, future in scheduled:
+            future.add_done_callback(lambda done, p=next_page: self._forget(file_hash, p, done))
+        return [next_page for next_page, _ in scheduled]
+
+    def _forget(self, file_hash, page_num, future):
+        with self._lock:
+            pending = self._pending.get(file_hash)
+            # La página pudo volver a programarse con otro future
+            if pending is not None and pending.get(page_num) is future:
+                del pending[page_num]
+                if not pending:
+                    del self._pending[file_hash]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": sum(len(p) for p in self._pending.values()),
+                "scheduled": self.scheduled,
+                "cancelled": self.cancelled,
+            }
+
+
+summary_prefetcher = SummaryPrefetcher()
@@ -0,0 +1,120 @@
+from config import EXPLANATION_DIGEST_TOKENS, OUTLINE_MAX_ENTRIES
+from utils.cache_utils import pdf_cache, get_from_cache, add_to_cache
+from utils.text_utils import extract_key_info
+from utils.outline_utils import get_document_outline
+from utils.gemini_utils import generate_text, GenerationError
+from utils.singleflight import upload_flight
+from services.pdf_service import extract_text_hybrid
+from services.summary_service import summary_prefetcher
+from services.storage_service import pdf_store
+
+def build_file_url(file_hash):
+    """Genera la URL virtual desde la que se sirve el PDF"""
+    #return f"http://localhost:5000/api/temp-pdf/{file_hash}"
+    return f"https://pdf-ai-teal.vercel.app/api/temp-pdf/{file_hash}"
+
+def _notify(progress, stage, **data):
+    if progress:
+        progress(stage, **data)
+
+def generate_explanation(file_hash, pages):
+    """Explicación breve del documento (lanza GenerationError si Gemini falla)"""
+    # Get text from first page for explanation
+    first_page_text = pages.get(1, "")
+
+    # Resumen estructural de todo el documento (título, secciones y frases clave)
+    # dentro de un presupuesto fijo de tokens, con la primera página como introducción
+    outline = get_document_outline(file_hash, pages)
+    key_info = outline.digest(EXPLANATION_DIGEST_TOKENS, intro=extract_key_info(first_page_text))
+
+    # Generate a simple explanation using Ollama - use a more efficient prompt
+    # (la indentación forma parte del prompt y de su clave en la caché: no cambiarla)
+    prompt = f"""
+                Eres un experto en análisis de documentos. Tu tarea es proporcionar una explicación clara y concisa del siguiente texto. Sigue estas instrucciones:
+
+                1. Identifica el tema principal del texto.
+                2. Extrae los puntos clave o ideas más importantes.
+                3. Proporciona un resumen breve (máximo 200 palabras y mayor a 150) que capture la esencia del texto.
+                4. Si el texto contiene datos numéricos, fechas o nombres propios, menciónalos de manera relevante.
+                5. Responde únicamente en español y utiliza un tono profesional.
+
+                Texto:
+                {key_info}
+                """
+    return generate_text(prompt, max_tokens=100)
+
+def process_pdf(pdf_file, file_hash, filename="", progress=None):
+    """
+    Extraer el texto del PDF, generar la explicación y guardar el resultado en pdf_cache.
+    pdf_file es un archivo abierto (o los bytes del PDF); PyPDF2 lo lee directamente.
+    progress(stage, **data) recibe el avance de cada etapa (extracting, ocr, explaining).
+    """
+    # Extract text from each page separately (in parallel for large documents);
+    # las páginas escaneadas (imágenes sin texto) se reconocen con OCR una a una
+    _notify(progress, "extracting")
+    total_pages, pages, methods = extract_text_hybrid(
+        pdf_file,
+        source_path=pdf_store.path(file_hash) if pdf_store.exists(file_hash) else None,
+        on_progress=lambda done, total: _notify(progress, "extracting", pages_done=done, pages_total=total),
+        on_ocr=lambda page_numbers, total: _notify(progress, "ocr", pages_total=total),
+    )
+
+    _notify(progress, "explaining", pages_done=len(pages), pages_total=total_pages)
+
+    outline = get_document_outline(file_hash, pages)
+    try:
+        explanation = generate_explanation(file_hash, pages)
+        shown_explanation = explanation
+    except GenerationError as e:
+        # El error se muestra pero no se guarda: la próxima subida vuelve a intentarlo
+        explanation, shown_explanation = None, str(e)
+    _notify(progress, "explained", explanation=shown_explanation)
+
+    # Create result with page-by-page text (las páginas se sirven aparte, en /documents/<hash>/pages)
+    result = {
+        "total_pages": total_pages,
+        "pages": pages,
+        "explanation": explanation,
+        "file_url": build_file_url(file_hash),  # Incluir la URL del archivo en la respuesta
+        "outline": outline.headings_list(OUTLINE_MAX_ENTRIES),
+        "extraction_methods": methods,  # "text", "ocr" o "empty" por página
+    }
+
+    add_to_cache(pdf_cache, file_hash, result)  # Cache the result
+
+    # Start generating summaries for the next pages in the background (the reader starts on page 1)
+    summary_prefetcher.on_reader_page(file_hash, 1, pages)
+
+    return result if explanation is not None else dict(result, explanation=shown_explanation)
+
+def explain_cached_result(file_hash, cached_result):
+    """Generar la explicación que faltó (Gemini falló) en un resultado ya cacheado"""
+    try:
+        explanation = generate_explanation(file_hash, cached_result.get("pages") or {})
+    except GenerationError as e:
+        return dict(cached_result, explanation=str(e))
+    return add_to_cache(pdf_cache, file_hash, dict(cached_result, explanation=explanation))
+
+def process_pdf_once(pdf_file, file_hash, filename="", progress=None):
+    """
+    Procesar el PDF una sola vez aunque lleguen varias subidas iguales a la vez:
+    las peticiones duplicadas esperan al procesamiento en curso y comparten el resultado.
+    Con pdf_file=None el PDF se lee del almacenamiento de documentos.
+    """
+    return upload_flight.do(file_hash, _process_if_missing, pdf_file, file_hash, filename, progress)
+
+def _process_if_missing(pdf_file, file_hash, filename, progress):
+    # Otra subida del mismo archivo pudo terminar justo antes
+    cached_result = get_from_cache(pdf_cache, file_hash)
+    if cached_result is not None:
+        if cached_result.get("explanation") is None:
+            return explain_cached_result(file_hash, cached_result)
+        return cached_result
+    if pdf_file is not None:
+        return process_pdf(pdf_file, file_hash, filename, progress)
+
+    stored_file = pdf_store.open(file_hash)
+    if stored_file is None:
+        raise FileNotFoundError(f"El PDF {file_hash} ya no está en el almacenamiento")
+    with stored_file:
+        return process_pdf(stored_file, file_hash, filename, progress)
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# La configuración se lee al importar config: fijarla antes de importar la aplicación.
+# Sin Gemini real, sin caché persistente y con los PDFs en memoria.
+os.environ.setdefault("DEFAULT_MODEL", "gemini-test")
+os.environ["GEMINI_BACKEND"] = "fake"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["PDF_STORE_BACKEND"] = "memory"
+os.environ["WARMUP_ON_START"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import asgi
+from utils.cache_utils import summary_cache, generate_summary_cache_key
+from utils.fake_gemini import FakeGeminiBackend
+from utils.gemini_client import GeminiClient, get_client, set_client
+
+
+@pytest.fixture
+def backend():
+    previous = get_client()
+    fake = FakeGeminiBackend(latency=0, first_chunk_delay=0, chunk_delay=0)
+    set_client(GeminiClient(fake, max_retries=0))
+    yield fake
+    set_client(previous)
+
+
+async def call(path, payload, method="POST", disconnect_after=None):
+    """Llamar a la aplicación ASGI y devolver (status, headers, body)"""
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Sin más cuerpo: el cliente sigue conectado hasta disconnect_after segundos
+        await asyncio.sleep(disconnect_after if disconnect_after is not None else 3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [(b"content-type", b"application/json")],
+             "query_string": b"", "root_path": "", "scheme": "http", "server": ("test", 80),
+             "http_version": "1.1", "client": ("127.0.0.1", 1234)}
+    await asgi.application(scope, receive, send)
+    start = next(m for m in sent if m["type"] == "http.response.start") if sent else None
+    data = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    if start is None:
+        return None, {}, data
+    return start["status"], dict(start["headers"]), data
+
+
+def test_chat_streams_events(backend):
+    status, headers, body = asyncio.run(call("/chat", {"question": "¿Qué dice?", "context": "Un contexto " * 20}))
+    assert status == 200 and headers[b"content-type"] == b"text/event-stream"
+    text = body.decode("utf-8")
+    assert "event: done" in text
+    assert "Respuesta simulada" in text
+
+
+def test_chat_validation_error(backend):
+    status, _, body = asyncio.run(call("/chat", {"context": "sin pregunta"}))
+    assert status == 400 and json.loads(body)["error"] == "Falta la pregunta"
+
+
+def test_invalid_json():
+    status, _, _ = asyncio.run(call("/chat", None))
+    assert status == 400
+
+
+def test_summarize_caches_page_summary(backend):
+    file_hash = "c" * 32
+    payload = {"file_hash": file_hash, "page": 3, "text": "Texto de la página tres " * 10}
+    try:
+        status, _, body = asyncio.run(call("/summarize", payload))
+        assert status == 200
+        summary = json.loads(body)["summary"]
+        # El texto llega en la petición: se cachea con su propio hash, no como el de la página
+        assert summary_cache.get(generate_summary_cache_key(file_hash, 3)) is None
+        status, _, body = asyncio.run(call("/summarize", payload))
+        assert json.loads(body)["summary"] == summary and len(backend.calls) == 1
+    finally:
+        summary_cache.clear()
+
+
+def test_summarize_generation_error_is_502(backend):
+    backend.errors = [400]
+    status, _, body = asyncio.run(call("/summarize", {"text": "Algo que resumir"}))
+    assert status == 502 and "error" in json.loads(body)
+
+
+def test_disconnect_cancels_generation(backend):
+    backend.first_chunk_delay = 5
+    started = time.monotonic()
+    status, _, body = asyncio.run(call("/chat", {"question": "¿Qué?", "context": "Contexto " * 20},
+                                       disconnect_after=0.05))
+    # La respuesta termina en cuanto el cliente se va, sin esperar al primer chunk
+    assert time.monotonic() - started < 2
+    assert status == 200 and b"event: done" not in body
+    assert asgi._active_streams == 0
+
+
+def test_saturated_server_returns_503(monkeypatch):
+    monkeypatch.setattr(asgi, "ASGI_MAX_STREAMS", 0)
+    status, headers, _ = asyncio.run(call("/chat", {"question": "¿Qué?", "context": "x"}))
+    assert status == 503 and b"retry-after" in headers
+
+
+def test_other_routes_go_to_flask():
+    status, _, body = asyncio.run(call("/metrics", None, method="GET"))
+    assert status == 200 and b"pdfai_stage_duration_seconds" in body
+
+
+def test_error_after_stream_started_only_closes_body(monkeypatch):
+    async def failing(send, data):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"data: hola\n\n", "more_body": True})
+        raise RuntimeError("fallo a mitad del stream")
+
+    monkeypatch.setitem(asgi.ROUTES, "/chat", failing)
+    sent = []
+
+    async def run():
+        messages = [{"type": "http.request", "body": b"{}"}]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        await asgi.application({"type": "http", "method": "POST", "path": "/chat"}, receive, send)
+
+    asyncio.run(run())
+    assert [m["type"] for m in sent].count("http.response.start") == 1
+    assert sent[-1] == {"type": "http.response.body", "body": b""}
+
+
+def test_error_before_response_is_json_500(monkeypatch):
+    async def failing(send, data):
+        raise RuntimeError("fallo")
+
+    monkeypatch.setitem(asgi.ROUTES, "/chat", failing)
+    status, _, body = asyncio.run(call("/chat", {}))
+    assert status == 500 and "fallo" in json.loads(body)["error"]
@@ -0,0 +1,41 @@
+import io
+
+from PyPDF2 import PdfReader
+
+from benchmarks.run_benchmarks import compare, percentile
+from benchmarks.synthetic_pdf import image_pdf, text_pdf
+
+
+def test_text_pdf_is_readable_and_reproducible():
+    data = text_pdf(pages=3, lines_per_page=5, seed=1)
+    assert data == text_pdf(pages=3, lines_per_page=5, seed=1)
+    assert data != text_pdf(pages=3, lines_per_page=5, seed=2)
+    reader = PdfReader(io.BytesIO(data))
+    assert len(reader.pages) == 3
+    assert all(page.extract_text().strip() for page in reader.pages)
+
+
+def test_image_pdf_has_no_text():
+    reader = PdfReader(io.BytesIO(image_pdf(pages=2, width=120, height=160)))
+    assert len(reader.pages) == 2
+    assert not any((page.extract_text() or "").strip() for page in reader.pages)
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {"scenarios": {"chat": {"throughput_rps": 10, "latency_ms": {"p50": 100, "p95": 200, "p99": 300}}}}
+    results = {
+        "chat": {"throughput_rps": 9.5, "latency_ms": {"p50": 105, "p95": 260, "p99": 300}},
+        "nuevo": {"throughput_rps": 1, "latency_ms": {}},
+    }
+    regressions = compare(results, baseline, tolerance=0.10)
+    assert len(regressions) == 1 and regressions[0].startswith("chat latency_ms.p95")
+    assert results["chat"]["vs_baseline"]["throughput_rps"] == -0.05
+    assert "vs_baseline" not in results["nuevo"]
@@ -0,0 +1,70 @@
+import time
+
+from utils.cache_utils import LRUCache, estimate_size
+
+
+class FakeBacking:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, namespace, key):
+        return self.data.get((namespace, key))
+
+    def set(self, namespace, key, value, ttl=None):
+        self.data[(namespace, key)] = value
+
+    def delete(self, namespace, key):
+        self.data.pop((namespace, key), None)
+
+
+def test_evicts_least_recently_used_entry():
+    cache = LRUCache("test", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_respects_byte_budget():
+    cache = LRUCache("test", max_bytes=10)
+    cache.set("a", "x" * 6)
+    cache.set("b", "y" * 6)
+    assert "a" not in cache
+    assert cache.stats()["bytes"] == 6
+
+
+def test_value_larger_than_budget_is_not_cached():
+    cache = LRUCache("test", max_bytes=4)
+    assert cache.set("a", "too large") == "too large"
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache("test", ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_backing_is_written_and_used_on_miss():
+    backing = FakeBacking()
+    cache = LRUCache("test", backing=backing)
+    cache.set("a", {"x": 1})
+    cache.clear()
+    assert cache.get("a") == {"x": 1}
+    assert cache.stats()["backing_hits"] == 1
+    cache.delete("a")
+    assert backing.data == {}
+
+
+def test_estimate_size_counts_nested_values():
+    assert estimate_size("ñ") == 2
+    assert estimate_size(b"abc") == 3
+    assert estimate_size({"ab": ["cd", b"e"]}) == 5
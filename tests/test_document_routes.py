@@ -0,0 +1,72 @@
+import gzip
+import json
+
+import pytest
+
+from app import app
+from utils.cache_utils import pdf_cache
+
+FILE_HASH = "a" * 32
+
+
+@pytest.fixture
+def client():
+    pdf_cache.set(FILE_HASH, {"total_pages": 3, "pages": {1: "uno", 2: "dos " * 400, 3: "tres"},
+                              "extraction_methods": {1: "text", 2: "text", 3: "text"}})
+    yield app.test_client()
+    pdf_cache.delete(FILE_HASH)
+
+
+def test_returns_requested_range(client):
+    response = client.get(f"/documents/{FILE_HASH}/pages?from=2&to=9")
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["from"] == 2 and data["to"] == 3 and data["total_pages"] == 3
+    assert set(data["pages"]) == {"2", "3"}
+    assert response.headers["ETag"].startswith('W/"v')
+
+
+def test_not_modified_with_matching_etag(client):
+    etag = client.get(f"/documents/{FILE_HASH}/pages?from=1&to=3").headers["ETag"]
+    response = client.get(f"/documents/{FILE_HASH}/pages?from=1&to=3", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["ETag"] == etag
+
+
+def test_etag_changes_with_content(client):
+    url = f"/documents/{FILE_HASH}/pages?from=1&to=3"
+    etag = client.get(url).headers["ETag"]
+    pdf_cache.set(FILE_HASH, {"total_pages": 3, "pages": {1: "uno", 2: "dos", 3: "texto OCR"},
+                              "extraction_methods": {1: "text", 2: "text", 3: "ocr"}})
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.get_json()["methods"]["3"] == "ocr"
+
+
+def test_unknown_document_is_404_even_with_etag(client):
+    etag = client.get(f"/documents/{FILE_HASH}/pages?from=1&to=3").headers["ETag"]
+    response = client.get(f"/documents/{'b' * 32}/pages?from=1&to=3", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("query", ["from=0", "from=3&to=2", "from=x"])
+def test_invalid_range(client, query):
+    assert client.get(f"/documents/{FILE_HASH}/pages?{query}").status_code == 400
+
+
+def test_large_responses_are_gzipped(client):
+    response = client.get(f"/documents/{FILE_HASH}/pages?from=1&to=3", headers={"Accept-Encoding": "gzip"})
+    assert response.headers.get("Content-Encoding") == "gzip"
+    assert json.loads(gzip.decompress(response.data))["pages"]["1"] == "uno"
+
+
+def test_saturated_scheduler_returns_503(client, monkeypatch):
+    from routes import document_routes
+    from utils.scheduler import SchedulerSaturated
+
+    class Saturated:
+        def run(self, priority, fn, *args, **kwargs):
+            raise SchedulerSaturated(priority, retry_after=7)
+
+    monkeypatch.setattr(document_routes, "scheduler", Saturated())
+    response = client.get(f"/documents/{FILE_HASH}/pages?from=1&to=3")
+    assert response.status_code == 503 and response.headers["Retry-After"] == "7"
@@ -0,0 +1,136 @@
+import pytest
+
+from utils.cache_utils import pdf_cache
+from services.chat_service import prepare_chat_prompt, prepare_summary_request, ChatRequestError
+from services.document_service import (
+    parse_page_range,
+    pages_context,
+    build_context,
+    get_page_range,
+    DocumentNotFound,
+)
+
+FILE_HASH = "d" * 32
+PAGES = {
+    1: "1. Introducción\nEl contrato regula el pago de la factura.",
+    2: "2. Garantía\nLa garantía cubre defectos de fabricación.",
+    3: "3. Anexo\nDatos de contacto del cliente.",
+}
+
+
+@pytest.fixture
+def document():
+    pdf_cache.set(FILE_HASH, {"total_pages": 3, "pages": PAGES, "explanation": "x",
+                              "extraction_methods": {1: "text", 2: "text", 3: "ocr"}})
+    yield FILE_HASH
+    pdf_cache.delete(FILE_HASH)
+
+
+@pytest.mark.parametrize("data, expected", [
+    ({}, None),
+    ({"page": 4}, (4, 4)),
+    ({"pages": "3-5"}, (3, 5)),
+    ({"pages": "7"}, (7, 7)),
+    ({"page_from": 2}, (2, 2)),
+    ({"page_to": 6}, (6, 6)),
+    ({"page_from": 5, "page_to": 2}, (2, 5)),
+    ({"pages": "2-3", "page": 9}, (2, 3)),
+])
+def test_parse_page_range(data, expected):
+    assert parse_page_range(data) == expected
+
+
+def test_parse_page_range_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_page_range({"pages": "a-b"})
+
+
+def test_pages_context_stops_at_budget():
+    text, complete = pages_context(PAGES, max_length=1000)
+    assert complete and text.startswith("[Página 1]\n") and "[Página 3]" in text
+
+    # La página que no cabe entera se recorta si queda sitio suficiente
+    text, complete = pages_context({1: "a" * 300, 2: "b" * 300}, max_length=600)
+    assert not complete
+    assert len(text) == 600 and "[Página 2]" in text
+
+    text, complete = pages_context({1: "a" * 300, 2: "b" * 300}, max_length=400)
+    assert not complete and "[Página 2]" not in text
+
+
+def test_pages_context_skips_empty_pages():
+    text, complete = pages_context({1: "  ", 2: "texto"}, max_length=100)
+    assert complete and text == "[Página 2]\ntexto"
+
+
+def test_build_context_with_range_uses_only_those_pages(document):
+    context = build_context(document, "garantía", page_range=(2, 3))
+    assert "[Página 1]" not in context
+    assert "[Página 2]" in context and "[Página 3]" in context
+
+
+def test_build_context_without_hits_falls_back_to_outline_and_first_pages(document):
+    context = build_context(document, "zzzz qqqq")
+    assert "Estructura:" in context
+    assert "[Página 1]" in context
+
+
+def test_chat_prompt_without_hits_is_not_rejected(document):
+    prompt = prepare_chat_prompt({"question": "zzzz qqqq", "file_hash": document})
+    assert "El contrato regula" in prompt
+
+
+def test_chat_prompt_for_unknown_document():
+    with pytest.raises(ChatRequestError) as error:
+        prepare_chat_prompt({"question": "hola", "file_hash": "e" * 32})
+    assert error.value.status == 404
+
+
+def test_summary_request_hashes_only_foreign_text(document):
+    assert prepare_summary_request({"file_hash": document, "page": 2})[3] is None
+    assert prepare_summary_request({"file_hash": document, "page": 2, "text": PAGES[2]})[3] is None
+    assert prepare_summary_request({"file_hash": document, "page": 2, "text": "otro"})[3] is not None
+    assert prepare_summary_request({"file_hash": document, "page": 2, "pages": "1-3"})[3] is not None
+
+
+def test_get_page_range_from_cached_document(document):
+    total_pages, pages, methods = get_page_range(document, 2, 10)
+    assert total_pages == 3
+    assert pages == {2: PAGES[2], 3: PAGES[3]}
+    assert methods == {2: "text", 3: "ocr"}
+
+
+def test_get_page_range_for_unknown_document():
+    with pytest.raises(DocumentNotFound):
+        get_page_range("f" * 32, 1, 2)
+
+
+def test_server_context_fits_budget_and_is_not_reranked(monkeypatch):
+    from services import chat_service
+    from config import CHAT_CONTEXT_MAX_CHARS
+    paragraph = ("el pago de la factura vence en treinta días " * 20)[:460]
+    big = {n: f"{n}. Sección número {n} del contrato de servicios\n" + "\n\n".join(f"{paragraph} {i}" for i in range(6))
+           for n in range(1, 41)}
+    pdf_cache.set("e" * 32, {"total_pages": 40, "pages": big, "explanation": "x"})
+    monkeypatch.setattr(chat_service, "extract_relevant_context",
+                        lambda *args, **kwargs: pytest.fail("no debe volver a recortar el contexto del servidor"))
+    try:
+        assert len(build_context("e" * 32, "¿Cuándo vence el pago de la factura?")) <= CHAT_CONTEXT_MAX_CHARS
+        assert "factura" in prepare_chat_prompt({"question": "¿Cuándo vence el pago?", "file_hash": "e" * 32})
+    finally:
+        pdf_cache.delete("e" * 32)
+
+
+@pytest.mark.parametrize("max_length", [300, 1000, 4000])
+def test_document_map_always_reaches_the_context(max_length):
+    paragraph = ("el pago de la factura vence en treinta días " * 20)[:460]
+    big = {n: f"{n}. Sección número {n} del contrato de servicios\n" + "\n\n".join(f"{paragraph} {i}" for i in range(6))
+           for n in range(1, 41)}
+    pdf_cache.set("f" * 32, {"total_pages": 40, "pages": big, "explanation": "x"})
+    try:
+        context = build_context("f" * 32, "¿Cuándo vence el pago de la factura?", max_length=max_length)
+        assert len(context) <= max_length
+        assert context.startswith("Estructura:") or context.startswith("Título:")
+        assert "[Página" in context
+    finally:
+        pdf_cache.delete("f" * 32)
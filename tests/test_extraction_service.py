@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+from benchmarks.synthetic_pdf import text_pdf
+from services import extraction_service
+from services.extraction_service import split_shards, extract_pages_text
+
+
+def test_split_shards_covers_every_page_once():
+    assert split_shards(10, 4) == [(1, 4), (5, 8), (9, 10)]
+    assert split_shards(3, 8) == [(1, 3)]
+    assert split_shards(0, 8) == []
+    assert split_shards(2, 0) == [(1, 1), (2, 2)]
+
+
+def test_serial_extraction_reports_progress():
+    progress = []
+    total_pages, pages = extract_pages_text(text_pdf(pages=3), workers=1,
+                                            on_progress=lambda done, total: progress.append((done, total)))
+    assert total_pages == 3 and sorted(pages) == [1, 2, 3]
+    assert progress[-1] == (3, 3)
+
+
+def test_parallel_extraction_matches_serial(tmp_path, capsys):
+    data = text_pdf(pages=12)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+    serial = extract_pages_text(data, workers=1)
+    # Desde los bytes (archivo temporal) y desde la ruta en disco, con el mismo pool
+    assert extract_pages_text(data, workers=2, min_pages=1, shard_size=4) == serial
+    assert extract_pages_text(data, workers=2, min_pages=1, shard_size=4, source_path=str(path)) == serial
+    # Sin caer en la extracción en serie, y con un único pool para las dos llamadas
+    assert "extracción en serie" not in capsys.readouterr().out
+    assert extraction_service._pool is not None
+
+
+def test_worker_readers_are_bounded_by_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_service, "_worker_readers", OrderedDict())
+    monkeypatch.setattr(extraction_service, "_worker_readers_bytes", 0)
+    paths = []
+    for seed in range(3):
+        path = tmp_path / f"{seed}.pdf"
+        path.write_bytes(text_pdf(pages=2, seed=seed))
+        paths.append(str(path))
+    size = max(len(open(p, "rb").read()) for p in paths)
+
+    reader = extraction_service._worker_reader(paths[0], "a", max_bytes=2 * size)
+    assert extraction_service._worker_reader(paths[0], "a", max_bytes=2 * size) is reader
+    # Otra extracción de la misma ruta no reutiliza el lector
+    assert extraction_service._worker_reader(paths[0], "b", max_bytes=2 * size) is not reader
+    extraction_service._worker_reader(paths[1], "c", max_bytes=2 * size)
+    assert list(extraction_service._worker_readers) == ["b", "c"]
+    assert extraction_service._worker_readers_bytes <= 2 * size
+
+    # Un PDF que no cabe en el presupuesto no se guarda
+    extraction_service._worker_reader(paths[2], "d", max_bytes=size // 2)
+    assert "d" not in extraction_service._worker_readers
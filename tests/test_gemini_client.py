@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.fake_gemini import FakeGeminiBackend, FakeGeminiError
+from utils.gemini_client import AdaptiveTokenBucket, GeminiClient, GeminiDeadlineExceeded, error_code
+
+
+def make_client(errors=None, max_retries=3, **kwargs):
+    backend = FakeGeminiBackend(latency=0, first_chunk_delay=0, chunk_delay=0, errors=errors)
+    bucket = AdaptiveTokenBucket(rate=1000, min_rate=1, max_rate=1000)
+    return GeminiClient(backend, rate_limiter=bucket, max_retries=max_retries, backoff_base=0, **kwargs), backend
+
+
+def test_error_code():
+    assert error_code(FakeGeminiError(429)) == 429
+    assert error_code(ValueError("sin código")) is None
+
+
+def test_retries_transient_errors_and_throttles():
+    client, backend = make_client(errors=[429, 503])
+    response = client.generate("hola", "gemini-test")
+    assert response.text.startswith("**Respuesta simulada")
+    assert len(backend.calls) == 3
+    assert client.retries == 2 and client.throttled == 2
+    # Cada 429/503 reduce el ritmo a la mitad (y las respuestas correctas lo recuperan poco a poco)
+    assert client.rate_limiter.rate < 1000 / 2
+    assert client.in_flight == 0
+
+
+def test_non_retryable_error_is_raised():
+    client, backend = make_client(errors=[400])
+    with pytest.raises(FakeGeminiError):
+        client.generate("hola", "gemini-test")
+    assert len(backend.calls) == 1 and client.retries == 0 and client.in_flight == 0
+
+
+def test_gives_up_after_max_retries():
+    client, backend = make_client(errors=[500, 500, 500], max_retries=2)
+    with pytest.raises(FakeGeminiError):
+        client.generate("hola", "gemini-test")
+    assert len(backend.calls) == 3 and client.in_flight == 0
+
+
+def test_models_are_reused():
+    client, _ = make_client()
+    assert client.get_model("gemini-test") is client.get_model("gemini-test")
+    assert client.stats()["models"] == ["gemini-test"]
+
+
+def test_stream_releases_slot_when_done():
+    client, backend = make_client(errors=[429], max_concurrency=1)
+    backend.chunk_size = 5
+    chunks = client.generate("hola", "gemini-test", stream=True)
+    assert client.in_flight == 1
+    text = "".join(chunk.text for chunk in chunks)
+    assert text == backend.respond("hola") and client.in_flight == 0
+    # Con el hueco libre se puede volver a llamar
+    assert client.generate("otra", "gemini-test").text
+
+
+def test_closing_stream_early_releases_slot():
+    client, _ = make_client(max_concurrency=1)
+    chunks = client.generate("hola", "gemini-test", stream=True)
+    next(chunks)
+    chunks.close()
+    assert client.in_flight == 0
+
+
+def test_deadline_waiting_for_slot():
+    client, _ = make_client(max_concurrency=1)
+    chunks = client.generate("hola", "gemini-test", stream=True)
+    with pytest.raises(GeminiDeadlineExceeded):
+        client.generate("otra", "gemini-test", deadline_seconds=0.05)
+    chunks.close()
+
+
+def test_token_bucket_deadline():
+    bucket = AdaptiveTokenBucket(rate=0.5, min_rate=0.1, max_rate=1)
+    bucket.acquire()
+    with pytest.raises(GeminiDeadlineExceeded):
+        bucket.acquire(deadline=time.monotonic() + 0.1)
+
+
+def test_token_bucket_adapts_rate():
+    bucket = AdaptiveTokenBucket(rate=8, min_rate=1, max_rate=10)
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 2
+    for _ in range(100):
+        bucket.on_success()
+    assert bucket.rate == 10
+    for _ in range(10):
+        bucket.on_throttle()
+    assert bucket.rate == 1
+
+
+def test_generate_async_with_retries_and_stream():
+    client, backend = make_client(errors=[503])
+
+    async def run():
+        response = await client.generate_async("hola", "gemini-test")
+        chunks = await client.generate_async("hola", "gemini-test", stream=True)
+        text = "".join([chunk.text async for chunk in chunks])
+        return response.text, text
+
+    response_text, stream_text = asyncio.run(run())
+    assert response_text == stream_text == backend.respond("hola")
+    assert client.retries == 1 and client.in_flight == 0
+
+
+def test_sync_and_async_calls_share_the_concurrency_limit():
+    client, _ = make_client(max_concurrency=1)
+    chunks = client.generate("hola", "gemini-test", stream=True)
+
+    async def run():
+        with pytest.raises(GeminiDeadlineExceeded):
+            await client.generate_async("otra", "gemini-test", deadline_seconds=0.05)
+        # Cancelar mientras espera hueco no deja el semáforo ocupado
+        waiting = asyncio.ensure_future(client.generate_async("otra", "gemini-test"))
+        await asyncio.sleep(0.02)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        chunks.close()
+        return await client.generate_async("otra", "gemini-test")
+
+    assert asyncio.run(run()).text
+    assert client.in_flight == 0
+    # El hueco quedó libre también para las llamadas síncronas
+    assert client.generate("otra", "gemini-test", deadline_seconds=0.05).text
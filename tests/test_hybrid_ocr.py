@@ -0,0 +1,72 @@
+import io
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+
+from benchmarks.synthetic_pdf import text_pdf, image_pdf
+from services import pdf_service
+from services.extraction_service import find_sparse_pages, page_has_images, extract_pages_text
+
+
+def mixed_pdf():
+    """Páginas 1-2 con texto, 3-4 escaneadas y 5 con texto"""
+    text_pages = PdfReader(io.BytesIO(text_pdf(pages=3))).pages
+    image_pages = PdfReader(io.BytesIO(image_pdf(pages=2, width=60, height=80))).pages
+    writer = PdfWriter()
+    for page in (text_pages[0], text_pages[1], image_pages[0], image_pages[1], text_pages[2]):
+        writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def mixed():
+    data = mixed_pdf()
+    reader = PdfReader(io.BytesIO(data))
+    _, pages = extract_pages_text(data, reader=reader, workers=1)
+    return data, reader, pages
+
+
+def test_page_has_images(mixed):
+    _, reader, _ = mixed
+    assert [page_has_images(page) for page in reader.pages] == [False, False, True, True, False]
+
+
+def test_only_scanned_pages_are_sparse(mixed):
+    _, reader, pages = mixed
+    assert find_sparse_pages(reader, pages) == [3, 4]
+
+
+def test_sparse_pages_limited_to_requested_numbers(mixed):
+    _, reader, pages = mixed
+    assert find_sparse_pages(reader, pages, page_numbers=[1, 4, 5]) == [4]
+
+
+def test_image_page_with_enough_text_is_not_sparse(mixed):
+    _, reader, pages = mixed
+    assert find_sparse_pages(reader, {**pages, 3: "texto " * 20}, min_chars=20) == [4]
+
+
+def test_hybrid_extraction_runs_ocr_only_on_scanned_pages(mixed, monkeypatch):
+    data, _, _ = mixed
+    requested = []
+
+    def fake_ocr(pdf_bytes, page_numbers=None, lang=None):
+        requested.extend(page_numbers)
+        return {page_num: f"Texto reconocido de la página {page_num}" for page_num in page_numbers}
+
+    monkeypatch.setattr(pdf_service, "extract_text_from_pdf_images", fake_ocr)
+    total_pages, pages, methods = pdf_service.extract_text_hybrid(data)
+    assert total_pages == 5
+    assert requested == [3, 4]
+    assert methods == {1: "text", 2: "text", 3: "ocr", 4: "ocr", 5: "text"}
+    assert pages[3] == "Texto reconocido de la página 3"
+
+
+def test_failed_ocr_marks_pages_empty(mixed, monkeypatch):
+    data, _, _ = mixed
+    monkeypatch.setattr(pdf_service, "extract_text_from_pdf_images", lambda *args, **kwargs: None)
+    _, pages, methods = pdf_service.extract_text_hybrid(data)
+    assert methods[3] == methods[4] == "empty"
+    assert 3 not in pages and 4 not in pages
@@ -0,0 +1,69 @@
+import hashlib
+import io
+import json
+
+from app import app
+from benchmarks.synthetic_pdf import text_pdf
+from services.job_service import UploadJob, get_job
+from utils.cache_utils import pdf_cache
+
+
+def upload_job(client, data):
+    return client.post("/upload", data={"file": (io.BytesIO(data), "doc.pdf"), "mode": "job"},
+                       content_type="multipart/form-data")
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "data" in fields:
+            events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_job_upload_reports_progress_until_done():
+    data = text_pdf(pages=3, lines_per_page=10, seed=5)
+    file_hash = hashlib.md5(data).hexdigest()
+    client = app.test_client()
+    try:
+        response = upload_job(client, data)
+        assert response.status_code == 202
+        job_id = response.get_json()["job_id"]
+        assert response.get_json()["status_url"] == f"/jobs/{job_id}"
+
+        events = parse_events(client.get(f"/jobs/{job_id}/events").get_data(as_text=True))
+        assert [index for index, _, _ in events] == list(range(len(events)))
+        assert events[0][1] == "queued" and events[-1][1] == "done"
+
+        status = client.get(f"/jobs/{job_id}").get_json()
+        assert status["status"] == "done" and status["pages_total"] == 3
+        assert status["explanation_ready"] and status["result"]["file_hash"] == file_hash
+
+        # Reanudar desde el último evento recibido solo devuelve lo posterior
+        resumed = client.get(f"/jobs/{job_id}/events", headers={"Last-Event-ID": str(events[-2][0])})
+        assert [index for index, _, _ in parse_events(resumed.get_data(as_text=True))] == [events[-1][0]]
+
+        # EventSource vuelve a conectar con el último id cuando el stream se cierra: no hay nada más
+        finished = client.get(f"/jobs/{job_id}/events", headers={"Last-Event-ID": str(events[-1][0])})
+        assert parse_events(finished.get_data(as_text=True)) == []
+    finally:
+        pdf_cache.delete(file_hash)
+
+
+def test_unknown_job():
+    client = app.test_client()
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.get("/jobs/nope/events").status_code == 404
+    assert get_job("nope") is None
+
+
+def test_job_progress_and_wait_events():
+    job = UploadJob("a" * 32, "doc.pdf")
+    job.progress("extracting", pages_done=2, pages_total=5)
+    events = job.wait_events(1, timeout=0)
+    assert [(index, event["stage"], event["pages_extracted"]) for index, event in events] == [(1, "extracting", 2)]
+    # Sin eventos nuevos espera hasta el timeout y devuelve una lista vacía
+    assert job.wait_events(2, timeout=0.01) == []
+    job.update("error", status="error", error="fallo")
+    assert job.finished and job.to_dict()["error"] == "fallo"
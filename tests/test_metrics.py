@@ -0,0 +1,66 @@
+from app import app
+from utils import metrics
+from utils.metrics import counter, gauge, histogram, observe, render_prometheus, stage_totals, timed, timer
+
+
+def test_counter_and_gauge_render_with_labels():
+    requests = counter("test_requests_total", "Peticiones de prueba")
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    requests.inc(route='/"b"')
+    level = gauge("test_level", "Nivel de prueba")
+    level.set(5)
+    level.dec(2)
+    output = render_prometheus()
+    assert "# TYPE test_requests_total counter" in output
+    assert 'test_requests_total{route="/a"} 3' in output
+    assert 'test_requests_total{route="/\\"b\\""} 1' in output
+    assert "test_level 3" in output
+    assert counter("test_requests_total") is requests
+
+
+def test_histogram_buckets_are_cumulative():
+    latency = histogram("test_latency_seconds", "Latencia de prueba", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value, stage="x")
+    output = render_prometheus()
+    assert 'test_latency_seconds_bucket{stage="x",le="0.1"} 1' in output
+    assert 'test_latency_seconds_bucket{stage="x",le="1.0"} 3' in output
+    assert 'test_latency_seconds_bucket{stage="x",le="+Inf"} 4' in output
+    assert 'test_latency_seconds_sum{stage="x"} 6.05' in output
+    assert 'test_latency_seconds_count{stage="x"} 4' in output
+
+
+def test_stage_timers():
+    before = stage_totals().get("test_stage", (0.0, 0))[1]
+
+    @timed("test_stage")
+    def work():
+        return 42
+
+    assert work() == 42 and work.__name__ == "work"
+    with timer("test_stage"):
+        pass
+    observe("test_stage", 0.25)
+    seconds, count = stage_totals()["test_stage"]
+    assert count == before + 3 and seconds >= 0.25
+
+
+def test_failing_collector_does_not_break_export(monkeypatch):
+    def broken():
+        raise RuntimeError("fallo")
+
+    def collect():
+        return [("test_collected", "gauge", "Valor calculado", [({"kind": "a"}, 7), ({"kind": "b"}, None)])]
+
+    monkeypatch.setattr(metrics, "_collectors", [broken, collect])
+    output = render_prometheus()
+    assert 'test_collected{kind="a"} 7' in output
+    assert 'kind="b"' not in output
+
+
+def test_metrics_endpoint():
+    response = app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# TYPE pdfai_stage_duration_seconds histogram" in response.get_data(as_text=True)
@@ -0,0 +1,25 @@
+from PIL import Image
+
+from config import OCR_DPI
+from utils.cache_utils import ocr_cache, generate_ocr_cache_key
+from services.pdf_service import _page_windows, _image_hash, _ocr_page
+
+
+def test_page_windows_groups_contiguous_pages():
+    assert _page_windows([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5, 5]]
+    assert _page_windows([7, 2, 3, 9], 4) == [[2, 3], [7, 7], [9, 9]]
+    assert _page_windows([], 4) == []
+
+
+def test_image_hash_depends_on_pixels():
+    white = Image.new("L", (20, 20), 255)
+    assert _image_hash(white) == _image_hash(Image.new("L", (20, 20), 255))
+    assert _image_hash(white) != _image_hash(Image.new("L", (20, 20), 0))
+    assert _image_hash(white) != _image_hash(Image.new("L", (20, 21), 255))
+
+
+def test_cached_page_is_not_recognized_again():
+    image = Image.new("L", (30, 30), 128)
+    ocr_cache.set(generate_ocr_cache_key(_image_hash(image), "spa"), "texto ya reconocido")
+    # Sin Tesseract instalado, solo un acierto en la caché puede devolver el texto
+    assert _ocr_page(b"", 4, image, OCR_DPI, "spa") == (4, "texto ya reconocido")
@@ -0,0 +1,60 @@
+import pytest
+
+from utils.outline_utils import analyse_document, heading_level, build_outline
+from utils.text_utils import estimate_tokens
+
+PAGES = {
+    1: "INFORME ANUAL\n1. Introducción\nEl objetivo es revisar los resultados del año.\nTexto de relleno sin nada.",
+    2: "1.1 Alcance\nLa conclusión principal es que el costo total fue de $ 1.200.\nINFORME ANUAL",
+    3: "Capítulo 2 Riesgos\nSe recomienda revisar el 15 % de los contratos antes del 01/02/2025.",
+}
+
+
+@pytest.mark.parametrize("line, level", [
+    ("1. Introducción", 1),
+    ("2.3 Detalle del alcance", 2),
+    ("IV. Anexos", 1),
+    ("Capítulo 3", 1),
+    ("RESUMEN EJECUTIVO", 1),
+    ("Una frase normal que termina en punto.", None),
+    ("ab", None),
+])
+def test_heading_level(line, level):
+    assert heading_level(line) == level
+
+
+def test_analyse_document_finds_title_headings_and_key_sentences():
+    outline = analyse_document(PAGES)
+    assert outline.title == "INFORME ANUAL"
+    assert outline.total_pages == 3
+    # El encabezado repetido en la página 2 cuenta una sola vez
+    assert [(h["title"], h["page"], h["level"]) for h in outline.headings] == [
+        ("INFORME ANUAL", 1, 1), ("1. Introducción", 1, 1), ("1.1 Alcance", 2, 2), ("Capítulo 2 Riesgos", 3, 1)]
+    assert [s["page"] for s in outline.key_sentences] == [1, 2, 3]
+
+
+def test_key_sentences_are_capped_keeping_the_best():
+    outline = analyse_document(PAGES, max_key_sentences=1)
+    assert len(outline.key_sentences) == 1
+    assert outline.key_sentences[0]["page"] == 2
+
+
+def test_section_at_uses_page_and_offset():
+    outline = analyse_document(PAGES)
+    assert outline.section_at(2, 100) == "1.1 Alcance"
+    assert outline.section_at(3, 0) == "Capítulo 2 Riesgos"
+    assert outline.section_at(1, 0) == "INFORME ANUAL"
+
+
+def test_digest_stays_within_budget():
+    outline = analyse_document(PAGES)
+    digest = outline.digest(40, intro="Primera página del documento")
+    assert digest.startswith("Título: INFORME ANUAL")
+    assert sum(estimate_tokens(line) for line in digest.split("\n")) <= 40
+    assert "Estructura:" in outline.digest(400)
+    assert "Puntos clave:" in outline.digest(400)
+
+
+def test_build_outline_for_clients():
+    assert build_outline(PAGES, max_entries=2) == [
+        {"title": "INFORME ANUAL", "page": 1, "level": 1}, {"title": "1. Introducción", "page": 1, "level": 1}]
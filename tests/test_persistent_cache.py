@@ -0,0 +1,74 @@
+import os
+import pickle
+import zlib
+
+import pytest
+
+from config import DEFAULT_MODEL, DEFAULT_MAX_TOKENS
+from utils.cache_utils import LRUCache, prompt_cache, generate_text_hash
+from utils.fake_gemini import FakeGeminiBackend
+from utils.gemini_client import GeminiClient, get_client, set_client
+from utils.gemini_utils import generate_text, GenerationError
+from utils.persistent_cache import SQLiteCache, encode_value, decode_value
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "private" / "cache.sqlite3")
+
+
+def test_values_round_trip_as_json_with_int_keys(db_path):
+    cache = SQLiteCache(path=db_path)
+    value = {"pages": {1: "uno", 2: "dos"}, "outline": [{"title": "1. Intro", "page": 1}], "explanation": None}
+    cache.set("pdf", "k", value)
+    assert cache.get("pdf", "k") == value
+    assert decode_value(encode_value({"10": "a"})) == {10: "a"}
+
+
+def test_directory_is_private(db_path):
+    SQLiteCache(path=db_path)
+    assert os.stat(os.path.dirname(db_path)).st_mode & 0o777 == 0o700
+
+
+def test_shared_directory_is_rejected(db_path):
+    os.makedirs(os.path.dirname(db_path), mode=0o755)
+    os.chmod(os.path.dirname(db_path), 0o755)
+    with pytest.raises(PermissionError):
+        SQLiteCache(path=db_path)
+
+
+def test_pickled_rows_are_discarded(db_path):
+    cache = SQLiteCache(path=db_path)
+    cache.set("pdf", "k", "valor")
+    blob = zlib.compress(pickle.dumps({"x": 1}))
+    cache._connection().execute("UPDATE entries SET value = ?", (blob,))
+    assert cache.get("pdf", "k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_are_misses(db_path):
+    cache = SQLiteCache(path=db_path)
+    cache.set("prompt", "k", "valor", ttl=-1)
+    assert cache.get("prompt", "k") is None
+
+
+def test_lru_cache_reads_through_to_sqlite(db_path):
+    backing = SQLiteCache(path=db_path)
+    LRUCache("pdf", backing=backing).set("k", {"pages": {3: "tres"}})
+    assert LRUCache("pdf", backing=SQLiteCache(path=db_path)).get("k") == {"pages": {3: "tres"}}
+
+
+def test_failed_generation_is_not_cached():
+    previous = get_client()
+    set_client(GeminiClient(FakeGeminiBackend(latency=0, errors=[400]), max_retries=0))
+    try:
+        prompt = "Prompt de prueba que falla la primera vez"
+        key = generate_text_hash(prompt, DEFAULT_MODEL, DEFAULT_MAX_TOKENS)
+        with pytest.raises(GenerationError):
+            generate_text(prompt)
+        assert prompt_cache.get(key) is None
+        response = generate_text(prompt)
+        assert prompt_cache.get(key) == response
+        assert response.startswith("**Respuesta simulada")
+    finally:
+        set_client(previous)
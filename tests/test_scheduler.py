@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from utils.scheduler import TaskScheduler, SchedulerSaturated, INTERACTIVE, EXPLANATION, BACKGROUND
+
+LIMITS = {INTERACTIVE: 4, EXPLANATION: 2, BACKGROUND: 2}
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_full_queue_raises_saturated_with_retry_after(release):
+    scheduler = TaskScheduler(workers=1, queue_limits=LIMITS)
+    scheduler.submit(INTERACTIVE, release.wait)
+    assert wait_until(lambda: scheduler.stats()["classes"]["interactive"]["running"] == 1)
+    scheduler.submit(EXPLANATION, lambda: None)
+    scheduler.submit(EXPLANATION, lambda: None)
+    with pytest.raises(SchedulerSaturated) as error:
+        scheduler.submit(EXPLANATION, lambda: None)
+    assert error.value.priority == EXPLANATION and error.value.retry_after > 0
+    assert scheduler.stats()["classes"]["explanation"]["rejected"] == 1
+
+
+def test_saturated_response_sets_retry_after():
+    from app import app
+    from routes.errors import saturated_response
+    with app.app_context():
+        response, status = saturated_response(SchedulerSaturated(EXPLANATION, retry_after=7))
+    assert status == 503
+    assert response.headers["Retry-After"] == "7"
+    assert "saturado" in response.get_json()["error"]
+
+
+def test_higher_priority_runs_first(release):
+    scheduler = TaskScheduler(workers=1, queue_limits=LIMITS, interactive_reserved=0)
+    order = []
+    scheduler.submit(INTERACTIVE, release.wait)
+    assert wait_until(lambda: scheduler.stats()["classes"]["interactive"]["running"] == 1)
+    futures = [scheduler.submit(BACKGROUND, order.append, "background"),
+               scheduler.submit(EXPLANATION, order.append, "explanation"),
+               scheduler.submit(INTERACTIVE, order.append, "interactive")]
+    release.set()
+    for future in futures:
+        future.result(timeout=2)
+    assert order == ["interactive", "explanation", "background"]
+
+
+def test_interactive_worker_is_reserved(release):
+    scheduler = TaskScheduler(workers=3, queue_limits=LIMITS)
+    for _ in range(2):
+        scheduler.submit(EXPLANATION, release.wait)
+    scheduler.submit(BACKGROUND, release.wait)
+    assert wait_until(lambda: scheduler.stats()["classes"]["explanation"]["running"] == 2)
+    # Las subidas y el prefetch no pueden ocupar el último hilo
+    assert scheduler.stats()["classes"]["background"]["running"] == 0
+    assert scheduler.run(INTERACTIVE, lambda: "ok", timeout=1) == "ok"
+
+
+def test_cancelled_tasks_are_skipped(release):
+    scheduler = TaskScheduler(workers=1, queue_limits=LIMITS)
+    scheduler.submit(INTERACTIVE, release.wait)
+    assert wait_until(lambda: scheduler.stats()["classes"]["interactive"]["running"] == 1)
+    calls = []
+    future = scheduler.submit(INTERACTIVE, calls.append, 1)
+    assert future.cancel()
+    release.set()
+    assert wait_until(lambda: scheduler.stats()["classes"]["interactive"]["cancelled"] == 1)
+    assert calls == []
+
+
+def test_exceptions_reach_the_caller():
+    scheduler = TaskScheduler(workers=1, queue_limits=LIMITS)
+    with pytest.raises(ZeroDivisionError):
+        scheduler.run(INTERACTIVE, lambda: 1 / 0, timeout=1)
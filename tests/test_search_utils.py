@@ -0,0 +1,76 @@
+from utils.search_utils import BM25Index, split_chunks, tokenize, format_results, retrieve_document_context
+
+
+PAGES = {
+    1: "El contrato regula el pago de la factura.\n\nLas partes acuerdan un plazo de treinta días.",
+    2: "La garantía cubre defectos de fabricación.\n\nEl pago se realiza por transferencia bancaria.",
+    3: "Anexo con datos de contacto del cliente.",
+}
+
+
+def test_tokenize_keeps_words_of_three_or_more_characters():
+    assert tokenize("El PAGO de la factura, ya") == ["pago", "factura"]
+
+
+def test_split_chunks_respects_chunk_size_and_pages():
+    chunks = split_chunks({1: "a" * 50 + "\n\n" + "b" * 50, 2: "c" * 250}, chunk_size=60)
+    assert all(len(text) <= 60 for _, text in chunks)
+    assert [page for page, _ in chunks] == [1, 1, 2, 2, 2, 2, 2]
+
+
+def test_search_ranks_chunks_with_more_query_terms_first():
+    index = BM25Index(split_chunks(PAGES, chunk_size=80))
+    results = index.search("pago por transferencia", top_k=3)
+    assert results[0]["page"] == 2
+    assert "transferencia" in results[0]["text"]
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    index = BM25Index([(1, "pago pago garantía"), (2, "pago contrato"), (3, "pago anexo")])
+    # "garantía" aparece en un solo fragmento, "pago" en todos
+    assert index.search("garantía")[0]["page"] == 1
+    assert index.search("pago garantía")[0]["page"] == 1
+
+
+def test_search_without_known_terms_returns_nothing():
+    index = BM25Index(split_chunks(PAGES))
+    assert index.search("zzzz qqqq") == []
+    assert BM25Index([]).search("pago") == []
+
+
+def test_search_respects_max_length():
+    index = BM25Index([(1, "pago " * 20), (2, "pago " * 20)])
+    results = index.search("pago", max_length=120)
+    assert len(results) == 1
+
+
+def test_format_results_orders_by_document_position():
+    text = format_results([{"chunk": 2, "page": 2, "text": "b"}, {"chunk": 0, "page": 1, "text": "a"}])
+    assert text == "[Página 1]\na\n\n[Página 2]\nb"
+
+
+def test_retrieve_document_context_uses_cached_index():
+    context = retrieve_document_context("garantía", "search-test-doc", PAGES)
+    assert "[Página 2]" in context and "garantía" in context
+
+
+def test_search_budget_includes_labels_and_separators():
+    chunks = [(page, "pago " * 39 + "x") for page in range(1, 30)]  # 196 caracteres cada uno
+    results = BM25Index(chunks).search("pago", top_k=29, max_length=1000)
+    assert len(format_results(results)) <= 1000
+    assert len(results) == 4  # 4 * (196 + etiqueta + separador) < 1000 < 5 * ...
+
+
+def test_format_results_drops_sections_and_worst_chunks_to_fit():
+    class Outline:
+        def section_at(self, page, offset):
+            return "Una sección con un nombre bastante largo"
+
+    results = [{"chunk": 0, "page": 1, "text": "a" * 50, "score": 2.0},
+               {"chunk": 1, "page": 1, "text": "b" * 50, "score": 1.0}]
+    pages = {1: "a" * 50 + "b" * 50}
+    assert "· Una sección" in format_results(results, pages, Outline())
+    without_sections = format_results(results, pages, Outline(), max_length=130)
+    assert without_sections == "[Página 1]\n" + "a" * 50 + "\n\n[Página 1]\n" + "b" * 50
+    assert format_results(results, pages, Outline(), max_length=100) == "[Página 1]\n" + "a" * 50
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def run_concurrently(count, fn):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight("test")
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return "hecho"
+
+    results, errors = run_concurrently(5, lambda: group.do("k", slow))
+    assert results == ["hecho"] * 5 and errors == [None] * 5
+    assert len(calls) == 1
+    assert group.stats() == {"in_flight": 0, "executed": 1, "deduplicated": 4}
+
+
+def test_errors_are_shared_and_not_remembered():
+    group = SingleFlight("test")
+
+    def failing():
+        time.sleep(0.05)
+        raise ValueError("fallo")
+
+    _, errors = run_concurrently(3, lambda: group.do("k", failing))
+    assert all(isinstance(e, ValueError) for e in errors)
+    # La clave se libera: la siguiente llamada se ejecuta de nuevo
+    assert group.do("k", lambda: "ok") == "ok"
+
+
+def test_different_keys_run_independently():
+    group = SingleFlight("test")
+    assert group.do("a", lambda: 1) == 1
+    assert group.do("b", lambda: 2) == 2
+    assert group.stats()["executed"] == 2
+
+
+def test_async_calls_share_one_execution():
+    group = SingleFlight("test")
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "hecho"
+
+    async def main():
+        return await asyncio.gather(*(group.do_async("k", slow) for _ in range(4)))
+
+    assert asyncio.run(main()) == ["hecho"] * 4
+    assert len(calls) == 1
+
+
+def test_async_call_is_cancelled_when_nobody_waits():
+    group = SingleFlight("test")
+    finished = []
+
+    async def slow():
+        await asyncio.sleep(1)
+        finished.append(1)
+
+    async def main():
+        task = asyncio.ensure_future(group.do_async("k", slow))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.02)
+
+    asyncio.run(main())
+    assert finished == []
+    assert not group.in_flight("k")
@@ -0,0 +1,121 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from app import app
+from routes import upload_routes
+from services.storage_service import DiskPDFStore, MemoryPDFStore, is_valid_hash
+from utils.cache_utils import LRUCache
+
+DATA = b"%PDF-1.4\n" + bytes(range(256)) * 40
+FILE_HASH = hashlib.md5(DATA).hexdigest()
+
+
+@pytest.fixture(params=["memory", "disk"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryPDFStore(LRUCache("test-files", max_entries=10))
+    return DiskPDFStore(root=str(tmp_path), max_bytes=0)
+
+
+def test_is_valid_hash():
+    assert is_valid_hash(FILE_HASH)
+    assert not is_valid_hash("../../etc/passwd")
+    assert not is_valid_hash(FILE_HASH.upper())
+    assert not is_valid_hash(None)
+
+
+def test_put_file_and_read_back(store):
+    f = io.BytesIO(DATA)
+    store.put_file(FILE_HASH, f)
+    assert f.tell() == 0
+    assert store.exists(FILE_HASH)
+    assert store.get_bytes(FILE_HASH) == DATA
+    assert store.size(FILE_HASH) == len(DATA)
+    with store.open(FILE_HASH) as pdf:
+        assert pdf.read(8) == DATA[:8]
+    assert store.open("f" * 32) is None
+
+
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def test_disk_store_directory_is_private(tmp_path):
+    root = tmp_path / "store"
+    DiskPDFStore(root=str(root))
+    assert os.stat(root).st_mode & 0o777 == 0o700
+    os.chmod(root, 0o755)
+    with pytest.raises(PermissionError):
+        DiskPDFStore(root=str(root))
+
+
+def test_disk_store_prunes_oldest_with_running_total(tmp_path):
+    store = DiskPDFStore(root=str(tmp_path), max_bytes=2500)
+    blobs = [bytes([n]) * 1000 for n in range(4)]
+    for blob in blobs:
+        store.put(md5(blob), blob)
+    assert [store.exists(md5(blob)) for blob in blobs] == [False, False, True, True]
+    assert store._total == 2000
+    # Al arrancar de nuevo se parte de lo que hay en disco
+    assert DiskPDFStore(root=str(tmp_path), max_bytes=2500)._total == 2000
+
+
+def test_disk_store_rejects_invalid_hash_and_wrong_content(tmp_path):
+    store = DiskPDFStore(root=str(tmp_path))
+    with pytest.raises(ValueError):
+        store.put("../x", DATA)
+    with pytest.raises(ValueError):
+        store.put("f" * 32, DATA)
+    assert not store.exists("f" * 32)
+    assert os.listdir(tmp_path / "ff") == []
+
+
+def test_disk_store_ignores_and_replaces_planted_files(tmp_path):
+    planted = tmp_path / FILE_HASH[:2] / f"{FILE_HASH}.pdf"
+    planted.parent.mkdir()
+    planted.write_bytes(b"%PDF-1.4 otro contenido")
+    store = DiskPDFStore(root=str(tmp_path))
+    assert not store.exists(FILE_HASH) and store.open(FILE_HASH) is None
+    assert not planted.exists()
+
+    planted.write_bytes(b"%PDF-1.4 otro contenido")
+    store = DiskPDFStore(root=str(tmp_path))
+    store.put_file(FILE_HASH, io.BytesIO(DATA))
+    assert store.get_bytes(FILE_HASH) == DATA
+
+
+def test_disk_store_accepts_valid_files_from_previous_run(tmp_path):
+    DiskPDFStore(root=str(tmp_path)).put(FILE_HASH, DATA)
+    store = DiskPDFStore(root=str(tmp_path))
+    assert store.exists(FILE_HASH) and store.path(FILE_HASH).endswith(f"{FILE_HASH}.pdf")
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    store.put(FILE_HASH, DATA)
+    monkeypatch.setattr(upload_routes, "pdf_store", store)
+    return app.test_client()
+
+
+def test_temp_pdf_range_and_etag(client):
+    url = f"/api/temp-pdf/{FILE_HASH}"
+    full = client.get(url)
+    assert full.status_code == 200 and full.data == DATA
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert full.headers["ETag"] == f'"{FILE_HASH}"'
+
+    partial = client.get(url, headers={"Range": "bytes=100-199"})
+    assert partial.status_code == 206 and partial.data == DATA[100:200]
+    assert partial.headers["Content-Range"] == f"bytes 100-199/{len(DATA)}"
+
+    assert client.get(url, headers={"If-None-Match": f'"{FILE_HASH}"'}).status_code == 304
+    full.close()
+    partial.close()
+
+
+def test_temp_pdf_not_found(client):
+    assert client.get(f"/api/temp-pdf/{'f' * 32}").status_code == 404
+    assert client.get("/api/temp-pdf/not-a-hash").status_code == 404
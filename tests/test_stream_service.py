@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from services import stream_service
+from services.stream_service import ChatStream, parse_event_id, resume_chat_stream, start_chat_stream
+from utils.sse import format_event, format_comment, coalesce_async
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+def test_small_chunks_are_coalesced():
+    stream = ChatStream(min_chars=10, max_delay=60)
+    for text in ("ab", "cd", "efghij", "k"):
+        stream.feed(text)
+    stream.finish()
+    assert stream.events == [("message", "abcdefghij"), ("message", "k"), ("done", "")]
+
+
+def test_pending_text_is_sent_after_max_delay():
+    stream = ChatStream(min_chars=1000, max_delay=0.05)
+    stream.feed("hola")
+    started = time.monotonic()
+    events = stream.wait_events(0, timeout=2)
+    assert events == [(0, "message", "hola")]
+    assert time.monotonic() - started < 1
+
+
+def test_wait_events_resumes_after_index():
+    stream = ChatStream(min_chars=1, max_delay=60)
+    for text in ("uno", "dos", "tres"):
+        stream.feed(text)
+    stream.finish(error="fallo")
+    assert stream.wait_events(2, timeout=0) == [(2, "message", "tres"), (3, "error", "fallo"), (4, "done", "")]
+
+
+def test_parse_event_id():
+    assert parse_event_id("abc123-4") == ("abc123", 4)
+    assert parse_event_id("abc-def-12") == ("abc-def", 12)
+    assert parse_event_id("abc") == (None, None)
+    assert parse_event_id(None) == (None, None)
+
+
+def test_resume_returns_next_index():
+    stream = start_chat_stream(iter([Chunk("x" * 100)]))
+    assert stream.wait_events(0, timeout=2)
+    resumed, after = resume_chat_stream(stream.event_id(0))
+    assert resumed is stream and after == 1
+    assert resume_chat_stream("desconocido-0") == (None, 0)
+
+
+def test_never_read_stream_is_abandoned(monkeypatch):
+    monkeypatch.setattr(stream_service, "SSE_RESUME_GRACE_SECONDS", 0.05)
+
+    def slow_chunks():
+        for _ in range(50):
+            time.sleep(0.02)
+            yield Chunk("x")
+
+    stream = start_chat_stream(slow_chunks())
+    deadline = time.monotonic() + 2
+    while not stream.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stream.abandoned
+    assert stream.events[-2:] == [("error", "El stream se abandonó"), ("done", "")]
+
+
+def test_attached_stream_is_not_abandoned(monkeypatch):
+    monkeypatch.setattr(stream_service, "SSE_RESUME_GRACE_SECONDS", 0.05)
+    done = threading.Event()
+
+    def chunks():
+        for _ in range(10):
+            time.sleep(0.02)
+            yield Chunk("x")
+        done.set()
+
+    stream = ChatStream()
+    stream.attach()
+    threading.Thread(target=stream_service._pump, args=(stream, chunks()), daemon=True).start()
+    assert done.wait(2)
+    stream.detach()
+    assert not stream.abandoned
+
+
+def test_format_event_splits_lines():
+    assert format_event("a\nb", event_id="s-1") == "id: s-1\ndata: a\ndata: b\n\n"
+    assert format_event("", event="done") == "event: done\ndata: \n\n"
+    assert format_event(None, retry=2000) == "retry: 2000\n\n"
+    assert format_comment() == ": keep-alive\n\n"
+
+
+def test_coalesce_async_groups_chunks():
+    async def chunks():
+        for text in ("ab", "cd", "", "efgh", "i"):
+            yield Chunk(text)
+
+    async def collect():
+        return [text async for text in coalesce_async(chunks(), min_chars=4, max_delay=60)]
+
+    assert asyncio.run(collect()) == ["abcd", "efgh", "i"]
+
+
+def test_chat_route_replays_from_last_event_id():
+    from app import app
+    client = app.test_client()
+    first = client.post("/chat", json={"question": "¿Qué dice?", "context": "Un contexto de prueba " * 20})
+    body = first.get_data(as_text=True)
+    ids = [line[4:] for line in body.splitlines() if line.startswith("id: ")]
+    assert len(ids) >= 2 and "event: done" in body
+
+    resumed = client.post("/chat", headers={"Last-Event-ID": ids[0]})
+    replay = resumed.get_data(as_text=True)
+    assert resumed.headers["X-Stream-Id"] == first.headers["X-Stream-Id"]
+    assert f"id: {ids[0]}\n" not in replay and f"id: {ids[1]}\n" in replay
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from utils.fake_gemini import FakeGeminiBackend
+from utils.gemini_client import GeminiClient, get_client, set_client
+from utils.scheduler import TaskScheduler, INTERACTIVE, BACKGROUND
+from services import summary_service
+from services.summary_service import SummaryPrefetcher, get_cached_summary
+
+PAGES = {n: f"Texto de la página {n} " * 10 for n in range(1, 21)}
+
+
+@pytest.fixture(autouse=True)
+def fake_client():
+    previous = get_client()
+    set_client(GeminiClient(FakeGeminiBackend(latency=0), max_retries=0))
+    yield
+    set_client(previous)
+
+
+@pytest.fixture
+def blocked_scheduler(monkeypatch):
+    """Planificador de un solo hilo ocupado hasta que se libera el evento"""
+    scheduler = TaskScheduler(workers=1, queue_limits={0: 8, 1: 8, 2: 8})
+    release = threading.Event()
+    scheduler.submit(INTERACTIVE, release.wait)
+    monkeypatch.setattr(summary_service, "scheduler", scheduler)
+    yield scheduler
+    release.set()
+    # Esperar a que terminen los resúmenes encolados mientras el cliente falso sigue activo
+    scheduler.run(BACKGROUND, lambda: None, timeout=5)
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_prefetch_summarizes_next_pages():
+    prefetcher = SummaryPrefetcher(lookahead=2)
+    assert prefetcher.on_reader_page("p" * 32, 1, PAGES) == [2, 3]
+    assert wait_until(lambda: prefetcher.stats()["pending"] == 0)
+    assert get_cached_summary("p" * 32, 2) and get_cached_summary("p" * 32, 3)
+    # Ya están en la caché: no se vuelven a programar
+    assert prefetcher.on_reader_page("p" * 32, 1, PAGES) == []
+
+
+def test_jumping_away_cancels_pending_pages(blocked_scheduler):
+    prefetcher = SummaryPrefetcher(lookahead=2)
+    assert prefetcher.on_reader_page("q" * 32, 1, PAGES) == [2, 3]
+    assert prefetcher.on_reader_page("q" * 32, 10, PAGES) == [11, 12]
+    stats = prefetcher.stats()
+    assert stats["cancelled"] == 2 and stats["pending"] == 2 and stats["scheduled"] == 4
+
+
+def test_pages_already_pending_are_not_rescheduled(blocked_scheduler):
+    prefetcher = SummaryPrefetcher(lookahead=3)
+    assert prefetcher.on_reader_page("r" * 32, 1, PAGES) == [2, 3, 4]
+    assert prefetcher.on_reader_page("r" * 32, 2, PAGES) == [5]
+    assert prefetcher.stats()["cancelled"] == 1
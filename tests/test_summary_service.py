@@ -0,0 +1,95 @@
+import pytest
+
+from utils.cache_utils import summary_cache, generate_summary_cache_key
+from utils.gemini_utils import GenerationError
+from utils.text_utils import estimate_tokens
+from utils.fake_gemini import FakeGeminiBackend
+from utils.gemini_client import GeminiClient, get_client, set_client
+from services.summary_service import (
+    pack_pages,
+    split_batch_response,
+    summarize_pages_stream,
+    get_page_summary,
+)
+
+
+@pytest.fixture
+def backend():
+    previous = get_client()
+    fake = FakeGeminiBackend(latency=0, first_chunk_delay=0, chunk_delay=0)
+    set_client(GeminiClient(fake, max_retries=0))
+    yield fake
+    set_client(previous)
+
+
+def test_pack_pages_respects_token_budget_and_page_limit():
+    pages = [(n, "x" * 400) for n in range(1, 8)]  # ~101 tokens por página
+    batches = pack_pages(pages, token_budget=250, max_pages=6)
+    assert [[n for n, _ in batch] for batch in batches] == [[1, 2], [3, 4], [5, 6], [7]]
+
+    batches = pack_pages(pages, token_budget=10_000, max_pages=3)
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+
+def test_pack_pages_keeps_oversized_page_alone():
+    batches = pack_pages([(1, "x" * 4000), (2, "y")], token_budget=100)
+    assert [[n for n, _ in batch] for batch in batches] == [[1], [2]]
+    assert estimate_tokens("x" * 4000) > 100
+
+
+def test_split_batch_response():
+    response = ("Texto previo\n=== PÁGINA 1 ===\nResumen uno\n\n"
+                "==== Pagina 2 ====\nResumen dos\n=== PÁGINA 9 ===\nOtra página\n=== PÁGINA 3 ===\n")
+    assert split_batch_response(response, {1, 2, 3}) == {1: "Resumen uno", 2: "Resumen dos"}
+
+
+def test_split_batch_response_without_markers():
+    assert split_batch_response("Un resumen sin separadores", {1, 2}) == {}
+    assert split_batch_response(None, {1}) == {}
+
+
+def test_batch_failure_reports_errors_per_page(backend):
+    backend.errors = [400]
+    results = list(summarize_pages_stream([(1, "uno " * 20), (2, "dos " * 20)]))
+    assert sorted(r["page"] for r in results) == [1, 2]
+    assert all("error" in r and "summary" not in r for r in results)
+
+
+def test_missing_pages_fall_back_to_single_summaries(backend):
+    backend.responder = lambda prompt: ("=== PÁGINA 1 ===\nresumen uno" if "PÁGINA 2" in prompt
+                                        else "resumen suelto")
+    results = {r["page"]: r for r in summarize_pages_stream([(1, "tres " * 20), (2, "cuatro " * 20)])}
+    assert results[1]["summary"] == "resumen uno"
+    assert results[2]["summary"] == "resumen suelto"
+
+
+def test_failed_page_summary_is_not_cached(backend):
+    backend.errors = [400]
+    with pytest.raises(GenerationError):
+        get_page_summary("s" * 32, 1, "texto de la página")
+    assert summary_cache.get(generate_summary_cache_key("s" * 32, 1)) is None
+    assert get_page_summary("s" * 32, 1, "texto de la página").startswith("**Respuesta simulada")
+
+
+def test_batch_summaries_use_and_fill_the_summary_cache(backend):
+    file_hash = "t" * 32
+    backend.responder = lambda prompt: ("=== PÁGINA 2 ===\nresumen dos\n=== PÁGINA 3 ===\nresumen tres"
+                                        if "PÁGINA 3" in prompt else "resumen suelto")
+    summary_cache.set(generate_summary_cache_key(file_hash, 1), "resumen ya guardado")
+    try:
+        pages = [(1, "uno " * 20), (2, "dos " * 20), (3, "tres " * 20)]
+        results = list(summarize_pages_stream(pages, file_hash))
+        # Las páginas ya resumidas salen primero y sin llamar a Gemini
+        assert results[0] == {"page": 1, "summary": "resumen ya guardado"}
+        assert len(backend.calls) == 1 and "PÁGINA 1" not in backend.calls[0][1]
+        assert summary_cache.get(generate_summary_cache_key(file_hash, 3)) == "resumen tres"
+        # /summarize (o el prefetch) reutiliza el resumen del lote
+        assert get_page_summary(file_hash, 2, "dos " * 20) == "resumen dos"
+        assert len(backend.calls) == 1
+
+        # Texto enviado en la petición: se cachea con su hash, sin pisar el de la página
+        list(summarize_pages_stream([(2, "otro texto " * 10)], file_hash, stored_text=False))
+        assert summary_cache.get(generate_summary_cache_key(file_hash, 2)) == "resumen dos"
+        assert len(backend.calls) == 2
+    finally:
+        summary_cache.clear()
@@ -0,0 +1,59 @@
+import hashlib
+import io
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app import app
+from benchmarks.synthetic_pdf import text_pdf
+from utils.cache_utils import pdf_cache
+from utils.upload_utils import HashingSpooledFile, hash_file
+
+
+def test_spooled_file_hashes_while_writing():
+    data = b"%PDF-1.4 " + b"x" * 5000
+    spooled = HashingSpooledFile(max_size=1024, max_bytes=10_000)
+    for start in range(0, len(data), 700):
+        spooled.write(data[start:start + 700])
+    # Pasó a disco al superar max_size, sin perder el contenido
+    assert spooled._rolled
+    assert spooled.hexdigest() == hashlib.md5(data).hexdigest()
+    spooled.seek(0)
+    assert spooled.read() == data
+
+
+def test_spooled_file_rejects_oversized_upload():
+    spooled = HashingSpooledFile(max_size=10, max_bytes=100)
+    spooled.write(b"a" * 100)
+    with pytest.raises(RequestEntityTooLarge):
+        spooled.write(b"a")
+
+
+def test_hash_file_rewinds():
+    f = io.BytesIO(b"contenido del pdf")
+    f.seek(5)
+    assert hash_file(f, chunk_size=4) == hashlib.md5(b"contenido del pdf").hexdigest()
+    assert f.tell() == 0
+
+
+def test_upload_uses_streamed_hash_and_cache():
+    data = text_pdf(pages=2, lines_per_page=10)
+    file_hash = hashlib.md5(data).hexdigest()
+    client = app.test_client()
+    try:
+        first = client.post("/upload", data={"file": (io.BytesIO(data), "doc.pdf")},
+                            content_type="multipart/form-data")
+        assert first.status_code == 200
+        assert first.get_json()["file_hash"] == file_hash
+        assert pdf_cache.get(file_hash)["explanation"]
+
+        second = client.post("/upload", data={"file": (io.BytesIO(data), "doc.pdf")},
+                             content_type="multipart/form-data")
+        assert second.get_json() == first.get_json()
+    finally:
+        pdf_cache.delete(file_hash)
+
+
+def test_upload_without_file():
+    response = app.test_client().post("/upload", data={}, content_type="multipart/form-data")
+    assert response.status_code == 400
@@ -0,0 +1,23 @@
+import pytest
+
+from utils import warmup
+
+
+@pytest.fixture(autouse=True)
+def fresh_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "_warmup_result", None)
+
+
+def test_warm_up_imports_modules_once():
+    timings = warmup.warm_up(["json", "modulo_que_no_existe"])
+    assert "json" in timings and "gemini_client" in timings
+    assert "modulo_que_no_existe" not in timings
+    # La segunda llamada devuelve el resultado anterior sin volver a importar
+    assert warmup.warm_up(["csv"]) is timings
+
+
+def test_start_warmup_runs_in_background():
+    thread = warmup.start_warmup(["json"])
+    thread.join(timeout=5)
+    assert not thread.is_alive() and thread.daemon
+    assert "json" in warmup._warmup_result
@@ -1,23 +1,262 @@
 import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
 
-# Simple in-memory caches
-pdf_cache = {}
-prompt_cache = {}
+from config import (
+    MAX_CACHE_SIZE,
+    PDF_CACHE_MAX_BYTES,
+    PROMPT_CACHE_MAX_BYTES,
+    SUMMARY_CACHE_MAX_BYTES,
+    FILE_CACHE_MAX_ENTRIES,
+    FILE_CACHE_MAX_BYTES,
+    CACHE_TTL_SECONDS,
+    INDEX_CACHE_MAX_BYTES,
+    PAGE_CACHE_MAX_BYTES,
+    OUTLINE_CACHE_MAX_BYTES,
+    OCR_CACHE_MAX_BYTES,
+    CACHE_BACKEND,
+)
 
-def generate_text_hash(prompt_str):
-    """Create a hash of the prompt string for caching"""
+
+def estimate_size(value):
+    """Estimar (aproximadamente) los bytes que ocupa un valor cacheado"""
+    if hasattr(value, "memory_size"):
+        return value.memory_size()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8', errors='ignore'))
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Caché en memoria con expulsión LRU, límite de entradas, presupuesto de bytes
+    y TTL opcional. Es seguro usarla desde los hilos de los executors.
+    Con `backing` (p. ej. SQLiteCache) las escrituras también se guardan en la
+    caché persistente y los fallos en memoria se buscan allí.
+    """
+
+    def __init__(self, name, max_entries=None, max_bytes=None, ttl=None, backing=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backing = backing
+        self._data = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.backing_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.monotonic()
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        # Expulsar las entradas menos usadas hasta respetar ambos límites
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries) or
+            (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+    def _get_local(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, _, expires_at = entry
+        if self._expired(expires_at):
+            self._remove(key)
+            self.expirations += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set_local(self, key, value, size, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            # Un valor más grande que todo el presupuesto no se cachea en memoria
+            if self.max_bytes is not None and size > self.max_bytes:
+                self.evictions += 1
+                return
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_local(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+
+        if self.backing is not None:
+            value = self.backing.get(self.name, key)
+            if value is not None:
+                self._set_local(key, value, estimate_size(value), self.ttl)
+                with self._lock:
+                    self.hits += 1
+                    self.backing_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._set_local(key, value, estimate_size(value), ttl)
+        if self.backing is not None:
+            self.backing.set(self.name, key, value, ttl)
+        return value
+
+    def delete(self, key):
+        if self.backing is not None:
+            self.backing.delete(self.name, key)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            if self._get_local(key) is not _MISSING:
+                return True
+        return self.backing is not None and self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        if not self.delete(key) and self.backing is None:
+            raise KeyError(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Contadores de uso de la caché"""
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "backing_hits": self.backing_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def create_persistent_cache(backend=CACHE_BACKEND):
+    """Caché persistente compartida entre procesos, o None si solo se usa memoria"""
+    if backend != "sqlite":
+        return None
+    try:
+        from utils.persistent_cache import SQLiteCache
+        return SQLiteCache()
+    except Exception as e:
+        print(f"No se pudo abrir la caché persistente ({str(e)}), usando solo memoria")
+        return None
+
+persistent_cache = create_persistent_cache()
+
+# Cachés en memoria acotadas (respaldadas por la caché persistente si está configurada)
+pdf_cache = LRUCache("pdf", max_entries=MAX_CACHE_SIZE, max_bytes=PDF_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS, backing=persistent_cache)
+prompt_cache = LRUCache("prompt", max_entries=MAX_CACHE_SIZE, max_bytes=PROMPT_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS, backing=persistent_cache)
+file_cache = LRUCache("file", max_entries=FILE_CACHE_MAX_ENTRIES, max_bytes=FILE_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+
+# Índices de búsqueda por documento (junto a pdf_cache, con la misma clave file_hash)
+index_cache = LRUCache("index", max_entries=MAX_CACHE_SIZE, max_bytes=INDEX_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+
+# Resúmenes de página, con la clave de generate_summary_cache_key
+summary_cache = LRUCache("summary", max_entries=MAX_CACHE_SIZE * 20, max_bytes=SUMMARY_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS, backing=persistent_cache)
+
+# Texto de páginas extraídas bajo demanda cuando el documento ya no está en pdf_cache
+page_cache = LRUCache("page", max_entries=MAX_CACHE_SIZE * 50, max_bytes=PAGE_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+
+# Outline (títulos y frases clave) por documento, con la clave file_hash
+outline_cache = LRUCache("outline", max_entries=MAX_CACHE_SIZE, max_bytes=OUTLINE_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS)
+
+# Texto OCR por imagen de página renderizada, con la clave de generate_ocr_cache_key
+ocr_cache = LRUCache("ocr", max_entries=MAX_CACHE_SIZE * 50, max_bytes=OCR_CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS, backing=persistent_cache)
+
+_caches = [pdf_cache, prompt_cache, file_cache, index_cache, summary_cache, page_cache, outline_cache, ocr_cache]
+
+def register_cache(cache):
+    """Registrar una caché para que aparezca en las estadísticas"""
+    _caches.append(cache)
+    return cache
+
+def get_cache_stats():
+    """Estadísticas de todas las cachés registradas"""
+    stats = {cache.name: cache.stats() for cache in _caches}
+    if persistent_cache is not None:
+        stats["persistent"] = persistent_cache.stats()
+    return stats
+
+def generate_text_hash(prompt_str, model=None, max_tokens=None):
+    """Create a hash of the prompt string (plus model and max_tokens, if given) for caching"""
+    if model is not None or max_tokens is not None:
+        prompt_str = f"{model}\x00{max_tokens}\x00{prompt_str}"
     return hashlib.md5(prompt_str.encode('utf-8')).hexdigest()
 
 def get_from_cache(cache, key):
     """Get an item from a cache if it exists"""
     return cache.get(key)
 
-def add_to_cache(cache, key, value):
+def add_to_cache(cache, key, value, ttl=None):
     """Add an item to a cache"""
-    cache[key] = value
-    return value
+    return cache.set(key, value, ttl=ttl)
 
-def generate_summary_cache_key(file_hash, page_num):
-    """Generate a cache key for page summaries"""
-    return f"{file_hash}page{page_num}"
+def generate_page_cache_key(file_hash, page_num):
+    """Clave del texto de una página en page_cache (la página 0 guarda el número de páginas)"""
+    return f"{file_hash}:{page_num}"
 
+def generate_ocr_cache_key(image_hash, lang):
+    """Clave del texto OCR de una imagen de página (la misma imagen da el mismo texto)"""
+    return f"{image_hash}:{lang}"
+
+def generate_summary_cache_key(file_hash, page_num, text_hash=None):
+    """
+    Generate a cache key for page summaries. text_hash identifica un texto que no es
+    el de la página guardada (p. ej. enviado en la petición) para no mezclar sus resúmenes.
+    """
+    if text_hash:
+        return f"{file_hash}page{page_num}text{text_hash}"
+    return f"{file_hash}page{page_num}"
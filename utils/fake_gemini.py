@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+# Backend falso de Gemini para pruebas locales: respuestas deterministas,
+# latencia configurable y errores 429/503 simulados.
+
+
+class FakeGeminiError(Exception):
+    """Error con código HTTP, como los de google.api_core"""
+
+    def __init__(self, code, message=""):
+        super().__init__(message or f"Fake Gemini error {code}")
+        self.code = code
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, backend, model_name):
+        self.backend = backend
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.backend.record_call(self.model_name, prompt)
+        error_code = self.backend.next_error()
+        if error_code:
+            raise FakeGeminiError(error_code)
+
+        text = self.backend.respond(prompt)
+        if not stream:
+            time.sleep(self.backend.latency)
+            return FakeResponse(text)
+        return self._stream(text)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.backend.record_call(self.model_name, prompt)
+        error_code = self.backend.next_error()
+        if error_code:
+            raise FakeGeminiError(error_code)
+
+        text = self.backend.respond(prompt)
+        if not stream:
+            await asyncio.sleep(self.backend.latency)
+            return FakeResponse(text)
+        return self._stream_async(text)
+
+    async def _stream_async(self, text):
+        await asyncio.sleep(self.backend.first_chunk_delay)
+        size = max(1, self.backend.chunk_size)
+        for start in range(0, len(text), size):
+            if start:
+                await asyncio.sleep(self.backend.chunk_delay)
+            self.backend.chunks_sent += 1
+            yield FakeChunk(text[start:start + size])
+
+    def _stream(self, text):
+        time.sleep(self.backend.first_chunk_delay)
+        size = max(1, self.backend.chunk_size)
+        for start in range(0, len(text), size):
+            if start:
+                time.sleep(self.backend.chunk_delay)
+            self.backend.chunks_sent += 1
+            yield FakeChunk(text[start:start + size])
+
+
+class FakeGeminiBackend:
+    """
+    Sustituto local de google.generativeai con la misma interfaz que GenaiBackend.
+    errors es una lista de códigos (p. ej. [429, 429]) que se devuelven en las
+    primeras llamadas antes de responder con normalidad.
+    """
+
+    def __init__(self, latency=0.05, first_chunk_delay=0.02, chunk_delay=0.01, chunk_size=40,
+                 errors=None, responder=None):
+        self.latency = latency
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.errors = list(errors or [])
+        self.responder = responder
+        self.calls = []
+        self.chunks_sent = 0
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name):
+        return FakeModel(self, model_name)
+
+    def record_call(self, model_name, prompt):
+        with self._lock:
+            self.calls.append((model_name, prompt))
+
+    def next_error(self):
+        with self._lock:
+            return self.errors.pop(0) if self.errors else None
+
+    def respond(self, prompt):
+        """Respuesta determinista a partir del prompt"""
+        if self.responder:
+            return self.responder(prompt)
+        digest = hashlib.md5(prompt.encode('utf-8')).hexdigest()[:8]
+        return (f"**Respuesta simulada {digest}**\n\n"
+                f"- El texto tiene {len(prompt.split())} palabras.\n"
+                f"- Este contenido lo genera el backend falso de Gemini.\n")
@@ -0,0 +1,372 @@
+import asyncio
+import random
+import threading
+import time
+
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_BACKEND,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_RATE_PER_SECOND,
+    GEMINI_MIN_RATE,
+    GEMINI_MAX_RATE,
+    GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_BASE,
+    GEMINI_DEADLINE_SECONDS,
+)
+from utils.metrics import observe
+
+# Códigos que indican saturación o fallos transitorios de la API
+THROTTLE_CODES = {429, 503}
+RETRYABLE_CODES = {429, 500, 503, 504}
+
+
+class GeminiDeadlineExceeded(Exception):
+    """No se pudo completar la llamada antes del plazo"""
+
+
+def error_code(error):
+    """Código HTTP de un error de la API (google.api_core expone .code)"""
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)  # HTTPStatus / grpc StatusCode
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveTokenBucket:
+    """
+    Limitador de ritmo tipo token bucket. La tasa baja a la mitad cuando la API
+    responde 429/503 y se recupera poco a poco con cada respuesta correcta.
+    """
+
+    def __init__(self, rate=GEMINI_RATE_PER_SECOND, min_rate=GEMINI_MIN_RATE, max_rate=GEMINI_MAX_RATE):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_take(self, deadline):
+        """Tomar un token; si no hay, devolver cuántos segundos esperar"""
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            wait = (1 - self.tokens) / self.rate
+        if deadline is not None and time.monotonic() + wait > deadline:
+            raise GeminiDeadlineExceeded("Plazo agotado esperando al limitador de Gemini")
+        return wait
+
+    def acquire(self, deadline=None):
+        """Esperar a que haya un token disponible (o hasta el plazo)"""
+        while True:
+            wait = self._try_take(deadline)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, deadline=None):
+        """Como acquire, pero sin bloquear el bucle de eventos"""
+        while True:
+            wait = self._try_take(deadline)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.capacity = max(1.0, self.rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def on_success(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + 0.1)
+            self.capacity = max(1.0, self.rate)
+
+
+class GenaiBackend:
+    """Backend real: google.generativeai"""
+
+    def __init__(self, api_key=GEMINI_API_KEY):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.genai = genai
+
+    def get_model(self, model_name):
+        return self.genai.GenerativeModel(model_name)
+
+
+class _StreamHandle:
+    """Iterador del stream que libera el hueco de concurrencia al terminar o cerrarse"""
+
+    def __init__(self, first_chunk, iterator, release, model_name=None, started=None):
+        self._pending = [first_chunk] if first_chunk is not None else []
+        self._iterator = iterator
+        self._release = release
+        self._model_name = model_name
+        self._started = started
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        if self._pending:
+            return self._pending.pop()
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._release()
+            if self._started is not None:
+                observe("gemini_total", time.monotonic() - self._started, model=self._model_name)
+
+    def __del__(self):
+        self.close()
+
+
+class _AsyncStreamHandle:
+    """Versión asíncrona de _StreamHandle; aclose() detiene la generación en curso"""
+
+    def __init__(self, first_chunk, iterator, release, model_name=None, started=None):
+        self._pending = [first_chunk] if first_chunk is not None else []
+        self._iterator = iterator
+        self._release = release
+        self._model_name = model_name
+        self._started = started
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if self._pending:
+            return self._pending.pop()
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            self._release()
+            close = getattr(self._iterator, "aclose", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception:
+                    pass
+            if self._started is not None:
+                observe("gemini_total", time.monotonic() - self._started, model=self._model_name)
+
+
+class GeminiClient:
+    """
+    Cliente de Gemini compartido: reutiliza las instancias de modelo, limita la
+    concurrencia global, adapta el ritmo a los 429/503 y reintenta con backoff.
+    """
+
+    def __init__(self, backend, max_concurrency=GEMINI_MAX_CONCURRENCY, rate_limiter=None,
+                 max_retries=GEMINI_MAX_RETRIES, backoff_base=GEMINI_BACKOFF_BASE,
+                 deadline_seconds=GEMINI_DEADLINE_SECONDS):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter or AdaptiveTokenBucket()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.deadline_seconds = deadline_seconds
+        # Un único presupuesto de concurrencia para las llamadas síncronas y asíncronas
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._models = {}
+        self._models_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+
+    def get_model(self, model_name):
+        """Instancia de modelo cacheada por nombre"""
+        with self._models_lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = self.backend.get_model(model_name)
+            return model
+
+    def _acquire(self, deadline):
+        self.rate_limiter.acquire(deadline)
+        timeout = max(0.0, deadline - time.monotonic())
+        if not self._semaphore.acquire(timeout=timeout):
+            raise GeminiDeadlineExceeded("Plazo agotado esperando un hueco para llamar a Gemini")
+        with self._counter_lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._counter_lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def _retry_delay(self, attempt, error, deadline):
+        """Segundos a esperar antes de reintentar; relanza el error si no se puede"""
+        code = error_code(error)
+        if code in THROTTLE_CODES:
+            self.throttled += 1
+            self.rate_limiter.on_throttle()
+        if code not in RETRYABLE_CODES or attempt >= self.max_retries:
+            raise error
+        # Backoff exponencial con jitter completo
+        delay = random.uniform(0, self.backoff_base * (2 ** attempt))
+        if time.monotonic() + delay > deadline:
+            raise error
+        self.retries += 1
+        return delay
+
+    def _backoff(self, attempt, error, deadline):
+        time.sleep(self._retry_delay(attempt, error, deadline))
+
+    def generate(self, prompt, model_name, stream=False, deadline_seconds=None, **kwargs):
+        """
+        Generar contenido. Sin stream devuelve la respuesta completa; con stream
+        devuelve un iterador de chunks (los reintentos solo cubren el primer chunk).
+        """
+        started = time.monotonic()
+        deadline = started + (deadline_seconds or self.deadline_seconds)
+        model = self.get_model(model_name)
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            try:
+                remaining = max(1.0, deadline - time.monotonic())
+                response = model.generate_content(prompt, stream=stream,
+                                                  request_options={"timeout": remaining}, **kwargs)
+                if not stream:
+                    self.rate_limiter.on_success()
+                    self._release()
+                    observe("gemini_total", time.monotonic() - started, model=model_name)
+                    return response
+                iterator = iter(response)
+                first_chunk = next(iterator, None)
+            except Exception as e:
+                self._release()
+                self._backoff(attempt, e, deadline)
+                attempt += 1
+                continue
+            self.rate_limiter.on_success()
+            observe("gemini_ttft", time.monotonic() - started, model=model_name)
+            return _StreamHandle(first_chunk, iterator, self._release, model_name, started)
+
+    async def _acquire_async(self, deadline):
+        await self.rate_limiter.acquire_async(deadline)
+        # El mismo semáforo que las llamadas síncronas, sin bloquear el bucle: se
+        # reintenta sin esperar (así cancelar la tarea nunca deja un hueco ocupado)
+        wait = 0.005
+        while not self._semaphore.acquire(blocking=False):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GeminiDeadlineExceeded("Plazo agotado esperando un hueco para llamar a Gemini")
+            await asyncio.sleep(min(wait, remaining))
+            wait = min(wait * 2, 0.05)
+        with self._counter_lock:
+            self.in_flight += 1
+
+    async def generate_async(self, prompt, model_name, stream=False, deadline_seconds=None, **kwargs):
+        """
+        Igual que generate pero con la API asíncrona del modelo (generate_content_async).
+        Con stream devuelve un iterador asíncrono; cancelar la tarea o llamar a
+        aclose() corta la generación y libera el hueco.
+        El limitador de ritmo y el límite de concurrencia se comparten con las llamadas síncronas.
+        """
+        started = time.monotonic()
+        deadline = started + (deadline_seconds or self.deadline_seconds)
+        model = self.get_model(model_name)
+        attempt = 0
+        while True:
+            await self._acquire_async(deadline)
+            try:
+                remaining = max(1.0, deadline - time.monotonic())
+                response = await model.generate_content_async(prompt, stream=stream,
+                                                              request_options={"timeout": remaining}, **kwargs)
+                if not stream:
+                    self.rate_limiter.on_success()
+                    self._release()
+                    observe("gemini_total", time.monotonic() - started, model=model_name)
+                    return response
+                iterator = response.__aiter__()
+                try:
+                    first_chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first_chunk = None
+            except asyncio.CancelledError:
+                self._release()
+                raise
+            except Exception as e:
+                self._release()
+                await asyncio.sleep(self._retry_delay(attempt, e, deadline))
+                attempt += 1
+                continue
+            self.rate_limiter.on_success()
+            observe("gemini_ttft", time.monotonic() - started, model=model_name)
+            return _AsyncStreamHandle(first_chunk, iterator, self._release, model_name, started)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_per_second": round(self.rate_limiter.rate, 3),
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "models": sorted(self._models),
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def create_backend(name=GEMINI_BACKEND):
+    if name == "fake":
+        from utils.fake_gemini import FakeGeminiBackend
+        return FakeGeminiBackend()
+    return GenaiBackend()
+
+def get_client():
+    """Cliente de Gemini compartido por todo el proceso"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient(create_backend())
+        return _client
+
+def get_client_stats():
+    """Estadísticas del cliente compartido (None si todavía no se ha creado)"""
+    client = _client
+    return client.stats() if client is not None else None
+
+def set_client(client):
+    """Reemplazar el cliente compartido (por ejemplo con un backend falso)"""
+    global _client
+    with _client_lock:
+        _client = client
+    return client
@@ -1,40 +1,67 @@
-import google.generativeai as genai
 import time
 import traceback
-from config import GEMINI_API_KEY, DEFAULT_MODEL, DEFAULT_MAX_TOKENS
+from config import DEFAULT_MODEL, DEFAULT_MAX_TOKENS
 from utils.cache_utils import generate_text_hash, get_from_cache, add_to_cache, prompt_cache
+from utils.gemini_client import get_client
+from utils.singleflight import prompt_flight
+
+
+class GenerationError(Exception):
+    """La llamada a Gemini falló; el mensaje se puede mostrar al usuario"""
 
-# Configurar la API de Gemini
-genai.configure(api_key=GEMINI_API_KEY)
 
 def generate_text_internal(prompt_str, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, stream=False):
-    """Generar texto usando la API de Gemini con soporte para streaming."""
+    """
+    Generar texto usando la API de Gemini con soporte para streaming.
+    Si la llamada falla lanza GenerationError (nunca devuelve el error como texto).
+    """
     try:
         print(f"Enviando solicitud a la API de Gemini usando el modelo {model}...")
         start_time = time.time()
 
-        # Crear una instancia del modelo de Gemini
-        model_instance = genai.GenerativeModel(model)
+        # El cliente compartido reutiliza la instancia del modelo, limita la
+        # concurrencia y reintenta los errores transitorios
+        client = get_client()
 
         if stream:
             # Generar la respuesta en streaming
-            response = model_instance.generate_content(prompt_str, stream=True)
+            response = client.generate(prompt_str, model, stream=True)
             return response  # Devuelve el generador de streaming
         else:
             # Generar la respuesta de una sola vez
-            response = model_instance.generate_content(prompt_str)
+            response = client.generate(prompt_str, model)
             end_time = time.time()
             print(f"Tiempo de respuesta de Gemini: {end_time - start_time:.2f} segundos")
             return response.text
     except Exception as e:
         print(f"Error en generate_text: {str(e)}")
         traceback.print_exc()
-        return f"Error generando la explicación: {str(e)}"
+        raise GenerationError(f"Error generando la explicación: {str(e)}") from e
     
+async def generate_text_internal_async(prompt_str, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS, stream=False):
+    """
+    Versión asíncrona de generate_text_internal para el servidor ASGI.
+    Sin stream devuelve el texto (o lanza GenerationError, como la versión síncrona);
+    con stream devuelve un iterador asíncrono de chunks y deja pasar los errores.
+    """
+    client = get_client()
+    if stream:
+        return await client.generate_async(prompt_str, model, stream=True)
+    try:
+        print(f"Enviando solicitud asíncrona a la API de Gemini usando el modelo {model}...")
+        start_time = time.time()
+        response = await client.generate_async(prompt_str, model)
+        print(f"Tiempo de respuesta de Gemini: {time.time() - start_time:.2f} segundos")
+        return response.text
+    except Exception as e:
+        print(f"Error en generate_text_internal_async: {str(e)}")
+        traceback.print_exc()
+        raise GenerationError(f"Error generando la explicación: {str(e)}") from e
+
 def generate_text(prompt_str, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS):
-    """Generar texto con caché"""
+    """Generar texto con caché (los errores se lanzan como GenerationError y no se cachean)"""
     # Crear un hash del prompt para el caché
-    prompt_hash = generate_text_hash(prompt_str)
+    prompt_hash = generate_text_hash(prompt_str, model, max_tokens)
 
     # Verificar si ya tenemos una respuesta en caché
     cached_response = get_from_cache(prompt_cache, prompt_hash)
@@ -42,7 +69,16 @@ def generate_text(prompt_str, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS
         print(f"Usando respuesta en caché para el hash: {prompt_hash[:10]}...")
         return cached_response
 
-    # Generar una nueva respuesta
+    # Si el mismo prompt ya se está generando, esperar a esa llamada en lugar de repetirla
+    return prompt_flight.do(prompt_hash, _generate_and_cache, prompt_str, prompt_hash, model, max_tokens)
+
+def _generate_and_cache(prompt_str, prompt_hash, model, max_tokens):
+    # Otra llamada pudo terminar justo antes de que empezara esta
+    cached_response = get_from_cache(prompt_cache, prompt_hash)
+    if cached_response:
+        return cached_response
+
+    # Generar una nueva respuesta (si falla, la excepción sale antes de guardar nada)
     response = generate_text_internal(prompt_str, model, max_tokens)
 
     # Almacenar la respuesta en caché
@@ -51,7 +87,9 @@ def generate_text(prompt_str, model=DEFAULT_MODEL, max_tokens=DEFAULT_MAX_TOKENS
 def check_gemini_health():
     """Verificar si la API de Gemini está funcionando"""
     try:
-        # Verificar la conexión con la API
+        # Verificar la conexión con la API (el cliente configura la API key)
+        get_client()
+        import google.generativeai as genai
         models = genai.list_models()
         if models:
             return {
@@ -0,0 +1,217 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_ENABLED
+
+# Métricas en memoria con exportación en formato de texto de Prometheus.
+# Con METRICS_ENABLED=0 los decoradores devuelven la función original y los
+# temporizadores no hacen nada, así que el coste es prácticamente nulo.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+_metrics = {}
+_collectors = []
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with _lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with _lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        samples = []
+        with _lock:
+            for key, data in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, data):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key, cumulative, {"le": _format_value(float(bound))}))
+                samples.append((f"{self.name}_bucket", key, data[-1], {"le": "+Inf"}))
+                samples.append((f"{self.name}_sum", key, data[-2]))
+                samples.append((f"{self.name}_count", key, data[-1]))
+        return samples
+
+    def totals(self):
+        """{label key: (sum, count)} para comparar dos instantes"""
+        with _lock:
+            return {key: (data[-2], data[-1]) for key, data in self._values.items()}
+
+
+def _get_or_create(cls, name, help_text, **kwargs):
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, help_text, **kwargs)
+        return metric
+
+def counter(name, help_text=""):
+    return _get_or_create(Counter, name, help_text)
+
+def gauge(name, help_text=""):
+    return _get_or_create(Gauge, name, help_text)
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, help_text, buckets=buckets)
+
+def register_collector(collect):
+    """
+    Registrar una función que devuelve métricas calculadas en el momento de
+    exportar: [(name, kind, help, [(labels_dict, value), ...]), ...]
+    """
+    _collectors.append(collect)
+    return collect
+
+
+# Duración de cada etapa del camino crítico (hash, extracción, OCR, Gemini...)
+stage_seconds = histogram("pdfai_stage_duration_seconds", "Duración de cada etapa del procesamiento")
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+@contextmanager
+def _stage_timer(stage, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage, **labels)
+
+def timer(stage, **labels):
+    """Context manager que mide la duración de una etapa"""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _stage_timer(stage, labels)
+
+def timed(stage, **labels):
+    """Decorador que mide la duración de cada llamada a la función"""
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stage_seconds.observe(time.perf_counter() - start, stage=stage, **labels)
+        return wrapper
+    return decorator
+
+def observe(stage, seconds, **labels):
+    """Registrar una duración medida por otros medios (p. ej. tiempo hasta el primer chunk)"""
+    if METRICS_ENABLED:
+        stage_seconds.observe(seconds, stage=stage, **labels)
+
+def stage_totals():
+    """Tiempo acumulado y número de llamadas por etapa: {stage: (seconds, count)}"""
+    totals = {}
+    for key, (seconds, count) in stage_seconds.totals().items():
+        stage = dict(key).get("stage")
+        previous_seconds, previous_count = totals.get(stage, (0.0, 0))
+        totals[stage] = (previous_seconds + seconds, previous_count + count)
+    return totals
+
+
+def render_prometheus():
+    """Exportar todas las métricas en formato de texto de Prometheus"""
+    lines = []
+    with _lock:
+        metrics = list(_metrics.values())
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample in metric.samples():
+            name, key, value = sample[:3]
+            extra = sample[3] if len(sample) > 3 else None
+            lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"Error recogiendo métricas: {str(e)}")
+            continue
+        for name, kind, help_text, values in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,185 @@
+import bisect
+import heapq
+import re
+
+from config import OUTLINE_MAX_ENTRIES, OUTLINE_MAX_KEY_SENTENCES
+from utils.cache_utils import outline_cache, get_from_cache, add_to_cache
+from utils.metrics import timer
+from utils.text_utils import estimate_tokens
+
+# Índice estructural del documento: títulos, secciones numeradas y frases clave
+# con su página y posición, obtenido en una sola pasada sobre todas las páginas.
+
+_NUMBERED_RE = re.compile(r'^(\d+(?:\.\d+)*)[.)]?\s+\S')
+_ROMAN_RE = re.compile(r'^[IVXLC]+[.)]\s+\S')
+_KEYWORD_RE = re.compile(r'^(cap[íi]tulo|secci[óo]n|art[íi]culo|anexo|parte|t[íi]tulo)\b', re.IGNORECASE)
+_KEY_TERMS_RE = re.compile(
+    r'\b(importante|clave|conclusi[óo]n|conclusiones|resultados?|objetivos?|significativ[oa]s?|'
+    r'recomendaci[óo]n|recomienda|obligaci[óo]n|deber[áa]|total|important|key|significant|conclusion|results?)\b',
+    re.IGNORECASE)
+_DATA_RE = re.compile(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b|[$€]\s?\d|\b\d+(?:[.,]\d+)?\s?%')
+
+MAX_SENTENCE_CHARS = 300
+
+
+def heading_level(line):
+    """Nivel del título (1, 2, ...) o None si la línea no parece un título"""
+    if not 3 <= len(line) <= 80 or line.endswith("."):
+        return None
+    match = _NUMBERED_RE.match(line)
+    if match:
+        return match.group(1).count(".") + 1
+    if _ROMAN_RE.match(line) or _KEYWORD_RE.match(line):
+        return 1
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 3 and line.isupper():
+        return 1
+    return None
+
+def sentence_score(line):
+    """Relevancia de una línea: palabras clave y datos (fechas, importes, porcentajes)"""
+    return 2 * len(_KEY_TERMS_RE.findall(line)) + len(_DATA_RE.findall(line))
+
+
+class DocumentOutline:
+    """
+    Resultado del análisis: título, títulos de sección y frases clave con su
+    página y desplazamiento dentro de la página.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.headings = []       # [{"title", "page", "offset", "level"}] en orden de documento
+        self.key_sentences = []  # [{"text", "page", "offset", "score"}] en orden de documento
+        self.total_pages = 0
+        self._positions = []
+
+    def finish(self):
+        self._positions = [(h["page"], h["offset"]) for h in self.headings]
+        return self
+
+    def headings_list(self, max_entries=OUTLINE_MAX_ENTRIES):
+        """Índice para el cliente: [{"title", "page", "level"}]"""
+        return [{"title": h["title"], "page": h["page"], "level": h["level"]} for h in self.headings[:max_entries]]
+
+    def section_at(self, page_num, offset=0):
+        """Título de la sección a la que pertenece una posición del documento"""
+        index = bisect.bisect_right(self._positions, (page_num, offset)) - 1
+        return self.headings[index]["title"] if index >= 0 else None
+
+    def digest(self, token_budget, intro=""):
+        """
+        Texto compacto para prompts dentro de token_budget: título, introducción,
+        estructura (primero los títulos de nivel superior) y frases clave de todo el documento.
+        """
+        lines = []
+        used = 0
+
+        def add(line):
+            nonlocal used
+            tokens = estimate_tokens(line)
+            if used + tokens > token_budget:
+                return False
+            lines.append(line)
+            used += tokens
+            return True
+
+        if self.title:
+            add(f"Título: {self.title}")
+        if intro:
+            intro = intro[:max(0, int(token_budget * 0.3) * 4)]
+            if intro:
+                add(intro)
+
+        # La mitad del presupuesto restante para la estructura, el resto para las frases clave
+        structure_budget = used + (token_budget - used) // 2
+        chosen = []
+        structure_used = estimate_tokens("Estructura:")
+        for heading in sorted(self.headings, key=lambda h: h["level"]):
+            line = f"{'  ' * (heading['level'] - 1)}- {heading['title']} (p. {heading['page']})"
+            tokens = estimate_tokens(line)
+            if used + structure_used + tokens > structure_budget:
+                continue
+            chosen.append((heading["page"], heading["offset"], line))
+            structure_used += tokens
+        if chosen:
+            add("Estructura:")
+            for _, _, line in sorted(chosen):
+                add(line)
+
+        # Las frases mejor puntuadas que quepan en lo que queda, en orden de documento
+        chosen = []
+        sentences_used = estimate_tokens("Puntos clave:")
+        for sentence in sorted(self.key_sentences, key=lambda s: -s["score"]):
+            line = f"- (p. {sentence['page']}) {sentence['text']}"
+            tokens = estimate_tokens(line)
+            if used + sentences_used + tokens > token_budget:
+                continue
+            chosen.append((sentence["page"], sentence["offset"], line))
+            sentences_used += tokens
+        if chosen:
+            add("Puntos clave:")
+            for _, _, line in sorted(chosen):
+                add(line)
+        return "\n".join(lines)
+
+    def memory_size(self):
+        """Bytes aproximados (para el presupuesto de la caché)"""
+        return (sum(len(h["title"]) + 96 for h in self.headings) +
+                sum(len(s["text"]) + 96 for s in self.key_sentences) + 256)
+
+
+def analyse_document(pages, max_key_sentences=OUTLINE_MAX_KEY_SENTENCES):
+    """
+    Analizar todas las páginas en una sola pasada (pages es un dict o un iterable de
+    (page, text) en orden, p. ej. a medida que se extraen) y devolver un DocumentOutline.
+    """
+    outline = DocumentOutline()
+    seen = set()
+    candidates = []  # heap (score, -orden, frase): se quedan las mejor puntuadas
+    order = 0
+    items = sorted(pages.items()) if isinstance(pages, dict) else pages
+    for page_num, text in items:
+        outline.total_pages = max(outline.total_pages, page_num)
+        offset = 0
+        for raw_line in text.split("\n"):
+            line_offset = offset
+            offset += len(raw_line) + 1
+            line = raw_line.strip()
+            if not line:
+                continue
+            if outline.title is None:
+                outline.title = line[:120]
+
+            level = heading_level(line)
+            if level is not None:
+                # Los encabezados repetidos en cada página solo cuentan una vez
+                if line not in seen:
+                    seen.add(line)
+                    outline.headings.append({"title": line, "page": page_num, "offset": line_offset, "level": level})
+                continue
+
+            score = sentence_score(line)
+            if score and max_key_sentences:
+                order += 1
+                entry = (score, -order, {"text": line[:MAX_SENTENCE_CHARS], "page": page_num,
+                                         "offset": line_offset, "score": score})
+                if len(candidates) < max_key_sentences:
+                    heapq.heappush(candidates, entry)
+                else:
+                    heapq.heappushpop(candidates, entry)
+
+    outline.key_sentences = sorted((entry for _, _, entry in candidates), key=lambda s: (s["page"], s["offset"]))
+    return outline.finish()
+
+def get_document_outline(file_hash, pages):
+    """Outline de un documento, calculado una sola vez por file_hash"""
+    outline = get_from_cache(outline_cache, file_hash)
+    if outline is None:
+        with timer("outline_build"):
+            outline = add_to_cache(outline_cache, file_hash, analyse_document(pages))
+    return outline
+
+def build_outline(pages, max_entries=OUTLINE_MAX_ENTRIES):
+    """Lista de {"title", "page", "level"} a partir del texto por página"""
+    return analyse_document(pages, max_key_sentences=0).headings_list(max_entries)
@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import zlib
+
+from config import CACHE_DB_PATH, PERSISTENT_CACHE_MAX_BYTES, PERSISTENT_CACHE_TTL_SECONDS
+
+
+def _int_keys(obj):
+    # JSON solo admite claves de texto: {"1": ...} vuelve a ser {1: ...} (p. ej. las páginas)
+    if obj and all(key.isdigit() for key in obj):
+        return {int(key): value for key, value in obj.items()}
+    return obj
+
+def encode_value(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def decode_value(data):
+    return json.loads(data.decode("utf-8"), object_hook=_int_keys)
+
+def ensure_private_directory(directory):
+    """
+    Crear el directorio de la base con permisos 0700 y comprobar que es del usuario
+    actual y nadie más puede escribir en él (lanza PermissionError si no).
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        raise PermissionError(f"El directorio de la caché {directory} pertenece a otro usuario")
+    if info.st_mode & 0o077:
+        raise PermissionError(f"El directorio de la caché {directory} no es privado (permisos {oct(info.st_mode & 0o777)})")
+
+
+class SQLiteCache:
+    """
+    Caché persistente compartida entre procesos (SQLite en modo WAL).
+    Los valores se guardan como JSON comprimido con zlib (nunca con pickle: el
+    archivo no debe poder ejecutar código al leerse); las entradas caducan por
+    TTL y la base se compacta cuando supera max_bytes.
+    """
+
+    # Cada cuántas escrituras se comprueba el tamaño total
+    COMPACT_EVERY = 50
+
+    def __init__(self, path=CACHE_DB_PATH, max_bytes=PERSISTENT_CACHE_MAX_BYTES,
+                 ttl=PERSISTENT_CACHE_TTL_SECONDS, compress_level=6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.compress_level = compress_level
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+
+        ensure_private_directory(os.path.dirname(os.path.abspath(path)))
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+
+    def _connection(self):
+        # Una conexión por hilo; WAL permite lectores concurrentes con un escritor
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        try:
+            conn = self._connection()
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            try:
+                value = decode_value(zlib.decompress(row[0]))
+            except (zlib.error, ValueError):
+                # Entrada con otro formato (p. ej. de una versión anterior): se descarta
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+            self.hits += 1
+            return value
+        except Exception as e:
+            print(f"Error leyendo la caché persistente: {str(e)}")
+            return None
+
+    def set(self, namespace, key, value, ttl=None):
+        try:
+            blob = zlib.compress(encode_value(value), self.compress_level)
+            ttl = self.ttl if ttl is None else ttl
+            now = time.time()
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, key, blob, len(blob), now + ttl if ttl else None, now),
+            )
+            with self._writes_lock:
+                self._writes += 1
+                compact = self._writes % self.COMPACT_EVERY == 0
+            if compact:
+                self.compact()
+        except Exception as e:
+            print(f"Error escribiendo la caché persistente: {str(e)}")
+
+    def delete(self, namespace, key):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except Exception as e:
+            print(f"Error borrando de la caché persistente: {str(e)}")
+
+    def compact(self):
+        """Borrar las entradas caducadas y, si se supera max_bytes, las menos usadas"""
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                # Dejar margen para no compactar en cada escritura
+                target = int(self.max_bytes * 0.8)
+                to_free = total - target
+                freed = 0
+                doomed = []
+                for namespace, key, size in conn.execute(
+                        "SELECT namespace, key, size FROM entries ORDER BY accessed_at"):
+                    if freed >= to_free:
+                        break
+                    doomed.append((namespace, key))
+                    freed += size
+                conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", doomed)
+            self.compactions += 1
+        except Exception as e:
+            print(f"Error compactando la caché persistente: {str(e)}")
+            traceback.print_exc()
+
+    def stats(self):
+        try:
+            entries, total = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except Exception:
+            entries, total = None, None
+        return {
+            "path": self.path,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "compactions": self.compactions,
+        }
@@ -0,0 +1,149 @@
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+from config import (
+    SCHEDULER_WORKERS,
+    SCHEDULER_QUEUE_LIMITS,
+    SCHEDULER_BACKGROUND_MAX_RUNNING,
+    SCHEDULER_INTERACTIVE_RESERVED,
+    SCHEDULER_RETRY_AFTER,
+)
+
+# Clases de prioridad (menor número = más prioridad)
+INTERACTIVE = 0  # chat y resúmenes que el usuario está esperando
+EXPLANATION = 1  # procesamiento de subidas y explicaciones
+BACKGROUND = 2   # resúmenes especulativos (prefetch)
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", EXPLANATION: "explanation", BACKGROUND: "background"}
+
+
+class SchedulerSaturated(Exception):
+    """La cola de esta prioridad está llena; el cliente debe reintentar más tarde"""
+
+    def __init__(self, priority, retry_after=SCHEDULER_RETRY_AFTER):
+        super().__init__(f"Servidor saturado ({PRIORITY_NAMES[priority]}), reintenta en {retry_after} segundos")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class TaskScheduler:
+    """
+    Planificador de tareas compartido por todas las rutas.
+    Las colas de cada prioridad están acotadas (backpressure), las tareas de más
+    prioridad salen primero y las subidas y el trabajo en segundo plano nunca ocupan
+    todos los hilos: interactive_reserved hilos quedan siempre libres para el chat.
+    """
+
+    def __init__(self, workers=SCHEDULER_WORKERS, queue_limits=SCHEDULER_QUEUE_LIMITS,
+                 background_max_running=SCHEDULER_BACKGROUND_MAX_RUNNING,
+                 interactive_reserved=SCHEDULER_INTERACTIVE_RESERVED):
+        self.workers = workers
+        self.queue_limits = dict(queue_limits)
+        # Hilos que pueden ocupar entre todas las prioridades no interactivas (al menos uno)
+        self.max_non_interactive = max(1, workers - interactive_reserved)
+        self.max_running = {
+            INTERACTIVE: workers,
+            EXPLANATION: self.max_non_interactive,
+            BACKGROUND: max(1, min(background_max_running, workers - 1, self.max_non_interactive)),
+        }
+        self._queues = {priority: deque() for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._threads = []
+        self.submitted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self.rejected = {priority: 0 for priority in PRIORITY_NAMES}
+        self.cancelled = {priority: 0 for priority in PRIORITY_NAMES}
+
+    def _ensure_started(self):
+        # Los hilos se crean con la primera tarea
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, priority, fn, *args, **kwargs):
+        """Encolar fn(*args, **kwargs); devuelve un Future (cancelable mientras esté en cola)"""
+        future = Future()
+        with self._cond:
+            if len(self._queues[priority]) >= self.queue_limits[priority]:
+                self.rejected[priority] += 1
+                raise SchedulerSaturated(priority)
+            self._ensure_started()
+            self._queues[priority].append((future, fn, args, kwargs, time.monotonic()))
+            self.submitted[priority] += 1
+            self._cond.notify()
+        return future
+
+    def run(self, priority, fn, *args, timeout=None, **kwargs):
+        """Ejecutar en el planificador y esperar el resultado"""
+        return self.submit(priority, fn, *args, **kwargs).result(timeout=timeout)
+
+    def _next_task(self):
+        with self._cond:
+            while True:
+                non_interactive = sum(self._running[p] for p in self._running if p != INTERACTIVE)
+                for priority in sorted(self._queues):
+                    queue = self._queues[priority]
+                    if priority != INTERACTIVE and non_interactive >= self.max_non_interactive:
+                        break
+                    if queue and self._running[priority] < self.max_running[priority]:
+                        self._running[priority] += 1
+                        return priority, queue.popleft()
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            priority, (future, fn, args, kwargs, _) = self._next_task()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    with self._cond:
+                        self.cancelled[priority] += 1
+                    continue
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    print(f"Error en tarea del planificador: {str(e)}")
+                    traceback.print_exc()
+                    future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self.completed[priority] += 1
+                    self._cond.notify_all()
+
+    def queue_depth(self, priority=None):
+        with self._cond:
+            if priority is not None:
+                return len(self._queues[priority])
+            return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "workers": self.workers,
+                "max_non_interactive": self.max_non_interactive,
+                "classes": {
+                    name: {
+                        "queued": len(self._queues[priority]),
+                        "running": self._running[priority],
+                        "queue_limit": self.queue_limits[priority],
+                        "max_running": self.max_running[priority],
+                        "oldest_wait_seconds": round(now - self._queues[priority][0][4], 3) if self._queues[priority] else 0,
+                        "submitted": self.submitted[priority],
+                        "completed": self.completed[priority],
+                        "rejected": self.rejected[priority],
+                        "cancelled": self.cancelled[priority],
+                    }
+                    for priority, name in PRIORITY_NAMES.items()
+                },
+            }
+
+
+# Planificador compartido por toda la aplicación
+scheduler = TaskScheduler()
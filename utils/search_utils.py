@@ -0,0 +1,174 @@
+import re
+from collections import Counter
+
+from config import INDEX_CHUNK_SIZE, INDEX_TOP_K, CHAT_CONTEXT_MAX_CHARS
+from utils.cache_utils import index_cache, get_from_cache, add_to_cache
+from utils.metrics import timed, timer
+
+# Mismo criterio que las palabras clave de la pregunta: palabras de 3+ caracteres
+_TOKEN_RE = re.compile(r'\b\w{3,}\b')
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+def _split_units(text, chunk_size):
+    """Párrafos del texto; los que superan chunk_size se dividen por líneas (y si hace falta, a la fuerza)"""
+    for paragraph in text.split('\n\n'):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= chunk_size:
+            if paragraph:
+                yield paragraph
+            continue
+        for line in paragraph.split('\n'):
+            line = line.strip()
+            while len(line) > chunk_size:
+                yield line[:chunk_size]
+                line = line[chunk_size:]
+            if line:
+                yield line
+
+def split_chunks(pages, chunk_size=INDEX_CHUNK_SIZE):
+    """Dividir las páginas en fragmentos de hasta chunk_size caracteres: [(page, text)]"""
+    chunks = []
+    for page_num, text in sorted(pages.items()):
+        current = ""
+        for unit in _split_units(text, chunk_size):
+            if current and len(current) + len(unit) + 1 > chunk_size:
+                chunks.append((page_num, current))
+                current = ""
+            current = f"{current}\n{unit}" if current else unit
+        if current:
+            chunks.append((page_num, current))
+    return chunks
+
+
+class BM25Index:
+    """
+    Índice invertido a nivel de fragmento con puntuación BM25.
+    Las listas de postings se guardan en arrays de NumPy (formato CSR) con el peso
+    BM25 de cada posting ya calculado, así una consulta solo suma pesos.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        # NumPy se importa con el primer índice, no al arrancar la aplicación
+        import numpy as np
+        self.chunks = chunks
+        self.vocab = {}
+
+        term_ids = []
+        doc_ids = []
+        freqs = []
+        doc_len = np.zeros(len(chunks), dtype=np.float32)
+        for doc_id, (_, text) in enumerate(chunks):
+            counts = Counter(tokenize(text))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_id)
+                freqs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind='stable')
+        self.postings = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(freqs, dtype=np.float32)[order]
+
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self.indptr[1:])
+
+        n_docs = max(len(chunks), 1)
+        avgdl = float(doc_len.mean()) if len(chunks) else 1.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * doc_len[self.postings] / max(avgdl, 1.0))
+        self.weights = np.repeat(idf, df) * tf * (k1 + 1) / (tf + norm)
+
+    def memory_size(self):
+        """Bytes aproximados que ocupa el índice (para el presupuesto de la caché)"""
+        text_bytes = sum(len(text) for _, text in self.chunks)
+        return (self.postings.nbytes + self.weights.nbytes + self.indptr.nbytes +
+                text_bytes + 64 * len(self.vocab))
+
+    @timed("bm25_search")
+    def search(self, query, top_k=INDEX_TOP_K, max_length=CHAT_CONTEXT_MAX_CHARS):
+        """
+        Devolver los fragmentos mejor puntuados que caben en max_length: [{page, text, score}].
+        El presupuesto incluye la etiqueta de página y el separador que añade format_results.
+        """
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or not self.chunks:
+            return []
+        import numpy as np
+
+        docs = np.concatenate([self.postings[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] for t in term_ids])
+        scores = np.bincount(docs, weights=weights, minlength=len(self.chunks))
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        results = []
+        used = 0
+        for doc_id in candidates:
+            page_num, text = self.chunks[doc_id]
+            overhead = len(_label(page_num)) + (2 if results else 0)
+            if results and used + overhead + len(text) > max_length:
+                continue
+            text = text[:max(max_length - overhead, 0)]
+            if not text:
+                break
+            results.append({"chunk": int(doc_id), "page": page_num, "text": text,
+                            "score": float(scores[doc_id])})
+            used += overhead + len(text)
+        return results
+
+
+def _label(page_num, section=None):
+    label = f"Página {page_num}"
+    if section:
+        label = f"{label} · {section}"
+    return f"[{label}]\n"
+
+def format_results(results, pages=None, outline=None, max_length=None):
+    """
+    Unir los fragmentos en orden de documento indicando su página
+    (y, si hay outline del documento, la sección a la que pertenecen).
+    Con max_length, si las secciones no caben se omiten y, si aun así no cabe,
+    se quitan los fragmentos peor puntuados.
+    """
+    ordered = sorted(results, key=lambda r: r["chunk"])
+    sections = {}
+    if outline is not None and pages:
+        for r in ordered:
+            offset = max(pages.get(r["page"], "").find(r["text"][:40]), 0)
+            sections[r["chunk"]] = outline.section_at(r["page"], offset)
+
+    def join(items, with_sections):
+        return '\n\n'.join(f"{_label(r['page'], sections.get(r['chunk']) if with_sections else None)}{r['text']}"
+                            for r in items)
+
+    context = join(ordered, True)
+    if max_length is None or len(context) <= max_length:
+        return context
+    # search() ya reservó sitio para las etiquetas sin sección
+    while ordered:
+        context = join(ordered, False)
+        if len(context) <= max_length:
+            return context
+        ordered.remove(min(ordered, key=lambda r: r.get("score", 0)))
+    return ""
+
+def get_document_index(file_hash, pages):
+    """Obtener (o construir una sola vez) el índice BM25 de un documento"""
+    index = get_from_cache(index_cache, file_hash)
+    if index is None:
+        with timer("bm25_build"):
+            index = add_to_cache(index_cache, file_hash, BM25Index(split_chunks(pages)))
+    return index
+
+def retrieve_document_context(question, file_hash, pages, max_length=CHAT_CONTEXT_MAX_CHARS, top_k=INDEX_TOP_K,
+                               outline=None):
+    """Contexto relevante para la pregunta a partir del índice del documento"""
+    index = get_document_index(file_hash, pages)
+    return format_results(index.search(question, top_k=top_k, max_length=max_length), pages, outline, max_length)
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.task = None  # tarea asyncio cuando la llamada la ejecuta do_async
+        self.leader_left = False
+
+
+class SingleFlight:
+    """
+    Deduplicación de llamadas en curso: si llegan varias peticiones con la misma
+    clave mientras la primera se está calculando, esperan y comparten su resultado.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Ejecutar fn(*args, **kwargs) una sola vez por clave en curso"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.deduplicated += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn, *args, **kwargs):
+        """
+        Como do() pero para corrutinas, compartiendo las claves en curso con las
+        llamadas síncronas. Si quien ejecuta se cancela (p. ej. el cliente se
+        desconecta) y nadie más espera el resultado, la corrutina se cancela.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.deduplicated += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                call.task = asyncio.ensure_future(fn(*args, **kwargs))
+                call.task.add_done_callback(lambda task: self._finish_async(key, call, task))
+                leader = True
+        return await self._await_call(call, leader)
+
+    def _finish_async(self, key, call, task):
+        if task.cancelled():
+            call.error = RuntimeError("La llamada se canceló")
+        elif task.exception() is not None:
+            call.error = task.exception()
+        else:
+            call.result = task.result()
+        with self._lock:
+            del self._calls[key]
+        call.done.set()
+
+    async def _await_call(self, call, leader):
+        try:
+            if call.task is not None and call.task.get_loop() is asyncio.get_running_loop():
+                return await asyncio.shield(call.task)
+            # La ejecuta otro hilo (o bucle): esperar sin bloquear el bucle de eventos
+            while not call.done.is_set():
+                await asyncio.sleep(0.02)
+        except asyncio.CancelledError:
+            with self._lock:
+                if leader:
+                    call.leader_left = True
+                else:
+                    call.waiters -= 1
+                abandoned = call.leader_left and call.waiters == 0
+            if abandoned and call.task is not None:
+                call.task.cancel()
+            raise
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def record_duplicate(self):
+        """Contar una llamada duplicada resuelta fuera de do() (p. ej. un trabajo reutilizado)"""
+        with self._lock:
+            self.deduplicated += 1
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "deduplicated": self.deduplicated,
+            }
+
+
+_groups = []
+
+def register_group(group):
+    """Registrar un grupo para que aparezca en las estadísticas"""
+    _groups.append(group)
+    return group
+
+def get_singleflight_stats():
+    return {group.name: group.stats() for group in _groups}
+
+# Grupos compartidos por las subidas de PDF y las llamadas a Gemini
+upload_flight = register_group(SingleFlight("upload"))
+prompt_flight = register_group(SingleFlight("prompt"))
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from config import SSE_COALESCE_MIN_CHARS, SSE_COALESCE_MAX_DELAY
+
+# Formato de eventos Server-Sent Events (text/event-stream)
+
+
+def format_event(data="", event_id=None, event=None, retry=None):
+    """
+    Evento SSE con el texto tal cual: cada línea va en su propio campo `data:`
+    y el cliente las vuelve a unir con saltos de línea (se conserva el Markdown).
+    Con data=None no se genera ningún evento (p. ej. solo para enviar `retry:`).
+    """
+    lines = []
+    if retry is not None:
+        lines.append(f"retry: {int(retry)}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event and event != "message":
+        lines.append(f"event: {event}")
+    if data is not None:
+        text = str(data).replace("\r\n", "\n").replace("\r", "\n")
+        lines.extend(f"data: {line}" for line in text.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+def format_comment(text="keep-alive"):
+    """Comentario SSE: el cliente lo ignora, pero mantiene viva la conexión en proxies"""
+    return f": {text}\n\n"
+
+
+async def coalesce_async(chunks, min_chars=SSE_COALESCE_MIN_CHARS, max_delay=SSE_COALESCE_MAX_DELAY,
+                         idle_timeout=None):
+    """
+    Agrupar los chunks de un iterador asíncrono en bloques de al menos min_chars
+    caracteres, sin retener texto más de max_delay segundos.
+    Si pasan idle_timeout segundos sin nada que enviar, produce None (para un heartbeat).
+    """
+    pending = []
+    pending_chars = 0
+    pending_since = None
+    next_chunk = None
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+            if pending:
+                timeout = max(0.0, pending_since + max_delay - time.monotonic())
+            else:
+                timeout = idle_timeout
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                if pending:
+                    yield "".join(pending)
+                    pending, pending_chars, pending_since = [], 0, None
+                else:
+                    yield None
+                continue
+
+            task, next_chunk = next_chunk, None
+            try:
+                text = task.result().text
+            except StopAsyncIteration:
+                break
+            if not text:
+                continue
+            pending.append(text)
+            pending_chars += len(text)
+            if pending_since is None:
+                pending_since = time.monotonic()
+            if pending_chars >= min_chars or time.monotonic() - pending_since >= max_delay:
+                yield "".join(pending)
+                pending, pending_chars, pending_since = [], 0, None
+        if pending:
+            yield "".join(pending)
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+            await asyncio.gather(next_chunk, return_exceptions=True)
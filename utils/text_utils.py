@@ -1,5 +1,22 @@
 import re
 
+from utils.cache_utils import generate_text_hash
+from utils.search_utils import get_document_index
+from utils.metrics import timed
+
+# Patrones precompilados: líneas que parecen títulos y palabras clave
+_HEADING_RES = (
+    re.compile(r'^[A-Z0-9][\w\s]{0,50}$'),
+    re.compile(r'^[IVX]+\.\s'),
+    re.compile(r'^\d+\.\s'),
+)
+_KEYWORD_RE = re.compile(r'important|key|significant|conclusion|result', re.IGNORECASE)
+
+def estimate_tokens(text):
+    """Estimación barata de tokens (~4 caracteres por token)"""
+    return len(text) // 4 + 1
+
+@timed("extract_key_info")
 def extract_key_info(text):
     """Extract key information from PDF text"""
     try:
@@ -16,13 +33,11 @@ def extract_key_info(text):
             for line in lines[3:]:
                 line = line.strip()
                 # Keep lines that look like headings
-                if re.match(r'^[A-Z0-9][\w\s]{0,50}$', line) or \
-                   re.match(r'^[IVX]+\.\s', line) or \
-                   re.match(r'^\d+\.\s', line):
+                if any(pattern.match(line) for pattern in _HEADING_RES):
                     important_lines.append(line)
                 
                 # Keep sentences with important keywords
-                elif any(keyword in line.lower() for keyword in ['important', 'key', 'significant', 'conclusion', 'result']):
+                elif _KEYWORD_RE.search(line):
                     important_lines.append(line)
             
             # Join the important lines
@@ -55,29 +70,16 @@ def extract_summary_text(text, max_length=1000):
     return result
 
 def extract_relevant_context(question, context, max_length=4000):
-    """Extraer las partes más relevantes del contexto basado en la pregunta."""
-    # Extraer palabras clave de la pregunta
-    question_keywords = set(re.findall(r'\b\w{3,}\b', question.lower()))
-
-    # Dividir el contexto en párrafos
-    paragraphs = context.split('\n\n')
-    relevant_paragraphs = []
-
-    # Mantener párrafos que contengan palabras clave de la pregunta
-    for paragraph in paragraphs:
-        paragraph_text = paragraph.lower()
-        if any(keyword in paragraph_text for keyword in question_keywords):
-            relevant_paragraphs.append(paragraph)
+    """Extraer las partes más relevantes del contexto basado en la pregunta (ranking BM25)."""
+    # El índice del contexto se construye una sola vez y se reutiliza en preguntas siguientes
+    index = get_document_index(generate_text_hash(context), {1: context})
+    results = index.search(question, max_length=max_length)
 
-    # Si encontramos párrafos relevantes, usarlos como contexto
-    if relevant_paragraphs:
-        reduced_context = '\n\n'.join(relevant_paragraphs)
-        print("Contexto reducido enviado a Gemini:")
-        print(reduced_context)
-        if len(reduced_context) > max_length:
-            reduced_context = reduced_context[:max_length] + "..."
+    # Si encontramos fragmentos relevantes, usarlos como contexto
+    if results:
+        reduced_context = '\n\n'.join(r["text"] for r in sorted(results, key=lambda r: r["chunk"]))
     else:
         # Si no hay párrafos relevantes, usar una versión truncada del contexto original
         reduced_context = context[:max_length] + "..." if len(context) > max_length else context
 
-    return reduced_context
\ No newline at end of file
+    return reduced_context
@@ -0,0 +1,64 @@
+import hashlib
+import tempfile
+import time
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from config import UPLOAD_MAX_BYTES, UPLOAD_SPOOL_MAX_MEMORY, UPLOAD_COPY_CHUNK_SIZE
+from utils.metrics import observe
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """
+    Archivo temporal para las subidas: se queda en memoria hasta max_size bytes y
+    después pasa a disco. Calcula el MD5 mientras se escribe y corta la subida con
+    413 si supera max_bytes, así el PDF nunca se copia entero para hashearlo.
+    """
+
+    def __init__(self, max_size=UPLOAD_SPOOL_MAX_MEMORY, max_bytes=UPLOAD_MAX_BYTES):
+        super().__init__(max_size=max_size, mode="w+b")
+        self.max_bytes = max_bytes
+        self.bytes_written = 0
+        self.hash_seconds = 0.0
+        self._md5 = hashlib.md5()
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        if self.max_bytes and self.bytes_written > self.max_bytes:
+            raise RequestEntityTooLarge(f"El archivo supera el tamaño máximo de {self.max_bytes} bytes")
+        start = time.perf_counter()
+        self._md5.update(data)
+        self.hash_seconds += time.perf_counter() - start
+        return super().write(data)
+
+    def hexdigest(self):
+        observe("md5_hash", self.hash_seconds)
+        return self._md5.hexdigest()
+
+
+class UploadRequest(Request):
+    """Petición de Flask que guarda los archivos subidos en HashingSpooledFile"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile()
+
+
+def hash_file(f, chunk_size=UPLOAD_COPY_CHUNK_SIZE):
+    """MD5 de un archivo leyéndolo por bloques (deja el cursor al principio)"""
+    start = time.perf_counter()
+    md5 = hashlib.md5()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        md5.update(chunk)
+    f.seek(0)
+    observe("md5_hash", time.perf_counter() - start)
+    return md5.hexdigest()
+
+def upload_hash(file_storage):
+    """Hash del archivo subido: el calculado durante la subida o, si no lo hay, leyéndolo"""
+    stream = file_storage.stream
+    if isinstance(stream, HashingSpooledFile):
+        stream.seek(0)
+        return stream.hexdigest()
+    return hash_file(stream)
@@ -0,0 +1,56 @@
+import importlib
+import threading
+import time
+import traceback
+
+from config import WARMUP_MODULES
+from utils.gemini_client import get_client
+from utils.metrics import observe
+
+# Calentamiento opcional: los módulos pesados (PyPDF2, NumPy, google.generativeai)
+# se importan la primera vez que hacen falta. En una función serverless recién
+# arrancada eso se suma a la primera petición; warm_up() los carga antes.
+
+_warmup_lock = threading.Lock()
+_warmup_result = None
+
+
+def warm_up(modules=WARMUP_MODULES):
+    """
+    Importar los módulos indicados y crear el cliente de Gemini.
+    Devuelve {módulo: segundos}; solo se hace una vez por proceso.
+    """
+    global _warmup_result
+    with _warmup_lock:
+        if _warmup_result is not None:
+            return _warmup_result
+
+        timings = {}
+        for name in modules:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"Calentamiento: no se pudo importar {name}: {str(e)}")
+                continue
+            timings[name] = time.perf_counter() - start
+            observe("warmup_import", timings[name], module=name)
+
+        # El cliente importa y configura google.generativeai (salvo con el backend falso)
+        start = time.perf_counter()
+        try:
+            get_client()
+            timings["gemini_client"] = time.perf_counter() - start
+            observe("warmup_import", timings["gemini_client"], module="gemini_client")
+        except Exception as e:
+            print(f"Calentamiento: error creando el cliente de Gemini: {str(e)}")
+            traceback.print_exc()
+
+        _warmup_result = timings
+        return timings
+
+def start_warmup(modules=WARMUP_MODULES):
+    """Lanzar warm_up() en un hilo en segundo plano sin retrasar el arranque"""
+    thread = threading.Thread(target=warm_up, args=(modules,), name="warmup", daemon=True)
+    thread.start()
+    return thread